@@ -1,7 +1,15 @@
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from enum import Enum
-from typing import Any, Dict
+from functools import lru_cache
+from itertools import chain
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 from dataclasses import dataclass
+from collections import OrderedDict
+from math import ceil, log2, pi
+from numbers import Real
+import json
+import struct
+import numpy as np
 from .primitive import Vector3, Color3
 
 class Profile:
@@ -24,6 +32,37 @@ class Audio:
         "maxDistance": 10000,
     }
 
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+def to_epoch_us(value: datetime) -> int:
+    # Naive timestamps are treated as UTC, matching `Date.toISOString()` on the client.
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return (value - _EPOCH) // _MICROSECOND
+
+def from_epoch_us(value: int, naive: bool = False) -> datetime:
+    value = _EPOCH + timedelta(microseconds=int(value))
+    return value.replace(tzinfo=None) if naive else value
+
+_JSON_NUMBERS = frozenset((int, float))
+
+def _coordinate(value: Any) -> float:
+    if isinstance(value, Real) and not isinstance(value, bool):
+        return float(value)
+    raise TypeError(f"coordinates must be numbers, got {type(value).__name__}")
+
+def _vector(obj: Dict[str, Any]) -> Vector3:
+    return Vector3(_coordinate(obj['x']), _coordinate(obj['y']), _coordinate(obj['z']))
+
+# A roster tick stamps most agents with a handful of distinct strings, so the
+# ISO parse is memoized rather than repeated per record. Returns the epoch time and
+# whether the string carried no offset.
+@lru_cache(maxsize=4096)
+def _parse_timestamp_us(value: str) -> Tuple[int, bool]:
+    parsed = datetime.fromisoformat(value)
+    return to_epoch_us(parsed), parsed.tzinfo is None
+
 @dataclass
 class Presence:
     agentId: str
@@ -35,8 +74,435 @@ class Presence:
     def parse(cls, obj: Dict[str, Any]) -> 'Presence':
         return cls(
             agentId=obj['agentId'],
-            position=Vector3(**obj['position']),
-            orientation=Vector3(**obj['orientation']),
+            position=_vector(obj['position']),
+            orientation=_vector(obj['orientation']),
             lastUpdated=datetime.fromisoformat(obj['lastUpdated'])
         )
 
+    @classmethod
+    def parse_many(cls, objs: Iterable[Dict[str, Any]], table: Optional['PresenceTable'] = None) -> 'PresenceTable':
+        objs = objs if isinstance(objs, list) else list(objs)
+        try:
+            agent_ids = [obj['agentId'] for obj in objs]
+            positions = list(chain.from_iterable((p['x'], p['y'], p['z']) for p in [obj['position'] for obj in objs]))
+            orientations = list(chain.from_iterable((o['x'], o['y'], o['z']) for o in [obj['orientation'] for obj in objs]))
+            stamps = [_parse_timestamp_us(obj['lastUpdated']) for obj in objs]
+        except (KeyError, TypeError, ValueError):
+            _raise_invalid_presence(objs)
+            raise
+        # np.fromiter would coerce strings and turn None into NaN, so anything other than
+        # plain JSON numbers goes through the per-record check first.
+        if not _JSON_NUMBERS.issuperset(map(type, positions)) or not _JSON_NUMBERS.issuperset(map(type, orientations)):
+            _raise_invalid_presence(objs)
+        positions = np.fromiter(positions, dtype=np.float64, count=3 * len(objs)).reshape(len(objs), 3)
+        orientations = np.fromiter(orientations, dtype=np.float64, count=3 * len(objs)).reshape(len(objs), 3)
+        finite = np.isfinite(positions).all(axis=1) & np.isfinite(orientations).all(axis=1)
+        if not finite.all():
+            raise ValueError(f"Presence at index {int(np.argmin(finite))} has non-finite coordinates")
+        if not all(type(agent_id) is str for agent_id in agent_ids):
+            _raise_invalid_presence(objs)
+        table = PresenceTable(len(objs)) if table is None else table
+        last_updated = [stamp for stamp, _ in stamps]
+        naive = [flag for _, flag in stamps]
+        table.upsert_many(agent_ids, positions, orientations, last_updated, naive if any(naive) else None)
+        return table
+
+    @classmethod
+    def parse_json_bytes(cls, buf: Any, table: Optional['PresenceTable'] = None) -> 'PresenceTable':
+        data = bytes(buf).strip()
+        if not data:
+            objs = []
+        elif data[:1] == b'[':
+            objs = json.loads(data)
+        else:
+            # NDJSON: splice the frame into one array so it decodes in a single call.
+            objs = json.loads(b'[' + b','.join(line for line in data.splitlines() if line.strip()) + b']')
+        return cls.parse_many(objs, table)
+
+    @classmethod
+    def parse_frame(cls, buf: Any, decoder: 'PresenceDecoder', table: Optional['PresenceTable'] = None) -> 'PresenceTable':
+        return decoder.decode(buf, table)
+
+def _raise_invalid_presence(objs: List[Any]) -> None:
+    for index, obj in enumerate(objs):
+        try:
+            if not isinstance(obj['agentId'], str):
+                raise TypeError(f"agentId must be a string, got {type(obj['agentId']).__name__}")
+            for key in ('position', 'orientation'):
+                _vector(obj[key])
+            _parse_timestamp_us(obj['lastUpdated'])
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Invalid presence at index {index}: {e!r}") from e
+
+class PresenceTable:
+    def __init__(self, capacity: int = 64):
+        capacity = max(int(capacity), 1)
+        self._size = 0
+        self._rows: Dict[str, int] = {}
+        self._agent_ids: List[str] = []
+        self._position = np.zeros((capacity, 3), dtype=np.float64)
+        self._orientation = np.zeros((capacity, 3), dtype=np.float64)
+        self._last_updated = np.zeros(capacity, dtype=np.int64)
+        # Times are stored as UTC epoch microseconds; rows given a naive lastUpdated are
+        # flagged so they hand back a naive datetime again.
+        self._naive = np.zeros(capacity, dtype=bool)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, agent_id: object) -> bool:
+        return agent_id in self._rows
+
+    def __iter__(self) -> Iterator[Presence]:
+        for row in range(self._size):
+            yield self._presence(row)
+
+    def __getitem__(self, agent_id: str) -> Presence:
+        return self._presence(self._rows[agent_id])
+
+    # Column views share memory with the table and are invalidated by the next
+    # ingest that grows capacity or by `remove`, which compacts rows.
+    @property
+    def agent_ids(self) -> Sequence[str]:
+        return self._agent_ids
+
+    @property
+    def positions(self) -> np.ndarray:
+        return self._position[:self._size]
+
+    @property
+    def orientations(self) -> np.ndarray:
+        return self._orientation[:self._size]
+
+    @property
+    def last_updated(self) -> np.ndarray:
+        return self._last_updated[:self._size]
+
+    def row(self, agent_id: str) -> int:
+        return self._rows[agent_id]
+
+    def get(self, agent_id: str) -> Optional[Presence]:
+        row = self._rows.get(agent_id)
+        return None if row is None else self._presence(row)
+
+    def upsert(self, presence: Presence) -> int:
+        row = self._row_for(presence.agentId)
+        self._position[row] = (presence.position.x, presence.position.y, presence.position.z)
+        self._orientation[row] = (presence.orientation.x, presence.orientation.y, presence.orientation.z)
+        self._last_updated[row] = to_epoch_us(presence.lastUpdated)
+        self._naive[row] = presence.lastUpdated.tzinfo is None
+        return row
+
+    def upsert_many(
+        self,
+        agent_ids: Sequence[str],
+        positions: Any,
+        orientations: Any,
+        last_updated: Any,
+        naive: Any = None,
+    ) -> np.ndarray:
+        count = len(agent_ids)
+        positions = np.asarray(positions, dtype=np.float64).reshape(count, 3)
+        orientations = np.asarray(orientations, dtype=np.float64).reshape(count, 3)
+        last_updated = np.asarray(last_updated, dtype=np.int64).reshape(count)
+        self._reserve(self._size + count)
+        lookup = self._rows.get
+        rows = [lookup(agent_id) for agent_id in agent_ids]
+        if None in rows:
+            for index, row in enumerate(rows):
+                if row is None:
+                    rows[index] = self._row_for(agent_ids[index])
+        rows = np.array(rows, dtype=np.intp)
+        # Fancy assignment applies in order, so a repeated agentId keeps its last sample.
+        self._position[rows] = positions
+        self._orientation[rows] = orientations
+        self._last_updated[rows] = last_updated
+        self._naive[rows] = False if naive is None else np.asarray(naive, dtype=bool).reshape(count)
+        return rows
+
+    def extend(self, presences: Iterable[Presence]) -> np.ndarray:
+        presences = list(presences)
+        return self.upsert_many(
+            [p.agentId for p in presences],
+            [(p.position.x, p.position.y, p.position.z) for p in presences],
+            [(p.orientation.x, p.orientation.y, p.orientation.z) for p in presences],
+            [to_epoch_us(p.lastUpdated) for p in presences],
+            [p.lastUpdated.tzinfo is None for p in presences],
+        )
+
+    def remove(self, agent_id: str) -> bool:
+        row = self._rows.pop(agent_id, None)
+        if row is None:
+            return False
+        last = self._size - 1
+        if row != last:
+            moved = self._agent_ids[last]
+            self._agent_ids[row] = moved
+            self._rows[moved] = row
+            self._position[row] = self._position[last]
+            self._orientation[row] = self._orientation[last]
+            self._last_updated[row] = self._last_updated[last]
+            self._naive[row] = self._naive[last]
+        self._agent_ids.pop()
+        self._size = last
+        return True
+
+    def clear(self) -> None:
+        self._rows.clear()
+        self._agent_ids.clear()
+        self._size = 0
+
+    def _presence(self, row: int) -> Presence:
+        position = self._position[row]
+        orientation = self._orientation[row]
+        return Presence(
+            agentId=self._agent_ids[row],
+            position=Vector3(float(position[0]), float(position[1]), float(position[2])),
+            orientation=Vector3(float(orientation[0]), float(orientation[1]), float(orientation[2])),
+            lastUpdated=from_epoch_us(self._last_updated[row], bool(self._naive[row])),
+        )
+
+    def _row_for(self, agent_id: str) -> int:
+        row = self._rows.get(agent_id)
+        if row is None:
+            self._reserve(self._size + 1)
+            row = self._size
+            self._rows[agent_id] = row
+            self._agent_ids.append(agent_id)
+            self._size += 1
+        return row
+
+    def _reserve(self, capacity: int) -> None:
+        current = len(self._last_updated)
+        if capacity <= current:
+            return
+        capacity = max(capacity, current * 2)
+        self._position = np.resize(self._position, (capacity, 3))
+        self._orientation = np.resize(self._orientation, (capacity, 3))
+        self._last_updated = np.resize(self._last_updated, capacity)
+        self._naive = np.resize(self._naive, capacity)
+
+# version, keyframe flag, sequence, baseline sequence, base timestamp (epoch ms),
+# then the counts of introduced names, removed agents and records.
+_FRAME_HEADER = struct.Struct('<BBIIqIII')
+_FRAME_VERSION = 1
+_TAU = 2 * pi
+
+def _quantized_dtype(bits: int) -> str:
+    if not 1 <= bits <= 32:
+        raise ValueError(f"Quantization needs 1 to 32 bits, got {bits}")
+    return '<u1' if bits <= 8 else '<u2' if bits <= 16 else '<u4'
+
+class PresenceCodec:
+    def __init__(
+        self,
+        bounds_min: Sequence[float] = (-10000.0, -10000.0, -10000.0),
+        bounds_max: Sequence[float] = (10000.0, 10000.0, 10000.0),
+        position_bits: int = 16,
+        orientation_bits: int = 12,
+    ):
+        self.bounds_min = np.asarray(bounds_min, dtype=np.float64).reshape(3)
+        self.bounds_max = np.asarray(bounds_max, dtype=np.float64).reshape(3)
+        if not (self.bounds_max > self.bounds_min).all():
+            raise ValueError("bounds_max must exceed bounds_min on every axis")
+        self.position_bits = position_bits
+        self.orientation_bits = orientation_bits
+        self._position_steps = float((1 << position_bits) - 1)
+        self._orientation_steps = 1 << orientation_bits
+        self.dtype = np.dtype([
+            ('agent', '<u4'),
+            ('position', _quantized_dtype(position_bits), 3),
+            ('orientation', _quantized_dtype(orientation_bits), 3),
+            ('age', '<u4'),
+        ])
+        self._indices: Dict[str, int] = {}
+        self._ids: List[str] = []
+
+    @classmethod
+    def for_precision(
+        cls,
+        bounds_min: Sequence[float],
+        bounds_max: Sequence[float],
+        precision: float,
+        orientation_bits: int = 12,
+    ) -> 'PresenceCodec':
+        extent = float(np.max(np.asarray(bounds_max, dtype=np.float64) - np.asarray(bounds_min, dtype=np.float64)))
+        return cls(bounds_min, bounds_max, max(int(ceil(log2(extent / precision + 1))), 1), orientation_bits)
+
+    @property
+    def resolution(self) -> np.ndarray:
+        return (self.bounds_max - self.bounds_min) / self._position_steps
+
+    def index(self, agent_id: str) -> int:
+        index = self._indices.get(agent_id)
+        if index is None:
+            index = self._indices[agent_id] = len(self._ids)
+            self._ids.append(agent_id)
+        return index
+
+    def agent_id(self, index: int) -> str:
+        return self._ids[index]
+
+    def quantize(self, table: PresenceTable) -> Tuple[np.ndarray, int]:
+        count = len(table)
+        records = np.empty(count, dtype=self.dtype)
+        records['agent'] = [self.index(agent_id) for agent_id in table.agent_ids]
+        span = self.bounds_max - self.bounds_min
+        scaled = (np.clip(table.positions, self.bounds_min, self.bounds_max) - self.bounds_min) / span
+        records['position'] = np.rint(scaled * self._position_steps)
+        steps = self._orientation_steps
+        turns = np.mod(table.orientations + pi, _TAU) / _TAU
+        records['orientation'] = np.rint(turns * steps).astype(np.int64) % steps
+        milliseconds = table.last_updated // 1000
+        base = int(milliseconds.max()) if count else 0
+        records['age'] = np.minimum(base - milliseconds, 0xFFFFFFFF)
+        records.sort(order='agent')
+        return records, base
+
+    def dequantize(self, records: np.ndarray, base: int, names: np.ndarray, table: Optional[PresenceTable] = None) -> PresenceTable:
+        span = self.bounds_max - self.bounds_min
+        positions = records['position'] / self._position_steps * span + self.bounds_min
+        orientations = records['orientation'] / self._orientation_steps * _TAU - pi
+        last_updated = (base - records['age'].astype(np.int64)) * 1000
+        table = PresenceTable(len(records)) if table is None else table
+        table.upsert_many(names[records['agent']].tolist(), positions, orientations, last_updated)
+        return table
+
+class PresenceEncoder:
+    def __init__(self, codec: PresenceCodec, history: int = 64):
+        self.codec = codec
+        self.history = history
+        self.sequence = 0
+        self.baseline = 0
+        self._baseline_records: Optional[np.ndarray] = None
+        self._baseline_base = 0
+        self._frames: 'OrderedDict[int, Tuple[np.ndarray, np.ndarray, int]]' = OrderedDict()
+        self._known = np.empty(0, dtype=np.uint32)
+
+    def encode(self, table: PresenceTable) -> bytes:
+        records, base = self.codec.quantize(table)
+        return self.encode_records(records, base)
+
+    def encode_records(self, records: np.ndarray, base: int) -> bytes:
+        self.sequence += 1
+        baseline = self._baseline_records
+        agents = records['agent']
+        if baseline is None:
+            changed = records
+            removed = np.empty(0, dtype=np.uint32)
+        else:
+            # Against the last acked state only agents whose quantized sample differs are
+            # sent, and agents missing from this frame are listed as removed. Ages are
+            # relative to each frame's base, so they are compared as absolute times.
+            slot = np.minimum(np.searchsorted(baseline['agent'], agents), max(len(baseline) - 1, 0))
+            if len(baseline):
+                previous = baseline[slot]
+                same = (
+                    (previous['agent'] == agents)
+                    & (previous['position'] == records['position']).all(axis=1)
+                    & (previous['orientation'] == records['orientation']).all(axis=1)
+                    & (self._baseline_base - previous['age'].astype(np.int64) == base - records['age'].astype(np.int64))
+                )
+            else:
+                same = np.zeros(len(records), dtype=bool)
+            changed = records[~same]
+            removed = np.setdiff1d(baseline['agent'], agents, assume_unique=True).astype(np.uint32)
+        introduced = np.setdiff1d(changed['agent'], self._known, assume_unique=True).astype(np.uint32)
+        ids = self.codec._ids
+        names = [ids[index].encode() for index in introduced.tolist()]
+        lengths = np.array([len(name) for name in names], dtype='<u2')
+        header = _FRAME_HEADER.pack(
+            _FRAME_VERSION,
+            baseline is None,
+            self.sequence,
+            self.baseline if baseline is not None else 0,
+            base,
+            len(names),
+            len(removed),
+            len(changed),
+        )
+        self._frames[self.sequence] = (records, introduced, base)
+        while len(self._frames) > self.history:
+            self._frames.popitem(last=False)
+        return b''.join([
+            header,
+            introduced.astype('<u4').tobytes(),
+            lengths.tobytes(),
+            *names,
+            removed.astype('<u4').tobytes(),
+            changed.tobytes(),
+        ])
+
+    def ack(self, sequence: int) -> bool:
+        frame = self._frames.get(sequence)
+        if frame is None or sequence <= self.baseline:
+            return False
+        records, introduced, base = frame
+        self.baseline = sequence
+        self._baseline_records = records
+        self._baseline_base = base
+        self._known = np.union1d(self._known, introduced).astype(np.uint32)
+        for older in [key for key in self._frames if key < sequence]:
+            del self._frames[older]
+        return True
+
+class PresenceDecoder:
+    def __init__(self, codec: PresenceCodec, history: int = 64):
+        self.codec = codec
+        self.history = history
+        self.sequence = 0
+        self._names = np.empty(0, dtype=object)
+        self._states: 'OrderedDict[int, Tuple[np.ndarray, int]]' = OrderedDict()
+
+    def decode(self, buf: Any, table: Optional[PresenceTable] = None) -> PresenceTable:
+        data = memoryview(buf).cast('B')
+        if len(data) < _FRAME_HEADER.size:
+            raise ValueError("Presence frame is shorter than its header")
+        version, keyframe, sequence, baseline, base, name_count, removed_count, record_count = _FRAME_HEADER.unpack_from(data)
+        if version != _FRAME_VERSION:
+            raise ValueError(f"Unsupported presence frame version {version}")
+        offset = _FRAME_HEADER.size
+        introduced = np.frombuffer(data, dtype='<u4', count=name_count, offset=offset)
+        offset += 4 * name_count
+        lengths = np.frombuffer(data, dtype='<u2', count=name_count, offset=offset)
+        offset += 2 * name_count
+        if name_count:
+            self._learn(introduced, lengths, data, offset)
+            offset += int(lengths.sum())
+        removed = np.frombuffer(data, dtype='<u4', count=removed_count, offset=offset)
+        offset += 4 * removed_count
+        dtype = self.codec.dtype
+        if len(data) != offset + dtype.itemsize * record_count:
+            raise ValueError("Presence frame length does not match its header")
+        changed = np.frombuffer(data, dtype=dtype, count=record_count, offset=offset)
+        if keyframe:
+            records, records_base = changed.copy(), base
+        else:
+            state = self._states.get(baseline)
+            if state is None:
+                raise ValueError(f"Presence frame {sequence} references unknown baseline {baseline}")
+            previous, previous_base = state
+            kept = previous[~np.isin(previous['agent'], removed) & ~np.isin(previous['agent'], changed['agent'])].copy()
+            # Rebase the ages of carried-over samples onto this frame's timestamp.
+            kept['age'] = np.clip(base - (previous_base - kept['age'].astype(np.int64)), 0, 0xFFFFFFFF)
+            records = np.concatenate([kept, changed])
+            records.sort(order='agent')
+            records_base = base
+        agents = records['agent']
+        if len(agents) and int(agents.max()) >= len(self._names) or np.equal(self._names[agents], None).any():
+            raise ValueError(f"Presence frame {sequence} references an agent that was never introduced")
+        self.sequence = max(self.sequence, sequence)
+        self._states[sequence] = (records, records_base)
+        while len(self._states) > self.history:
+            self._states.popitem(last=False)
+        return self.codec.dequantize(records, records_base, self._names, table)
+
+    def _learn(self, introduced: np.ndarray, lengths: np.ndarray, data: memoryview, offset: int) -> None:
+        top = int(introduced.max()) + 1
+        if top > len(self._names):
+            names = np.empty(top, dtype=object)
+            names[:len(self._names)] = self._names
+            self._names = names
+        ends = np.cumsum(lengths) + offset
+        for index, start, end in zip(introduced.tolist(), (ends - lengths).tolist(), ends.tolist()):
+            self._names[index] = bytes(data[start:end]).decode()
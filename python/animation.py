@@ -0,0 +1,259 @@
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+from .culling import quaternion_matrices
+from .gltf import AccessorReader, load_buffer
+from .graph import WorldGraph
+from .world import Table, TableAnimation, TableBuffer, TableNode, TableScene
+
+# Babylon's glTF loader keys animations at 60 frames per second, and the scene's
+# autoAnimateFrom/To are frame numbers on that timeline.
+FRAME_RATE = 60.0
+
+PATH_WIDTHS = {"translation": 3, "rotation": 4, "scale": 3}
+
+INTERPOLATIONS = ("LINEAR", "STEP", "CUBICSPLINE")
+
+# A forward step that crosses more keys than this falls back to a full search.
+_MAX_ADVANCE = 4
+
+def slerp(q0: np.ndarray, q1: np.ndarray, u: np.ndarray) -> np.ndarray:
+    dot = np.einsum('ij,ij->i', q0, q1)
+    # Take the short way round.
+    q1 = np.where((dot < 0)[:, None], -q1, q1)
+    dot = np.clip(np.abs(dot), 0.0, 1.0)
+    theta = np.arccos(dot)
+    sin_theta = np.sin(theta)
+    near = sin_theta < 1e-6
+    with np.errstate(divide='ignore', invalid='ignore'):
+        a = np.where(near, 1 - u, np.sin((1 - u) * theta) / sin_theta)
+        b = np.where(near, u, np.sin(u * theta) / sin_theta)
+    out = a[:, None] * q0 + b[:, None] * q1
+    return out / np.linalg.norm(out, axis=1, keepdims=True)
+
+@dataclass
+class AnimationPose:
+    node_uuids: List[str]
+    translations: np.ndarray
+    rotations: np.ndarray
+    scales: np.ndarray
+    weights: Dict[str, np.ndarray] = field(default_factory=dict)
+
+    def matrices(self) -> np.ndarray:
+        out = np.zeros((len(self.node_uuids), 4, 4))
+        out[:, :3, :3] = quaternion_matrices(self.rotations) * self.scales[:, None, :]
+        out[:, :3, 3] = self.translations
+        out[:, 3, 3] = 1.0
+        return out
+
+class _ChannelGroup:
+    # Channels sharing a path, interpolation and value width, padded to the longest key
+    # count so each evaluation is a handful of batched array ops. Times carry one extra
+    # +inf column so the cursor can always peek at the next key.
+    def __init__(self, path: str, interpolation: str, targets: List[int], inputs: List[np.ndarray], outputs: List[np.ndarray]):
+        self.path = path
+        self.interpolation = interpolation
+        self.targets = np.array(targets, dtype=np.intp)
+        count = len(inputs)
+        keys = max(len(times) for times in inputs)
+        width = outputs[0].shape[1]
+        self.counts = np.array([len(times) for times in inputs], dtype=np.int64)
+        self.times = np.full((count, keys + 1), np.inf)
+        cubic = interpolation == "CUBICSPLINE"
+        self.values = np.zeros((count, keys, width))
+        self.in_tangents = np.zeros((count, keys, width)) if cubic else None
+        self.out_tangents = np.zeros((count, keys, width)) if cubic else None
+        for row, (times, values) in enumerate(zip(inputs, outputs)):
+            n = len(times)
+            self.times[row, :n] = times
+            if cubic:
+                # Each key stores (in-tangent, value, out-tangent).
+                triples = values[:3 * n].reshape(n, 3, width)
+                self.in_tangents[row, :n] = triples[:, 0]
+                self.values[row, :n] = triples[:, 1]
+                self.out_tangents[row, :n] = triples[:, 2]
+            else:
+                self.values[row, :n] = values[:n]
+        self._rows = np.arange(count)
+        self._cursor = np.full(count, -1, dtype=np.int64)
+        self._time: Optional[float] = None
+
+    def locate(self, t: float) -> np.ndarray:
+        # Index of the last key at or before `t` per channel, -1 before the first. Playback
+        # that only moves forward advances the cached cursors instead of searching.
+        cursor = self._cursor
+        if self._time is None or t < self._time:
+            cursor = (self.times <= t).sum(axis=1) - 1
+        else:
+            rows = self._rows
+            for _ in range(_MAX_ADVANCE):
+                advance = self.times[rows, cursor + 1] <= t
+                if not advance.any():
+                    break
+                cursor = cursor + advance
+            else:
+                cursor = (self.times <= t).sum(axis=1) - 1
+        self._cursor = cursor
+        self._time = t
+        return cursor
+
+    def evaluate(self, t: float) -> np.ndarray:
+        cursor = self.locate(t)
+        rows = self._rows
+        last = self.counts - 1
+        if self.interpolation == "STEP":
+            return self.values[rows, np.clip(cursor, 0, last)]
+        k0 = np.clip(cursor, 0, np.maximum(last - 1, 0))
+        k1 = np.minimum(k0 + 1, last)
+        t0 = self.times[rows, k0]
+        dt = self.times[rows, k1] - t0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            u = np.where(dt > 0, np.clip((t - t0) / dt, 0.0, 1.0), 0.0)
+        v0 = self.values[rows, k0]
+        v1 = self.values[rows, k1]
+        if self.interpolation == "CUBICSPLINE":
+            u2 = u * u
+            u3 = u2 * u
+            h00 = 2 * u3 - 3 * u2 + 1
+            h10 = (u3 - 2 * u2 + u) * dt
+            h01 = -2 * u3 + 3 * u2
+            h11 = (u3 - u2) * dt
+            out = (
+                h00[:, None] * v0
+                + h10[:, None] * self.out_tangents[rows, k0]
+                + h01[:, None] * v1
+                + h11[:, None] * self.in_tangents[rows, k1]
+            )
+            if self.path == "rotation":
+                out /= np.linalg.norm(out, axis=1, keepdims=True)
+            return out
+        if self.path == "rotation":
+            return slerp(v0, v1, u)
+        return v0 + (v1 - v0) * u[:, None]
+
+class AnimationSampler:
+    def __init__(self, graph: WorldGraph, animations: List[TableAnimation], load: Callable[[TableBuffer], Any] = load_buffer):
+        reader = AccessorReader(graph, load)
+        self.node_uuids: List[str] = []
+        slots: Dict[str, int] = {}
+        pending: Dict[Tuple[str, str, int], Tuple[List[int], List[np.ndarray], List[np.ndarray]]] = {}
+        self.start = 0.0
+        self.end = 0.0
+        starts: List[float] = []
+        for animation in animations:
+            samplers = animation.gltf_samplers or []
+            for channel in animation.gltf_channels or ():
+                target = (channel or {}).get("target") or {}
+                node = graph.get(target.get("node"))
+                path = target.get("path")
+                sampler_index = channel.get("sampler")
+                if not isinstance(node, TableNode) or sampler_index is None or not 0 <= sampler_index < len(samplers):
+                    continue
+                if path not in PATH_WIDTHS and path != "weights":
+                    continue
+                sampler = samplers[sampler_index] or {}
+                interpolation = sampler.get("interpolation") or "LINEAR"
+                if interpolation not in INTERPOLATIONS:
+                    continue
+                times = np.asarray(reader.read(sampler["input"]), dtype=np.float64).reshape(-1)
+                if not len(times):
+                    continue
+                values = np.asarray(reader.read(sampler["output"]), dtype=np.float64)
+                keys = len(times) * (3 if interpolation == "CUBICSPLINE" else 1)
+                # Morph weights come flat, one scalar per target per key.
+                values = values.reshape(keys, -1)
+                slot = slots.get(node.vircadia_uuid)
+                if slot is None:
+                    slot = slots[node.vircadia_uuid] = len(self.node_uuids)
+                    self.node_uuids.append(node.vircadia_uuid)
+                group = pending.setdefault((path, interpolation, values.shape[1]), ([], [], []))
+                group[0].append(slot)
+                group[1].append(times)
+                group[2].append(values)
+                starts.append(float(times[0]))
+                self.end = max(self.end, float(times[-1]))
+        if starts:
+            self.start = min(starts)
+        self._groups = [
+            _ChannelGroup(path, interpolation, targets, inputs, outputs)
+            for (path, interpolation, _), (targets, inputs, outputs) in pending.items()
+        ]
+        count = len(self.node_uuids)
+        # Rest pose: anything a channel does not drive keeps the node's own TRS.
+        self._translations = np.zeros((count, 3))
+        self._rotations = np.zeros((count, 4))
+        self._rotations[:, 3] = 1.0
+        self._scales = np.ones((count, 3))
+        self._weights: Dict[str, np.ndarray] = {}
+        for slot, uuid in enumerate(self.node_uuids):
+            node = graph.get(uuid)
+            if node.gltf_translation is not None:
+                self._translations[slot] = node.gltf_translation
+            if node.gltf_rotation is not None:
+                self._rotations[slot] = node.gltf_rotation
+            if node.gltf_scale is not None:
+                self._scales[slot] = node.gltf_scale
+            mesh = graph.get(node.gltf_mesh)
+            weights = node.gltf_weights if node.gltf_weights is not None else getattr(mesh, "gltf_weights", None)
+            if weights is not None:
+                self._weights[uuid] = np.asarray(weights, dtype=np.float64)
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+    def sample(self, t: float) -> AnimationPose:
+        translations = self._translations.copy()
+        rotations = self._rotations.copy()
+        scales = self._scales.copy()
+        weights = dict(self._weights)
+        columns = {"translation": translations, "rotation": rotations, "scale": scales}
+        node_uuids = self.node_uuids
+        for group in self._groups:
+            values = group.evaluate(t)
+            column = columns.get(group.path)
+            if column is not None:
+                column[group.targets] = values
+            else:
+                for slot, value in zip(group.targets.tolist(), values):
+                    weights[node_uuids[slot]] = value
+        return AnimationPose(node_uuids, translations, rotations, scales, weights)
+
+class SceneAnimator:
+    def __init__(self, graph: WorldGraph, scene_uuid: str, load: Callable[[TableBuffer], Any] = load_buffer):
+        scene = graph.get(scene_uuid)
+        if not isinstance(scene, TableScene):
+            raise KeyError(f"No scene with uuid {scene_uuid}")
+        self.scene = scene
+        reachable = graph.dependencies(scene_uuid)
+        animations = [
+            animation
+            for animation in graph.in_world(scene.vircadia_world_uuid, Table.ANIMATIONS)
+            if any(target in reachable for target in graph.references(animation.vircadia_uuid, "gltf_channels.target.node"))
+        ]
+        self.sampler = AnimationSampler(graph, animations, load)
+
+    @property
+    def playing(self) -> bool:
+        return bool(self.scene.vircadia_babylonjs_scene_autoAnimate)
+
+    def time_at(self, elapsed: float) -> float:
+        # Animation time `elapsed` seconds after the scene started, following its
+        # autoAnimate settings; a scene that does not auto-animate holds its first frame.
+        scene = self.scene
+        start = self.sampler.start if scene.vircadia_babylonjs_scene_autoAnimateFrom is None else scene.vircadia_babylonjs_scene_autoAnimateFrom / FRAME_RATE
+        end = self.sampler.end if scene.vircadia_babylonjs_scene_autoAnimateTo is None else scene.vircadia_babylonjs_scene_autoAnimateTo / FRAME_RATE
+        speed = 1.0 if scene.vircadia_babylonjs_scene_autoAnimateSpeed is None else scene.vircadia_babylonjs_scene_autoAnimateSpeed
+        if not self.playing:
+            return start
+        span = end - start
+        offset = elapsed * speed
+        if span <= 0:
+            return start
+        if scene.vircadia_babylonjs_scene_autoAnimateLoop:
+            return start + offset % span
+        # Negative speed plays backwards from `to`.
+        return end + max(offset, -span) if speed < 0 else start + min(offset, span)
+
+    def sample(self, elapsed: float) -> AnimationPose:
+        return self.sampler.sample(self.time_at(elapsed))
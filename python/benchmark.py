@@ -0,0 +1,314 @@
+import argparse
+import gc
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence
+import numpy as np
+from .agent import Presence
+from .graph import WorldGraph
+from .metadata import And, Eq, MetadataIndex, Prefix, Range
+from .primitive import Color3, Color3Array, Vector3, Vector3Array
+from .world import CODECS, TableAccessor, TableMesh, TableMetadata, TableNode, TableScene, TableWorldGLTF
+
+Setup = Callable[[int, random.Random], Callable[[], Any]]
+
+@dataclass
+class Benchmark:
+    name: str
+    group: str
+    sizes: Sequence[int]
+    setup: Setup
+
+BENCHMARKS: List[Benchmark] = []
+
+def benchmark(group: str, sizes: Sequence[int]) -> Callable[[Setup], Setup]:
+    def register(setup: Setup) -> Setup:
+        BENCHMARKS.append(Benchmark(setup.__name__, group, tuple(sizes), setup))
+        return setup
+    return register
+
+# Synthetic data. Every generator takes its own seeded Random so a run is reproducible.
+
+_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+def presence_dicts(count: int, rng: random.Random) -> List[Dict[str, Any]]:
+    return [
+        {
+            "agentId": f"agent-{index:08d}",
+            "position": {"x": rng.uniform(-1000, 1000), "y": rng.uniform(0, 50), "z": rng.uniform(-1000, 1000)},
+            "orientation": {"x": rng.uniform(-1, 1), "y": rng.uniform(-3, 3), "z": 0.0},
+            "lastUpdated": (_EPOCH + timedelta(milliseconds=index % 50)).isoformat(),
+        }
+        for index in range(count)
+    ]
+
+def scene_rows(count: int, rng: random.Random, fanout: int = 8) -> List[Any]:
+    world = "world-0"
+    rows: List[Any] = [
+        TableWorldGLTF(vircadia_uuid=world, vircadia_name="bench"),
+        TableAccessor(vircadia_uuid="accessor-0", gltf_count=24, gltf_type="VEC3", gltf_componentType=5126, gltf_min=[-1, -1, -1], gltf_max=[1, 1, 1]),
+        TableMesh(vircadia_uuid="mesh-0", vircadia_world_uuid=world, gltf_primitives=[{"attributes": {"POSITION": "accessor-0"}}]),
+    ]
+    nodes = [
+        TableNode(
+            vircadia_uuid=f"node-{index}",
+            vircadia_world_uuid=world,
+            gltf_name=f"node {index}",
+            gltf_mesh="mesh-0" if index % 2 else None,
+            gltf_translation=[rng.uniform(-500, 500), rng.uniform(0, 20), rng.uniform(-500, 500)],
+            gltf_rotation=[0.0, 0.0, 0.0, 1.0],
+            gltf_scale=[1.0, 1.0, 1.0],
+            vircadia_babylonjs_lod_mode="distance" if index % 3 == 0 else None,
+            vircadia_babylonjs_lod_distance=50.0 if index % 3 == 0 else None,
+        )
+        for index in range(count)
+    ]
+    # A `fanout`-ary tree: node i's children are the next `fanout` nodes in breadth-first order.
+    for index in range(1, count):
+        parent = nodes[(index - 1) // fanout]
+        if parent.gltf_children is None:
+            parent.gltf_children = []
+        parent.gltf_children.append(nodes[index].vircadia_uuid)
+    rows.extend(nodes)
+    rows.append(TableScene(vircadia_uuid="scene-0", vircadia_world_uuid=world, gltf_nodes=["node-0"]))
+    return rows
+
+def metadata_rows(count: int, rng: random.Random) -> List[TableMetadata]:
+    teams = ["red", "redwood", "blue", "green", "gold"]
+    rows: List[TableMetadata] = []
+    for index in range(count // 3):
+        entity = f"entity-{index}"
+        rows.append(TableMetadata(metadata_id=f"team-{index}", entity_id=entity, key="team", values_text=[rng.choice(teams)]))
+        rows.append(TableMetadata(metadata_id=f"hp-{index}", entity_id=entity, key="hp", values_numeric=[rng.randint(0, 100)]))
+        rows.append(TableMetadata(metadata_id=f"alive-{index}", entity_id=entity, key="alive", values_boolean=[index % 2 == 0]))
+    return rows
+
+# Presence
+
+@benchmark("presence", (1_000, 100_000))
+def presence_parse_single(size: int, rng: random.Random) -> Callable[[], Any]:
+    objs = presence_dicts(size, rng)
+    return lambda: [Presence.parse(obj) for obj in objs]
+
+@benchmark("presence", (1_000, 100_000))
+def presence_parse_many(size: int, rng: random.Random) -> Callable[[], Any]:
+    objs = presence_dicts(size, rng)
+    return lambda: Presence.parse_many(objs)
+
+@benchmark("presence", (1_000, 100_000))
+def presence_parse_json_bytes(size: int, rng: random.Random) -> Callable[[], Any]:
+    buf = json.dumps(presence_dicts(size, rng)).encode()
+    return lambda: Presence.parse_json_bytes(buf)
+
+# Primitives
+
+@benchmark("primitive", (100_000,))
+def vector3_allocate(size: int, rng: random.Random) -> Callable[[], Any]:
+    values = [rng.random() for _ in range(size)]
+    return lambda: [Vector3(value, value, value) for value in values]
+
+@benchmark("primitive", (100_000,))
+def color3_allocate(size: int, rng: random.Random) -> Callable[[], Any]:
+    values = [rng.random() for _ in range(size)]
+    return lambda: [Color3(value, value, value) for value in values]
+
+@benchmark("primitive", (100_000,))
+def vector3_add_scalar(size: int, rng: random.Random) -> Callable[[], Any]:
+    a = [Vector3(rng.random(), rng.random(), rng.random()) for _ in range(size)]
+    b = [Vector3(rng.random(), rng.random(), rng.random()) for _ in range(size)]
+    return lambda: [Vector3(p.x + q.x, p.y + q.y, p.z + q.z) for p, q in zip(a, b)]
+
+@benchmark("primitive", (100_000, 1_000_000))
+def vector3_array_math(size: int, rng: random.Random) -> Callable[[], Any]:
+    seed = rng.randrange(1 << 30)
+    a = Vector3Array(np.random.default_rng(seed).random((size, 3)))
+    b = Vector3Array(np.random.default_rng(seed + 1).random((size, 3)))
+    return lambda: ((a + b) * 0.5).cross(b).normalized().length()
+
+@benchmark("primitive", (100_000, 1_000_000))
+def color3_array_clamp(size: int, rng: random.Random) -> Callable[[], Any]:
+    colors = Color3Array(np.random.default_rng(rng.randrange(1 << 30)).random((size, 3)) * 2)
+    return lambda: colors.clamped()
+
+# Table codecs
+
+def _codec_rows(size: int, rng: random.Random) -> List[Any]:
+    return [row for row in scene_rows(size, rng) if isinstance(row, TableNode)]
+
+@benchmark("codec", (1_000, 100_000, 1_000_000))
+def node_to_dicts(size: int, rng: random.Random) -> Callable[[], Any]:
+    rows = _codec_rows(size, rng)
+    return lambda: CODECS[TableNode].to_dicts(rows)
+
+@benchmark("codec", (1_000, 100_000, 1_000_000))
+def node_from_dicts(size: int, rng: random.Random) -> Callable[[], Any]:
+    objs = CODECS[TableNode].to_dicts(_codec_rows(size, rng))
+    return lambda: CODECS[TableNode].from_dicts(objs)
+
+@benchmark("codec", (1_000, 100_000, 1_000_000))
+def node_to_json_bytes(size: int, rng: random.Random) -> Callable[[], Any]:
+    rows = _codec_rows(size, rng)
+    return lambda: CODECS[TableNode].to_json_bytes(rows)
+
+@benchmark("codec", (1_000, 100_000, 1_000_000))
+def node_from_json_bytes(size: int, rng: random.Random) -> Callable[[], Any]:
+    buf = CODECS[TableNode].to_json_bytes(_codec_rows(size, rng))
+    return lambda: CODECS[TableNode].from_json_bytes(buf)
+
+# World graph
+
+@benchmark("graph", (100_000,))
+def world_graph_build(size: int, rng: random.Random) -> Callable[[], Any]:
+    rows = scene_rows(size, rng)
+    return lambda: WorldGraph(rows)
+
+@benchmark("graph", (100_000,))
+def world_graph_unreachable(size: int, rng: random.Random) -> Callable[[], Any]:
+    graph = WorldGraph(scene_rows(size, rng))
+    return lambda: graph.unreachable("world-0")
+
+# Metadata
+
+@benchmark("metadata", (100_000,))
+def metadata_index_build(size: int, rng: random.Random) -> Callable[[], Any]:
+    rows = metadata_rows(size, rng)
+    return lambda: MetadataIndex(rows)
+
+@benchmark("metadata", (100_000,))
+def metadata_query(size: int, rng: random.Random) -> Callable[[], Any]:
+    index = MetadataIndex(metadata_rows(size, rng))
+    query = And(Prefix("team", "red"), Range("hp", 10, 50), Eq("alive", True))
+    return lambda: index.query(query)
+
+def measure(run: Callable[[], Any], repeat: int, min_time: float) -> List[float]:
+    # Timed with the collector off, as timeit does, so one run's garbage does not land
+    # in the next run's measurement; fast cases are batched up to `min_time` per sample.
+    number = 1
+    start = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - start
+    if elapsed < min_time:
+        number = max(int(min_time / max(elapsed, 1e-9)), 1)
+    samples = []
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                run()
+            samples.append((time.perf_counter() - start) / number)
+    finally:
+        if enabled:
+            gc.enable()
+    return samples
+
+def run_benchmarks(
+    groups: Optional[Sequence[str]] = None,
+    names: Optional[Sequence[str]] = None,
+    max_size: Optional[int] = None,
+    repeat: int = 5,
+    min_time: float = 0.05,
+    seed: int = 0,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    results = []
+    for bench in BENCHMARKS:
+        if groups and bench.group not in groups:
+            continue
+        if names and not any(name in bench.name for name in names):
+            continue
+        for size in bench.sizes:
+            if max_size is not None and size > max_size:
+                continue
+            run = bench.setup(size, random.Random(f"{seed}:{bench.name}:{size}"))
+            samples = measure(run, repeat, min_time)
+            del run
+            gc.collect()
+            result = {
+                "name": bench.name,
+                "group": bench.group,
+                "size": size,
+                "repeat": repeat,
+                "min": min(samples),
+                "median": statistics.median(samples),
+                "mean": statistics.fmean(samples),
+                "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+                "ns_per_item": min(samples) / size * 1e9,
+            }
+            results.append(result)
+            if progress is not None:
+                progress(result)
+    return {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "seed": seed,
+        "results": results,
+    }
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float = 1.25) -> List[Dict[str, Any]]:
+    # Compares the best-of-N times, which are the least noisy statistic of a run.
+    previous = {(result["name"], result["size"]): result for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        before = previous.get((result["name"], result["size"]))
+        if before is None or before["min"] <= 0:
+            continue
+        ratio = result["min"] / before["min"]
+        if ratio > threshold:
+            regressions.append({"name": result["name"], "size": result["size"], "baseline": before["min"], "current": result["min"], "ratio": ratio})
+    return regressions
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the world schema, presence and primitive hot paths.")
+    parser.add_argument("--group", action="append", help="only run this group (repeatable)")
+    parser.add_argument("--filter", action="append", help="only run benchmarks whose name contains this (repeatable)")
+    parser.add_argument("--max-size", type=int, help="skip sizes above this row count")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.05, help="seconds each sample runs for at least")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="baseline results file; exit non-zero on regressions")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown ratio counted as a regression")
+    parser.add_argument("--list", action="store_true", help="list benchmarks and exit")
+    args = parser.parse_args(argv)
+    if args.list:
+        for bench in BENCHMARKS:
+            print(f"{bench.group:10} {bench.name:28} {', '.join(str(size) for size in bench.sizes)}")
+        return 0
+
+    def report(result: Dict[str, Any]) -> None:
+        print(
+            f"{result['group']:10} {result['name']:28} {result['size']:>9}  "
+            f"min {result['min'] * 1e3:10.3f} ms  median {result['median'] * 1e3:10.3f} ms  "
+            f"{result['ns_per_item']:10.1f} ns/item",
+            file=sys.stderr,
+        )
+
+    results = run_benchmarks(args.group, args.filter, args.max_size, args.repeat, args.min_time, args.seed, report)
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(results, file, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        for regression in regressions:
+            print(
+                f"REGRESSION {regression['name']} [{regression['size']}]: "
+                f"{regression['baseline'] * 1e3:.3f} ms -> {regression['current'] * 1e3:.3f} ms ({regression['ratio']:.2f}x)",
+                file=sys.stderr,
+            )
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+import heapq
+import json
+import os
+import tempfile
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from .agent import to_epoch_us
+from .world import Table, TABLE_ROWS, CODECS
+from .graph import WorldGraph, ROW_TABLES
+from .mutation import Operation, TABLE_KEYS
+
+VERSION_FIELDS: Dict[Table, str] = {
+    table: "updated_at" if table is Table.AGENT_PROFILES else "updatedat" if table.value.endswith("_metadata") else "vircadia_updatedat"
+    for table in Table
+}
+
+@dataclass
+class ChangeEvent:
+    sequence: int
+    table: Table
+    operation: Operation
+    key: str
+    row: Optional[Dict[str, Any]] = None
+    version: Optional[datetime] = None
+
+    @classmethod
+    def parse(cls, obj: Dict[str, Any]) -> 'ChangeEvent':
+        table = Table(obj['table'])
+        row = obj.get('row')
+        key = obj.get('key')
+        if key is None and row is not None:
+            key = row.get(TABLE_KEYS[table])
+        version = obj.get('version')
+        if version is None and row is not None:
+            version = row.get(VERSION_FIELDS[table])
+        return cls(
+            sequence=int(obj['sequence']),
+            table=table,
+            operation=Operation(obj['operation']),
+            key=key,
+            row=row,
+            version=datetime.fromisoformat(version) if isinstance(version, str) else version,
+        )
+
+class MemoryEventSource:
+    def __init__(self, events: Iterable[ChangeEvent] = ()):
+        self._events: List[ChangeEvent] = sorted(events, key=lambda event: event.sequence)
+
+    def append(self, event: ChangeEvent) -> None:
+        self._events.append(event)
+        if len(self._events) > 1 and self._events[-2].sequence > event.sequence:
+            self._events.sort(key=lambda item: item.sequence)
+
+    def events(self, since: int) -> Iterator[ChangeEvent]:
+        return iter([event for event in self._events if event.sequence > since])
+
+class WorldReplica:
+    def __init__(
+        self,
+        graph: Optional[WorldGraph] = None,
+        snapshot_path: Optional[str] = None,
+        snapshot_every: int = 10000,
+    ):
+        self.graph = graph
+        self.snapshot_path = snapshot_path
+        self.snapshot_every = snapshot_every
+        self.watermark = 0
+        self._ahead: Set[int] = set()
+        self._rows: Dict[Table, Dict[str, Any]] = {}
+        self._versions: Dict[Tuple[Table, str], Optional[datetime]] = {}
+        # Deleted keys remember the version and sequence they were deleted at, so a late
+        # create or update for the same row cannot resurrect it. Once the watermark passes
+        # the delete, every earlier event has been applied or will be dropped, so the
+        # tombstone is pruned; the heap orders them by sequence for that.
+        self._tombstones: Dict[Tuple[Table, str], Tuple[Optional[datetime], int]] = {}
+        self._tombstone_heap: List[Tuple[int, Table, str]] = []
+        self._since_snapshot = 0
+
+    def __len__(self) -> int:
+        return sum(len(rows) for rows in self._rows.values())
+
+    def rows(self, table: Table) -> Dict[str, Any]:
+        return self._rows.get(Table(table), {})
+
+    def get(self, table: Table, key: str) -> Any:
+        return self._rows.get(Table(table), {}).get(key)
+
+    def sync(self, source: Any) -> int:
+        return self.apply_many(source.events(self.watermark))
+
+    def apply_many(self, events: Iterable[ChangeEvent]) -> int:
+        applied = 0
+        for event in events:
+            applied += self.apply(event)
+        return applied
+
+    def apply(self, event: ChangeEvent) -> bool:
+        if event.sequence <= self.watermark or event.sequence in self._ahead:
+            return False
+        applied = self._apply(event)
+        self._advance(event.sequence)
+        self._since_snapshot += 1
+        if self.snapshot_path is not None and self._since_snapshot >= self.snapshot_every:
+            self.snapshot(self.snapshot_path)
+        return applied
+
+    def snapshot(self, path: str) -> None:
+        state = {
+            "watermark": self.watermark,
+            "ahead": sorted(self._ahead),
+            "rows": {table.value: CODECS[TABLE_ROWS[table]].to_dicts(rows.values()) for table, rows in self._rows.items()},
+            "versions": [
+                [table.value, key, version.isoformat() if version is not None else None]
+                for (table, key), version in self._versions.items()
+            ],
+            "tombstones": [
+                [table.value, key, version.isoformat() if version is not None else None, sequence]
+                for (table, key), (version, sequence) in self._tombstones.items()
+            ],
+        }
+        directory = os.path.dirname(os.path.abspath(path))
+        handle, temporary = tempfile.mkstemp(dir=directory, prefix=".snapshot-")
+        try:
+            with os.fdopen(handle, "w") as file:
+                json.dump(state, file, separators=(",", ":"))
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+        self._since_snapshot = 0
+
+    @classmethod
+    def restore(cls, path: str, graph: Optional[WorldGraph] = None, snapshot_every: int = 10000) -> 'WorldReplica':
+        replica = cls(graph, snapshot_path=path, snapshot_every=snapshot_every)
+        with open(path) as file:
+            state = json.load(file)
+        replica.watermark = state["watermark"]
+        replica._ahead = set(state["ahead"])
+        for table_name, rows in state["rows"].items():
+            table = Table(table_name)
+            key_name = TABLE_KEYS[table]
+            codec = CODECS[TABLE_ROWS[table]]
+            for obj in rows:
+                replica._store(table, obj[key_name], codec.from_dict(obj))
+        for table_name, key, version in state["versions"]:
+            replica._versions[(Table(table_name), key)] = datetime.fromisoformat(version) if version else None
+        for table_name, key, version, sequence in state["tombstones"]:
+            replica._bury((Table(table_name), key), datetime.fromisoformat(version) if version else None, sequence)
+        return replica
+
+    def _apply(self, event: ChangeEvent) -> bool:
+        ident = (event.table, event.key)
+        if not self._is_newer(ident, event.version):
+            return False
+        if event.operation is Operation.DELETE:
+            self._versions.pop(ident, None)
+            self._bury(ident, event.version, event.sequence)
+            rows = self._rows.get(event.table)
+            if rows is not None and rows.pop(event.key, None) is not None and self.graph is not None and TABLE_ROWS[event.table] in ROW_TABLES:
+                self.graph.remove(event.key)
+            return True
+        if event.row is None:
+            raise ValueError(f"{event.operation.value} event {event.sequence} carries no row")
+        self._tombstones.pop(ident, None)
+        self._versions[ident] = event.version
+        self._store(event.table, event.key, CODECS[TABLE_ROWS[event.table]].from_dict(event.row))
+        return True
+
+    def _is_newer(self, ident: Tuple[Table, str], version: Optional[datetime]) -> bool:
+        if ident in self._versions:
+            current = self._versions[ident]
+        elif ident in self._tombstones:
+            current = self._tombstones[ident][0]
+        else:
+            return True
+        # Unversioned events cannot be ordered, so they are applied as they arrive.
+        if version is None or current is None:
+            return True
+        # Compared as UTC epoch values so naive (UTC) and aware versions can be mixed.
+        return to_epoch_us(version) > to_epoch_us(current)
+
+    def _bury(self, ident: Tuple[Table, str], version: Optional[datetime], sequence: int) -> None:
+        self._tombstones[ident] = (version, sequence)
+        heapq.heappush(self._tombstone_heap, (sequence, *ident))
+
+    def _prune_tombstones(self) -> None:
+        heap = self._tombstone_heap
+        while heap and heap[0][0] <= self.watermark:
+            sequence, table, key = heapq.heappop(heap)
+            # Entries for keys that were recreated or deleted again since are stale.
+            tombstone = self._tombstones.get((table, key))
+            if tombstone is not None and tombstone[1] == sequence:
+                del self._tombstones[(table, key)]
+
+    def _store(self, table: Table, key: str, row: Any) -> None:
+        self._rows.setdefault(table, {})[key] = row
+        if self.graph is not None and type(row) in ROW_TABLES:
+            self.graph.upsert(row)
+
+    def _advance(self, sequence: int) -> None:
+        if sequence != self.watermark + 1:
+            self._ahead.add(sequence)
+            return
+        self.watermark = sequence
+        while self.watermark + 1 in self._ahead:
+            self.watermark += 1
+            self._ahead.discard(self.watermark)
+        self._prune_tombstones()
@@ -0,0 +1,317 @@
+from math import atan, cos, sin, tan
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from .agent import Presence
+from .graph import WorldGraph
+from .world import Babylon, Table, TableNode
+
+LOD_LEVELS: Tuple[Babylon.LOD.Level, ...] = tuple(Babylon.LOD.Level)
+
+_LEAF_SIZE = 8
+
+# Babylon's glTF loader parents a left-handed scene under a __root__ node rotated 180
+# degrees about Y and scaled (1, 1, -1); together that mirrors X. Presence positions and
+# orientations are Babylon-space, so viewers are mirrored back into glTF space by this.
+GLTF_TO_BABYLON = np.array([-1.0, 1.0, 1.0])
+
+def quaternion_matrices(quaternions: np.ndarray) -> np.ndarray:
+    x, y, z, w = np.asarray(quaternions, dtype=np.float64).T
+    out = np.empty((len(x), 3, 3))
+    out[:, 0, 0] = 1 - 2 * (y * y + z * z)
+    out[:, 0, 1] = 2 * (x * y - z * w)
+    out[:, 0, 2] = 2 * (x * z + y * w)
+    out[:, 1, 0] = 2 * (x * y + z * w)
+    out[:, 1, 1] = 1 - 2 * (x * x + z * z)
+    out[:, 1, 2] = 2 * (y * z - x * w)
+    out[:, 2, 0] = 2 * (x * z - y * w)
+    out[:, 2, 1] = 2 * (y * z + x * w)
+    out[:, 2, 2] = 1 - 2 * (x * x + y * y)
+    return out
+
+def local_matrices(nodes: List[TableNode]) -> np.ndarray:
+    count = len(nodes)
+    translation = np.zeros((count, 3))
+    rotation = np.zeros((count, 4))
+    rotation[:, 3] = 1.0
+    scale = np.ones((count, 3))
+    explicit: List[int] = []
+    for index, node in enumerate(nodes):
+        if node.gltf_matrix is not None:
+            explicit.append(index)
+            continue
+        if node.gltf_translation is not None:
+            translation[index] = node.gltf_translation
+        if node.gltf_rotation is not None:
+            rotation[index] = node.gltf_rotation
+        if node.gltf_scale is not None:
+            scale[index] = node.gltf_scale
+    out = np.zeros((count, 4, 4))
+    out[:, :3, :3] = quaternion_matrices(rotation) * scale[:, None, :]
+    out[:, :3, 3] = translation
+    out[:, 3, 3] = 1.0
+    if explicit:
+        # glTF stores matrices column-major.
+        out[explicit] = np.array([nodes[index].gltf_matrix for index in explicit], dtype=np.float64).reshape(-1, 4, 4).transpose(0, 2, 1)
+    return out
+
+def world_matrices(local: np.ndarray, parents: np.ndarray) -> np.ndarray:
+    # Nodes are composed a depth level at a time, so each level is one batched matmul.
+    depth = np.zeros(len(parents), dtype=np.int64)
+    ancestor = parents.copy()
+    for _ in range(len(parents) + 1):
+        linked = ancestor >= 0
+        if not linked.any():
+            break
+        depth += linked
+        ancestor[linked] = parents[ancestor[linked]]
+    else:
+        raise ValueError("Node hierarchy contains a cycle")
+    world = local.copy()
+    order = np.argsort(depth, kind='stable')
+    bounds = np.searchsorted(depth[order], np.arange(1, int(depth.max(initial=0)) + 2))
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        level = order[lo:hi]
+        world[level] = np.matmul(world[parents[level]], local[level])
+    return world
+
+def transform_bounds(matrices: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    center = (lo + hi) * 0.5
+    extent = (hi - lo) * 0.5
+    world_center = np.einsum('nij,nj->ni', matrices[:, :3, :3], center) + matrices[:, :3, 3]
+    world_extent = np.einsum('nij,nj->ni', np.abs(matrices[:, :3, :3]), extent)
+    return world_center - world_extent, world_center + world_extent
+
+def view_basis(orientation: Any) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Presence orientation is a Babylon Euler rotation: yaw about Y, pitch about X,
+    # roll about Z, with the camera looking down +Z.
+    pitch, yaw, roll = float(orientation.x), float(orientation.y), float(orientation.z)
+    cy, sy, cp, sp, cr, sr = cos(yaw), sin(yaw), cos(pitch), sin(pitch), cos(roll), sin(roll)
+    rotation = np.array([[cy, 0, sy], [0, 1, 0], [-sy, 0, cy]]) @ np.array([[1, 0, 0], [0, cp, -sp], [0, sp, cp]]) @ np.array([[cr, -sr, 0], [sr, cr, 0], [0, 0, 1]])
+    return rotation[:, 0], rotation[:, 1], rotation[:, 2]
+
+def frustum_planes(
+    position: np.ndarray,
+    orientation: Any,
+    fov: float = 0.8,
+    aspect: float = 16 / 9,
+    near: float = 1.0,
+    far: float = 10000.0,
+) -> np.ndarray:
+    right, up, forward = view_basis(orientation)
+    vertical = fov * 0.5
+    horizontal = atan(tan(vertical) * aspect)
+    normals = np.array([
+        forward,
+        -forward,
+        right * cos(horizontal) + forward * sin(horizontal),
+        -right * cos(horizontal) + forward * sin(horizontal),
+        up * cos(vertical) + forward * sin(vertical),
+        -up * cos(vertical) + forward * sin(vertical),
+    ])
+    offsets = -normals @ position
+    offsets[0] -= near
+    offsets[1] += far
+    # Rows are (nx, ny, nz, d); a point is inside when n.p + d >= 0 for every plane.
+    return np.column_stack([normals, offsets])
+
+def _classify(planes: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    center = (lo + hi) * 0.5
+    extent = (hi - lo) * 0.5
+    distance = center @ planes[:, :3].T + planes[:, 3]
+    radius = extent @ np.abs(planes[:, :3]).T
+    outside = (distance < -radius).any(axis=1)
+    inside = (distance >= radius).all(axis=1)
+    return outside, inside
+
+class BVH:
+    def __init__(self, lo: np.ndarray, hi: np.ndarray, leaf_size: int = _LEAF_SIZE):
+        count = len(lo)
+        self.order = np.arange(count)
+        starts: List[int] = []
+        ends: List[int] = []
+        children: List[int] = []
+        centers = (lo + hi) * 0.5
+        stack = [(0, count, -1)] if count else []
+        while stack:
+            start, end, parent = stack.pop()
+            index = len(starts)
+            if parent >= 0:
+                children[parent] = index
+            starts.append(start)
+            ends.append(end)
+            children.append(-1)
+            if end - start <= leaf_size:
+                continue
+            # Median split on the widest axis of the centroids; the left child always
+            # directly follows its parent, so only the right child's index is stored.
+            items = self.order[start:end]
+            spread = centers[items]
+            axis = int(np.argmax(spread.max(axis=0) - spread.min(axis=0)))
+            middle = (end - start) // 2
+            self.order[start:end] = items[np.argpartition(spread[:, axis], middle)]
+            stack.append((start + middle, end, index))
+            stack.append((start, start + middle, -1))
+        self.starts = np.array(starts, dtype=np.int64)
+        self.ends = np.array(ends, dtype=np.int64)
+        # Every node covers a contiguous run of the final order, so all node bounds come
+        # from one reduceat over interleaved (start, end) offsets; the padding row keeps
+        # an end offset equal to the item count in range.
+        offsets = np.column_stack([self.starts, self.ends]).ravel()
+        pad = np.zeros((1, 3))
+        self.lo = np.minimum.reduceat(np.concatenate([lo[self.order], pad]), offsets)[::2].reshape(-1, 3)
+        self.hi = np.maximum.reduceat(np.concatenate([hi[self.order], pad]), offsets)[::2].reshape(-1, 3)
+        self.right = np.array(children, dtype=np.int64)
+        self._item_lo = lo
+        self._item_hi = hi
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def cull(self, planes: np.ndarray) -> np.ndarray:
+        if not len(self.starts):
+            return np.empty(0, dtype=np.int64)
+        found: List[np.ndarray] = []
+        frontier = np.zeros(1, dtype=np.int64)
+        while len(frontier):
+            outside, inside = _classify(planes, self.lo[frontier], self.hi[frontier])
+            for node in frontier[inside]:
+                found.append(self.order[self.starts[node]:self.ends[node]])
+            partial = frontier[~outside & ~inside]
+            leaf = self.right[partial] < 0
+            for node in partial[leaf]:
+                items = self.order[self.starts[node]:self.ends[node]]
+                item_outside, _ = _classify(planes, self._item_lo[items], self._item_hi[items])
+                found.append(items[~item_outside])
+            branches = partial[~leaf]
+            frontier = np.concatenate([branches + 1, self.right[branches]])
+        return np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+
+class CullingService:
+    def __init__(
+        self,
+        graph: WorldGraph,
+        world_uuid: str,
+        leaf_size: int = _LEAF_SIZE,
+        axes: Optional[np.ndarray] = GLTF_TO_BABYLON,
+    ):
+        # `axes` is None for a scene with useRightHandedSystem, where no mirroring happens.
+        self.graph = graph
+        self.world_uuid = world_uuid
+        self.leaf_size = leaf_size
+        self.axes = np.ones(3) if axes is None else np.asarray(axes, dtype=np.float64)
+        self.refresh()
+
+    def refresh(self) -> None:
+        graph = self.graph
+        nodes: List[TableNode] = graph.in_world(self.world_uuid, Table.NODES)
+        slots = {node.vircadia_uuid: index for index, node in enumerate(nodes)}
+        parents = np.full(len(nodes), -1, dtype=np.int64)
+        for index, node in enumerate(nodes):
+            for child in node.gltf_children or ():
+                slot = slots.get(child)
+                if slot is not None:
+                    parents[slot] = index
+        self.nodes = nodes
+        self.matrices = world_matrices(local_matrices(nodes), parents)
+        mesh_bounds: Dict[str, Optional[Tuple[np.ndarray, np.ndarray]]] = {}
+        bounded: List[int] = []
+        local_lo: List[np.ndarray] = []
+        local_hi: List[np.ndarray] = []
+        for index, node in enumerate(nodes):
+            if node.gltf_mesh is None:
+                continue
+            if node.gltf_mesh not in mesh_bounds:
+                mesh_bounds[node.gltf_mesh] = self._mesh_bounds(node.gltf_mesh)
+            bounds = mesh_bounds[node.gltf_mesh]
+            if bounds is not None:
+                bounded.append(index)
+                local_lo.append(bounds[0])
+                local_hi.append(bounds[1])
+        self._bounded = np.array(bounded, dtype=np.int64)
+        if bounded:
+            self.lo, self.hi = transform_bounds(self.matrices[self._bounded], np.array(local_lo), np.array(local_hi))
+        else:
+            self.lo = self.hi = np.empty((0, 3))
+        self.bvh = BVH(self.lo, self.hi, self.leaf_size)
+        self._lod_columns(graph)
+
+    def visible(
+        self,
+        viewer: Presence,
+        fov: float = 0.8,
+        aspect: float = 16 / 9,
+        near: float = 1.0,
+        far: float = 10000.0,
+    ) -> Dict[str, Babylon.LOD.Level]:
+        position = np.array([viewer.position.x, viewer.position.y, viewer.position.z], dtype=np.float64)
+        planes = frustum_planes(position, viewer.orientation, fov, aspect, near, far)
+        # A diagonal +-1 mirror is its own inverse: n.(Mp) = (Mn).p, so mirroring the normals
+        # and the position moves the frustum into glTF space.
+        planes[:, :3] *= self.axes
+        position = position * self.axes
+        hits = self.bvh.cull(planes)
+        levels = self.lod_levels(hits, position, fov)
+        shown = levels >= 0
+        nodes = self.nodes
+        return {
+            nodes[node].vircadia_uuid: LOD_LEVELS[level]
+            for node, level in zip(self._bounded[hits[shown]].tolist(), levels[shown].tolist())
+        }
+
+    def lod_levels(self, items: np.ndarray, position: np.ndarray, fov: float = 0.8) -> np.ndarray:
+        # Each LOD level starts where the previous threshold doubles: distance mode
+        # steps by lod_distance, size mode by halving screen coverage below lod_size.
+        # Hidden items come back as -1.
+        lo, hi = self.lo[items], self.hi[items]
+        distance = np.maximum(np.linalg.norm((lo + hi) * 0.5 - position, axis=1), 1e-9)
+        coverage = np.linalg.norm(hi - lo, axis=1) * 0.5 / (distance * tan(fov * 0.5))
+        by_size = self._lod_size_mode[items]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = np.where(by_size, self._lod_threshold[items] / coverage, distance / self._lod_threshold[items])
+            steps = np.floor(np.log2(ratio)) + 1
+        levels = np.where(np.isfinite(ratio) & (ratio >= 1), np.clip(steps, 0, len(LOD_LEVELS) - 1), 0).astype(np.int64)
+        hide = self._lod_hide[items]
+        hidden = np.where(by_size, coverage < hide, distance > hide)
+        levels[hidden] = -1
+        return levels
+
+    def _lod_columns(self, graph: WorldGraph) -> None:
+        count = len(self._bounded)
+        self._lod_size_mode = np.zeros(count, dtype=bool)
+        self._lod_threshold = np.full(count, np.nan)
+        # NaN compares false either way, so items without lod_hide are never hidden.
+        self._lod_hide = np.full(count, np.nan)
+        for item, index in enumerate(self._bounded.tolist()):
+            node = self.nodes[index]
+            source = node.babylon_traits
+            if source is None or source.vircadia_babylonjs_lod_mode is None:
+                mesh = graph.get(node.gltf_mesh)
+                source = mesh.babylon_traits if mesh is not None else None
+            if source is None or source.vircadia_babylonjs_lod_mode is None:
+                continue
+            mode = source.vircadia_babylonjs_lod_mode
+            size_mode = Babylon.LOD.Mode(mode) is Babylon.LOD.Mode.SIZE
+            threshold = source.vircadia_babylonjs_lod_size if size_mode else source.vircadia_babylonjs_lod_distance
+            self._lod_size_mode[item] = size_mode
+            if threshold is not None and threshold > 0:
+                self._lod_threshold[item] = threshold
+            if source.vircadia_babylonjs_lod_hide is not None:
+                self._lod_hide[item] = source.vircadia_babylonjs_lod_hide
+
+    def _mesh_bounds(self, mesh_uuid: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        mesh = self.graph.get(mesh_uuid)
+        if mesh is None:
+            return None
+        lo: Optional[np.ndarray] = None
+        hi: Optional[np.ndarray] = None
+        for primitive in mesh.gltf_primitives or ():
+            if not isinstance(primitive, dict):
+                continue
+            accessor = self.graph.get((primitive.get("attributes") or {}).get("POSITION"))
+            if accessor is None or accessor.gltf_min is None or accessor.gltf_max is None:
+                continue
+            low = np.array(accessor.gltf_min[:3], dtype=np.float64)
+            high = np.array(accessor.gltf_max[:3], dtype=np.float64)
+            lo = low if lo is None else np.minimum(lo, low)
+            hi = high if hi is None else np.maximum(hi, high)
+        return None if lo is None else (lo, hi)
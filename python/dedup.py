@@ -0,0 +1,220 @@
+import hashlib
+import json
+import sqlite3
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+from .gltf import GLTFImporter, _decode_data_uri, load_buffer
+from .world import CODECS, Table, TableBuffer, TableBufferView
+
+# Bookkeeping columns that differ between otherwise identical rows.
+_IDENTITY_FIELDS = frozenset((
+    "vircadia_uuid",
+    "vircadia_version",
+    "vircadia_createdat",
+    "vircadia_updatedat",
+    "vircadia_world_uuid",
+    "gltf_name",
+))
+
+# Fields that hold free-form data rather than row references, so they are never rewritten.
+_OPAQUE_FIELDS = frozenset(("gltf_name", "gltf_uri", "gltf_mimeType", "gltf_extras", "gltf_extensions"))
+
+DEDUP_KINDS: Dict[Table, str] = {
+    Table.BUFFERS: "buffer",
+    Table.BUFFER_VIEWS: "bufferView",
+    Table.IMAGES: "image",
+    Table.SAMPLERS: "sampler",
+    Table.TEXTURES: "texture",
+    Table.MATERIALS: "material",
+}
+
+_CHUNK = 1 << 20
+
+def content_digest(data: Any, kind: str = "buffer") -> bytes:
+    # BLAKE2b over 1 MiB slices of a zero-copy view, so mapped buffers are hashed without
+    # being read into memory whole.
+    view = memoryview(data).cast("B")
+    digest = hashlib.blake2b(digest_size=32, person=kind.encode())
+    for start in range(0, len(view), _CHUNK):
+        digest.update(view[start:start + _CHUNK])
+    return digest.digest()
+
+def _rewrite(value: Any, replaced: Dict[str, str]) -> Any:
+    if isinstance(value, str):
+        return replaced.get(value, value)
+    if isinstance(value, list):
+        return [_rewrite(item, replaced) for item in value]
+    if isinstance(value, dict):
+        return {key: _rewrite(item, replaced) for key, item in value.items()}
+    return value
+
+class Deduplicator:
+    def __init__(self, index_path: str = ":memory:", load: Callable[[TableBuffer], Any] = load_buffer):
+        self.load = load
+        self.replaced: Dict[str, str] = {}
+        self.stats: Counter = Counter()
+        self._buffers: Dict[str, TableBuffer] = {}
+        self._buffer_views: Dict[str, TableBufferView] = {}
+        self._db = sqlite3.connect(index_path)
+        # Row matches are scoped to one world: the exporter, WorldGraph.in_world/unreachable
+        # and world deletion all treat a world's rows as its own, so a reference into another
+        # world would break export and dangle once that world is gone. Bytes are shared
+        # across worlds instead: a buffer or image whose content is already stored keeps its
+        # own row but points at the stored copy's uri.
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS world_content ("
+            " world_uuid TEXT NOT NULL, kind TEXT NOT NULL, digest BLOB NOT NULL, uuid TEXT NOT NULL,"
+            " PRIMARY KEY (world_uuid, kind, digest)) WITHOUT ROWID"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS content ("
+            " kind TEXT NOT NULL, digest BLOB NOT NULL, uri TEXT NOT NULL,"
+            " PRIMARY KEY (kind, digest)) WITHOUT ROWID"
+        )
+        self._db.commit()
+
+    def __enter__(self) -> 'Deduplicator':
+        return self
+
+    def __exit__(self, exc_type: Any, *exc: Any) -> None:
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        self.close()
+
+    def commit(self) -> None:
+        self._db.commit()
+
+    def rollback(self) -> None:
+        self._db.rollback()
+
+    def close(self) -> None:
+        self._db.close()
+
+    def lookup(self, world_uuid: Optional[str], kind: str, digest: bytes) -> Optional[str]:
+        found = self._db.execute(
+            "SELECT uuid FROM world_content WHERE world_uuid = ? AND kind = ? AND digest = ?",
+            (world_uuid or "", kind, digest),
+        ).fetchone()
+        return None if found is None else found[0]
+
+    def content_uri(self, kind: str, digest: bytes) -> Optional[str]:
+        found = self._db.execute("SELECT uri FROM content WHERE kind = ? AND digest = ?", (kind, digest)).fetchone()
+        return None if found is None else found[0]
+
+    def dedup(self, rows: Iterable[Tuple[Table, Any]]) -> Iterator[Tuple[Table, Any]]:
+        # Rows must arrive referenced-first (as GLTFImporter.rows yields them). Duplicates
+        # are dropped and every later reference to them is pointed at the stored original;
+        # rows are rewritten in place. Index entries stay uncommitted until commit(), so a
+        # failed insert of the yielded rows can be rolled back with them.
+        replaced = self.replaced
+        for table, row in rows:
+            if replaced:
+                self._rewrite_references(row)
+            kind = DEDUP_KINDS.get(table)
+            if kind is None:
+                yield table, row
+                continue
+            if table is Table.BUFFERS:
+                self._buffers[row.vircadia_uuid] = row
+            elif table is Table.BUFFER_VIEWS:
+                self._buffer_views[row.vircadia_uuid] = row
+            world_uuid = row.vircadia_world_uuid
+            content = self._content_digest(table, row)
+            digest = content if table is Table.BUFFERS else self.digest(table, row, content)
+            existing = self.lookup(world_uuid, kind, digest)
+            if existing is not None and existing != row.vircadia_uuid:
+                replaced[row.vircadia_uuid] = existing
+                # The duplicate holds the same bytes, so it stands in for the stored row when
+                # later images rewritten to point at that row need their content.
+                if table is Table.BUFFERS:
+                    self._buffers.setdefault(existing, row)
+                elif table is Table.BUFFER_VIEWS:
+                    self._buffer_views.setdefault(existing, row)
+                self.stats[f"{kind}_duplicates"] += 1
+                if table is Table.BUFFERS:
+                    self.stats["bytes_saved"] += row.gltf_byteLength or 0
+                continue
+            if existing is None:
+                self._db.execute(
+                    "INSERT INTO world_content (world_uuid, kind, digest, uuid) VALUES (?, ?, ?, ?)",
+                    (world_uuid or "", kind, digest, row.vircadia_uuid),
+                )
+            if content is not None and row.gltf_uri is not None:
+                self._share(table, kind, content, row)
+            self.stats[f"{kind}_kept"] += 1
+            yield table, row
+
+    def digest(self, table: Table, row: Any, content: Optional[bytes] = None) -> bytes:
+        kind = DEDUP_KINDS[table]
+        if table is Table.BUFFERS:
+            return content if content is not None else content_digest(self._buffer_bytes(row), kind)
+        canonical = {
+            name: value
+            for name, value in CODECS[type(row)].to_dict(row).items()
+            if name not in _IDENTITY_FIELDS
+        }
+        if table is Table.IMAGES:
+            # Images are keyed by their encoded bytes, wherever those live, so the same
+            # texture embedded by two different assets in a world still collapses to one row.
+            if content is None:
+                content = self._content_digest(table, row)
+            if content is not None:
+                canonical.pop("gltf_uri", None)
+                canonical.pop("gltf_bufferView", None)
+                canonical["content"] = content.hex()
+        encoded = json.dumps(canonical, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode()
+        return hashlib.blake2b(encoded, digest_size=32, person=kind.encode()).digest()
+
+    def _content_digest(self, table: Table, row: Any) -> Optional[bytes]:
+        if table is Table.BUFFERS:
+            return content_digest(self._buffer_bytes(row), DEDUP_KINDS[table])
+        if table is Table.IMAGES:
+            data = self._image_bytes(row)
+            return None if data is None else content_digest(data, DEDUP_KINDS[table])
+        return None
+
+    def _share(self, table: Table, kind: str, content: bytes, row: Any) -> None:
+        uri = self.content_uri(kind, content)
+        if uri is None:
+            self._db.execute("INSERT INTO content (kind, digest, uri) VALUES (?, ?, ?)", (kind, content, row.gltf_uri))
+        elif uri != row.gltf_uri:
+            row.gltf_uri = uri
+            self.stats[f"{kind}_shared"] += 1
+            if table is Table.BUFFERS:
+                self.stats["bytes_shared"] += row.gltf_byteLength or 0
+
+    def _buffer_bytes(self, row: TableBuffer) -> Any:
+        data = memoryview(self.load(row)).cast("B")
+        return data[:row.gltf_byteLength] if row.gltf_byteLength is not None else data
+
+    def _image_bytes(self, row: Any) -> Optional[Any]:
+        if row.gltf_bufferView is not None:
+            view = self._buffer_views.get(row.gltf_bufferView)
+            buffer = self._buffers.get(view.gltf_buffer) if view is not None else None
+            if buffer is None:
+                return None
+            start = view.gltf_byteOffset or 0
+            return self._buffer_bytes(buffer)[start:start + (view.gltf_byteLength or 0)]
+        if row.gltf_uri is not None and row.gltf_uri.startswith("data:"):
+            return _decode_data_uri(row.gltf_uri)
+        return None
+
+    def _rewrite_references(self, row: Any) -> None:
+        replaced = self.replaced
+        for name, value in vars(row).items():
+            if name.startswith("gltf_") and name not in _OPAQUE_FIELDS and value is not None:
+                rewritten = _rewrite(value, replaced)
+                if rewritten != value:
+                    setattr(row, name, rewritten)
+
+def dedup_import(
+    path: str,
+    index_path: str,
+    world_name: Optional[str] = None,
+    world_uuid: Optional[str] = None,
+) -> Iterator[Tuple[Table, Any]]:
+    with GLTFImporter(path, world_name, world_uuid=world_uuid) as importer:
+        with Deduplicator(index_path, lambda row: importer.buffer_data(row.vircadia_uuid)) as deduplicator:
+            yield from deduplicator.dedup(importer.rows())
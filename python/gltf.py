@@ -0,0 +1,922 @@
+import base64
+import json
+import mmap
+import os
+import struct
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple, Union
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlparse
+import numpy as np
+from .graph import WorldGraph
+from .world import (
+    Table,
+    TableWorldGLTF,
+    TableScene,
+    TableNode,
+    TableMesh,
+    TableMaterial,
+    TableTexture,
+    TableImage,
+    TableSampler,
+    TableAnimation,
+    TableSkin,
+    TableCamera,
+    TableBuffer,
+    TableBufferView,
+    TableAccessor,
+)
+
+GLB_MAGIC = 0x46546C67
+GLB_VERSION = 2
+GLB_CHUNK_JSON = 0x4E4F534A
+GLB_CHUNK_BIN = 0x004E4942
+
+_GLB_HEADER = struct.Struct("<III")
+_GLB_CHUNK_HEADER = struct.Struct("<II")
+
+_PBR_TEXTURES = ("baseColorTexture", "metallicRoughnessTexture")
+
+COMPONENT_DTYPES: Dict[int, np.dtype] = {
+    5120: np.dtype("<i1"),
+    5121: np.dtype("<u1"),
+    5122: np.dtype("<i2"),
+    5123: np.dtype("<u2"),
+    5125: np.dtype("<u4"),
+    5126: np.dtype("<f4"),
+}
+
+# (columns, rows) per accessor type; columns is 1 for scalars and vectors.
+ACCESSOR_SHAPES: Dict[str, Tuple[int, int]] = {
+    "SCALAR": (1, 1),
+    "VEC2": (1, 2),
+    "VEC3": (1, 3),
+    "VEC4": (1, 4),
+    "MAT2": (2, 2),
+    "MAT3": (3, 3),
+    "MAT4": (4, 4),
+}
+
+_NORMALIZED_DIVISORS = {5120: 127.0, 5121: 255.0, 5122: 32767.0, 5123: 65535.0, 5125: 4294967295.0}
+
+class GLBChunk:
+    __slots__ = ("type", "offset", "length")
+
+    def __init__(self, type: int, offset: int, length: int):
+        self.type = type
+        self.offset = offset
+        self.length = length
+
+def iter_glb_chunks(file: BinaryIO) -> Iterator[GLBChunk]:
+    header = file.read(_GLB_HEADER.size)
+    if len(header) < _GLB_HEADER.size:
+        raise ValueError("Truncated GLB header")
+    magic, version, length = _GLB_HEADER.unpack(header)
+    if magic != GLB_MAGIC:
+        raise ValueError("Not a GLB file")
+    if version != GLB_VERSION:
+        raise ValueError(f"Unsupported GLB version {version}")
+    offset = _GLB_HEADER.size
+    while offset < length:
+        file.seek(offset)
+        chunk_header = file.read(_GLB_CHUNK_HEADER.size)
+        if len(chunk_header) < _GLB_CHUNK_HEADER.size:
+            raise ValueError("Truncated GLB chunk header")
+        chunk_length, chunk_type = _GLB_CHUNK_HEADER.unpack(chunk_header)
+        offset += _GLB_CHUNK_HEADER.size
+        yield GLBChunk(chunk_type, offset, chunk_length)
+        offset += chunk_length
+
+class GLTFImporter:
+    def __init__(
+        self,
+        path: str,
+        world_name: Optional[str] = None,
+        new_uuid: Callable[[], str] = lambda: str(uuid.uuid4()),
+        world_uuid: Optional[str] = None,
+    ):
+        self.path = os.fspath(path)
+        # Importing into an existing world adds its rows there and emits no world row.
+        self.target_world_uuid = world_uuid
+        self.world_name = world_name if world_name is not None else os.path.basename(self.path)
+        self._new_uuid = new_uuid
+        self._file: Optional[BinaryIO] = None
+        self._maps: Dict[str, mmap.mmap] = {}
+        self._bin: Optional[GLBChunk] = None
+        self._buffers: Dict[str, Any] = {}
+        self.document: Dict[str, Any] = {}
+        self.world_uuid: Optional[str] = None
+        self._uuids: Dict[str, List[str]] = {}
+
+    def __enter__(self) -> 'GLTFImporter':
+        self.open()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def open(self) -> None:
+        if self._file is not None:
+            return
+        self._file = open(self.path, "rb")
+        if self._file.read(4) == struct.pack("<I", GLB_MAGIC):
+            self._file.seek(0)
+            # Only the JSON chunk is read; the BIN chunk is located and later mapped in place.
+            for chunk in iter_glb_chunks(self._file):
+                if chunk.type == GLB_CHUNK_JSON and not self.document:
+                    self._file.seek(chunk.offset)
+                    self.document = json.loads(self._file.read(chunk.length))
+                elif chunk.type == GLB_CHUNK_BIN and self._bin is None:
+                    self._bin = chunk
+        else:
+            self._file.seek(0)
+            self.document = json.load(self._file)
+        if not self.document:
+            raise ValueError(f"{self.path} has no glTF JSON")
+        self.world_uuid = self.target_world_uuid or self._new_uuid()
+        self._uuids = {
+            key: [self._new_uuid() for _ in self.document.get(key, ())]
+            for key in (
+                "scenes", "nodes", "meshes", "materials", "textures", "images", "samplers",
+                "animations", "skins", "cameras", "buffers", "bufferViews", "accessors",
+            )
+        }
+
+    def close(self) -> None:
+        self._buffers.clear()
+        for mapped in self._maps.values():
+            try:
+                mapped.close()
+            except BufferError:
+                # A caller still holds a view into this buffer; it is released with the view.
+                pass
+        self._maps.clear()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def uuid_of(self, key: str, index: Optional[int]) -> Optional[str]:
+        if index is None:
+            return None
+        return self._uuids[key][index]
+
+    def rows(self) -> Iterator[Tuple[Table, Any]]:
+        self.open()
+        doc = self.document
+        if self.target_world_uuid is None:
+            yield Table.WORLD_GLTF, TableWorldGLTF(
+                vircadia_uuid=self.world_uuid,
+                vircadia_name=self.world_name,
+                gltf_asset=doc.get("asset"),
+                gltf_extensionsUsed=doc.get("extensionsUsed"),
+                gltf_extensionsRequired=doc.get("extensionsRequired"),
+                gltf_scene=doc.get("scene"),
+                gltf_extensions=doc.get("extensions"),
+                gltf_extras=doc.get("extras"),
+            )
+        # Referenced tables come first so a consumer inserting rows in order never sees
+        # a reference to a row it has not been given yet (skins/nodes excepted, as glTF
+        # allows them to reference each other).
+        for table, key, build in (
+            (Table.BUFFERS, "buffers", self._buffer),
+            (Table.BUFFER_VIEWS, "bufferViews", self._buffer_view),
+            (Table.ACCESSORS, "accessors", self._accessor),
+            (Table.SAMPLERS, "samplers", self._sampler),
+            (Table.IMAGES, "images", self._image),
+            (Table.TEXTURES, "textures", self._texture),
+            (Table.MATERIALS, "materials", self._material),
+            (Table.MESHES, "meshes", self._mesh),
+            (Table.CAMERAS, "cameras", self._camera),
+            (Table.SKINS, "skins", self._skin),
+            (Table.NODES, "nodes", self._node),
+            (Table.ANIMATIONS, "animations", self._animation),
+            (Table.SCENES, "scenes", self._scene),
+        ):
+            uuids = self._uuids[key]
+            for index, obj in enumerate(doc.get(key, ())):
+                yield table, build(uuids[index], obj)
+
+    def buffer_data(self, buffer_uuid: str) -> memoryview:
+        data = self._buffers.get(buffer_uuid)
+        if data is not None:
+            return data
+        self.open()
+        index = self._uuids["buffers"].index(buffer_uuid)
+        obj = self.document["buffers"][index]
+        uri = obj.get("uri")
+        if uri is None:
+            if index != 0 or self._bin is None:
+                raise ValueError(f"Buffer {index} has no uri and there is no GLB BIN chunk")
+            mapped = self._map(self.path)
+            data = memoryview(mapped)[self._bin.offset:self._bin.offset + obj.get("byteLength", self._bin.length)]
+        elif uri.startswith("data:"):
+            data = memoryview(_decode_data_uri(uri))
+        elif "://" in uri:
+            raise ValueError(f"Buffer {index} references a remote uri: {uri}")
+        else:
+            mapped = self._map(os.path.join(os.path.dirname(self.path), unquote(uri)))
+            data = memoryview(mapped)[:obj.get("byteLength", len(mapped))]
+        self._buffers[buffer_uuid] = data
+        return data
+
+    def _map(self, path: str) -> mmap.mmap:
+        mapped = self._maps.get(path)
+        if mapped is None:
+            with open(path, "rb") as file:
+                mapped = self._maps[path] = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return mapped
+
+    def _common(self, row_uuid: str, obj: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "vircadia_uuid": row_uuid,
+            "vircadia_world_uuid": self.world_uuid,
+            "gltf_name": obj.get("name"),
+            "gltf_extensions": obj.get("extensions"),
+            "gltf_extras": obj.get("extras"),
+        }
+
+    def _texture_info(self, info: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if info is None:
+            return None
+        return {**info, "index": self.uuid_of("textures", info.get("index"))}
+
+    def _uuid_list(self, key: str, indices: Optional[List[int]]) -> Optional[List[str]]:
+        if indices is None:
+            return None
+        uuids = self._uuids[key]
+        return [uuids[index] for index in indices]
+
+    def _scene(self, row_uuid: str, obj: Dict[str, Any]) -> TableScene:
+        return TableScene(**self._common(row_uuid, obj), gltf_nodes=self._uuid_list("nodes", obj.get("nodes")))
+
+    def _node(self, row_uuid: str, obj: Dict[str, Any]) -> TableNode:
+        return TableNode(
+            **self._common(row_uuid, obj),
+            gltf_camera=self.uuid_of("cameras", obj.get("camera")),
+            gltf_children=self._uuid_list("nodes", obj.get("children")),
+            gltf_skin=self.uuid_of("skins", obj.get("skin")),
+            gltf_matrix=obj.get("matrix"),
+            gltf_mesh=self.uuid_of("meshes", obj.get("mesh")),
+            gltf_rotation=obj.get("rotation"),
+            gltf_scale=obj.get("scale"),
+            gltf_translation=obj.get("translation"),
+            gltf_weights=obj.get("weights"),
+        )
+
+    def _mesh(self, row_uuid: str, obj: Dict[str, Any]) -> TableMesh:
+        accessors = self._uuids["accessors"]
+        primitives = []
+        for primitive in obj.get("primitives", ()):
+            primitive = dict(primitive)
+            primitive["attributes"] = {name: accessors[index] for name, index in primitive.get("attributes", {}).items()}
+            if "indices" in primitive:
+                primitive["indices"] = accessors[primitive["indices"]]
+            if "material" in primitive:
+                primitive["material"] = self.uuid_of("materials", primitive["material"])
+            if "targets" in primitive:
+                primitive["targets"] = [
+                    {name: accessors[index] for name, index in target.items()} for target in primitive["targets"]
+                ]
+            primitives.append(primitive)
+        return TableMesh(**self._common(row_uuid, obj), gltf_primitives=primitives, gltf_weights=obj.get("weights"))
+
+    def _material(self, row_uuid: str, obj: Dict[str, Any]) -> TableMaterial:
+        pbr = obj.get("pbrMetallicRoughness")
+        if pbr is not None:
+            pbr = dict(pbr)
+            for name in _PBR_TEXTURES:
+                if name in pbr:
+                    pbr[name] = self._texture_info(pbr[name])
+        return TableMaterial(
+            **self._common(row_uuid, obj),
+            gltf_pbrMetallicRoughness=pbr,
+            gltf_normalTexture=self._texture_info(obj.get("normalTexture")),
+            gltf_occlusionTexture=self._texture_info(obj.get("occlusionTexture")),
+            gltf_emissiveTexture=self._texture_info(obj.get("emissiveTexture")),
+            gltf_emissiveFactor=obj.get("emissiveFactor"),
+            gltf_alphaMode=obj.get("alphaMode"),
+            gltf_alphaCutoff=obj.get("alphaCutoff"),
+            gltf_doubleSided=obj.get("doubleSided"),
+        )
+
+    def _texture(self, row_uuid: str, obj: Dict[str, Any]) -> TableTexture:
+        return TableTexture(
+            **self._common(row_uuid, obj),
+            gltf_sampler=self.uuid_of("samplers", obj.get("sampler")),
+            gltf_source=self.uuid_of("images", obj.get("source")),
+        )
+
+    def _image(self, row_uuid: str, obj: Dict[str, Any]) -> TableImage:
+        return TableImage(
+            **self._common(row_uuid, obj),
+            gltf_uri=self._absolute_uri(obj.get("uri")),
+            gltf_mimeType=obj.get("mimeType"),
+            gltf_bufferView=self.uuid_of("bufferViews", obj.get("bufferView")),
+        )
+
+    def _sampler(self, row_uuid: str, obj: Dict[str, Any]) -> TableSampler:
+        return TableSampler(
+            **self._common(row_uuid, obj),
+            gltf_magFilter=obj.get("magFilter"),
+            gltf_minFilter=obj.get("minFilter"),
+            gltf_wrapS=obj.get("wrapS"),
+            gltf_wrapT=obj.get("wrapT"),
+        )
+
+    def _animation(self, row_uuid: str, obj: Dict[str, Any]) -> TableAnimation:
+        accessors = self._uuids["accessors"]
+        channels = []
+        for channel in obj.get("channels", ()):
+            target = dict(channel.get("target", {}))
+            if "node" in target:
+                target["node"] = self.uuid_of("nodes", target["node"])
+            channels.append({**channel, "target": target})
+        samplers = [
+            {**sampler, "input": accessors[sampler["input"]], "output": accessors[sampler["output"]]}
+            for sampler in obj.get("samplers", ())
+        ]
+        return TableAnimation(**self._common(row_uuid, obj), gltf_channels=channels, gltf_samplers=samplers)
+
+    def _skin(self, row_uuid: str, obj: Dict[str, Any]) -> TableSkin:
+        return TableSkin(
+            **self._common(row_uuid, obj),
+            gltf_inverseBindMatrices=self.uuid_of("accessors", obj.get("inverseBindMatrices")),
+            gltf_skeleton=self.uuid_of("nodes", obj.get("skeleton")),
+            gltf_joints=self._uuid_list("nodes", obj.get("joints")),
+        )
+
+    def _camera(self, row_uuid: str, obj: Dict[str, Any]) -> TableCamera:
+        return TableCamera(
+            **self._common(row_uuid, obj),
+            gltf_type=obj.get("type"),
+            gltf_orthographic=obj.get("orthographic"),
+            gltf_perspective=obj.get("perspective"),
+        )
+
+    def _buffer(self, row_uuid: str, obj: Dict[str, Any]) -> TableBuffer:
+        # Rows outlive the importer, so every buffer gets a uri load_buffer can resolve on
+        # its own: the GLB BIN chunk becomes a byte range of the .glb file and relative
+        # paths become absolute file uris.
+        uri = self._absolute_uri(obj.get("uri"))
+        if uri is None and self._bin is not None and row_uuid == self._uuids["buffers"][0]:
+            uri = glb_chunk_uri(self.path, self._bin.offset, obj.get("byteLength", self._bin.length))
+        return TableBuffer(**self._common(row_uuid, obj), gltf_uri=uri, gltf_byteLength=obj.get("byteLength"))
+
+    def _buffer_view(self, row_uuid: str, obj: Dict[str, Any]) -> TableBufferView:
+        return TableBufferView(
+            **self._common(row_uuid, obj),
+            gltf_buffer=self.uuid_of("buffers", obj.get("buffer")),
+            gltf_byteOffset=obj.get("byteOffset"),
+            gltf_byteLength=obj.get("byteLength"),
+            gltf_byteStride=obj.get("byteStride"),
+            gltf_target=obj.get("target"),
+        )
+
+    def _accessor(self, row_uuid: str, obj: Dict[str, Any]) -> TableAccessor:
+        sparse = obj.get("sparse")
+        if sparse is not None:
+            sparse = {
+                **sparse,
+                "indices": {**sparse["indices"], "bufferView": self.uuid_of("bufferViews", sparse["indices"]["bufferView"])},
+                "values": {**sparse["values"], "bufferView": self.uuid_of("bufferViews", sparse["values"]["bufferView"])},
+            }
+        return TableAccessor(
+            **self._common(row_uuid, obj),
+            gltf_bufferView=self.uuid_of("bufferViews", obj.get("bufferView")),
+            gltf_byteOffset=obj.get("byteOffset"),
+            gltf_componentType=obj.get("componentType"),
+            gltf_normalized=obj.get("normalized"),
+            gltf_count=obj.get("count"),
+            gltf_type=obj.get("type"),
+            gltf_max=obj.get("max"),
+            gltf_min=obj.get("min"),
+            gltf_sparse=sparse,
+        )
+
+    def _absolute_uri(self, uri: Optional[str]) -> Optional[str]:
+        # Relative uris resolve against the imported file's directory.
+        if uri is None or uri.startswith("data:") or urlparse(uri).scheme:
+            return uri
+        return Path(os.path.dirname(os.path.abspath(self.path)), unquote(uri)).as_uri()
+
+def _decode_data_uri(uri: str) -> bytes:
+    header, _, payload = uri.partition(",")
+    if header.endswith(";base64"):
+        return base64.b64decode(payload)
+    return unquote(payload).encode("latin-1")
+
+def glb_chunk_uri(path: str, offset: int, length: int) -> str:
+    return f"{Path(os.path.abspath(path)).as_uri()}#offset={offset}&length={length}"
+
+def load_buffer(row: TableBuffer, base_dir: str = ".") -> Any:
+    uri = row.gltf_uri
+    if uri is None:
+        raise ValueError(f"Buffer {row.vircadia_uuid} has no uri")
+    if uri.startswith("data:"):
+        return _decode_data_uri(uri)
+    parsed = urlparse(uri)
+    if parsed.scheme == "file":
+        path = unquote(parsed.path)
+    elif parsed.scheme:
+        raise ValueError(f"Buffer {row.vircadia_uuid} references a remote uri: {uri}")
+    else:
+        path = os.path.join(base_dir, unquote(uri))
+    # A `#offset=..&length=..` fragment selects a byte range, such as a GLB BIN chunk.
+    fragment = parse_qs(parsed.fragment)
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return b""
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    if "offset" not in fragment:
+        return mapped
+    offset = int(fragment["offset"][0])
+    length = int(fragment["length"][0]) if "length" in fragment else len(mapped) - offset
+    if offset + length > len(mapped):
+        raise ValueError(f"Buffer {row.vircadia_uuid} range runs past the end of {path}")
+    return memoryview(mapped)[offset:offset + length]
+
+class AccessorReader:
+    def __init__(
+        self,
+        rows: Any,
+        load: Callable[[TableBuffer], Any] = load_buffer,
+        cache_bytes: int = 256 * 1024 * 1024,
+    ):
+        # `rows` is anything with get(uuid) -> row, e.g. a WorldGraph or a plain dict.
+        self.rows = rows
+        self.load = load
+        self.cache_bytes = cache_bytes
+        self._cache: "OrderedDict[Tuple[str, str], Tuple[Any, int]]" = OrderedDict()
+        # Buffers each cached sparse accessor was assembled from, so evicting a buffer
+        # also drops the sparse arrays built from it.
+        self._sparse_buffers: Dict[str, Set[str]] = {}
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cached_bytes(self) -> int:
+        return self._cached_bytes
+
+    def buffer(self, buffer_uuid: str) -> memoryview:
+        key = ("buffer", buffer_uuid)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+        row = self._row(buffer_uuid, TableBuffer)
+        data = memoryview(self.load(row)).cast("B")
+        if row.gltf_byteLength is not None:
+            data = data[:row.gltf_byteLength]
+        self._store(key, data, data.nbytes)
+        return data
+
+    def buffer_view(self, buffer_view_uuid: str) -> memoryview:
+        view = self._row(buffer_view_uuid, TableBufferView)
+        data = self.buffer(view.gltf_buffer)
+        start = view.gltf_byteOffset or 0
+        end = start + view.gltf_byteLength if view.gltf_byteLength is not None else len(data)
+        return data[start:end]
+
+    def view(self, accessor: Any) -> np.ndarray:
+        # The accessor's dense data as a read-only view over the cached buffer; no copy is
+        # made, so sparse substitution and normalization are not applied.
+        accessor = self._accessor(accessor)
+        dtype, columns, rows_, count = _accessor_layout(accessor)
+        shape = (count,) if columns * rows_ == 1 else (count, rows_) if columns == 1 else (count, columns, rows_)
+        if accessor.gltf_bufferView is None:
+            return np.zeros(shape, dtype=dtype)
+        view = self._row(accessor.gltf_bufferView, TableBufferView)
+        data = self.buffer_view(accessor.gltf_bufferView)
+        offset = accessor.gltf_byteOffset or 0
+        # Matrix columns of 1- and 2-byte components are padded to 4-byte boundaries.
+        column_stride = -(-rows_ * dtype.itemsize // 4) * 4 if columns > 1 else rows_ * dtype.itemsize
+        element_size = column_stride * columns
+        stride = view.gltf_byteStride or element_size
+        if count and offset + stride * (count - 1) + element_size > len(data):
+            raise ValueError(f"Accessor {accessor.vircadia_uuid} reads past the end of its bufferView")
+        if columns * rows_ == 1:
+            strides: Tuple[int, ...] = (stride,)
+        elif columns == 1:
+            strides = (stride, dtype.itemsize)
+        else:
+            strides = (stride, column_stride, dtype.itemsize)
+        array = np.ndarray(shape, dtype=dtype, buffer=data, offset=offset, strides=strides)
+        array.flags.writeable = False
+        return array
+
+    def read(self, accessor: Any, normalize: bool = True) -> np.ndarray:
+        accessor = self._accessor(accessor)
+        array = self._sparse(accessor) if accessor.gltf_sparse else self.view(accessor)
+        if normalize and accessor.gltf_normalized and accessor.gltf_componentType in _NORMALIZED_DIVISORS:
+            divisor = _NORMALIZED_DIVISORS[accessor.gltf_componentType]
+            array = array.astype(np.float32) / np.float32(divisor)
+            if accessor.gltf_componentType in (5120, 5122):
+                np.maximum(array, -1.0, out=array)
+        return array
+
+    def bounds(self, accessor: Any) -> Tuple[np.ndarray, np.ndarray]:
+        accessor = self._accessor(accessor)
+        if accessor.gltf_min is not None and accessor.gltf_max is not None and not accessor.gltf_sparse:
+            return np.asarray(accessor.gltf_min, dtype=np.float64), np.asarray(accessor.gltf_max, dtype=np.float64)
+        data = self.read(accessor)
+        return data.min(axis=0).astype(np.float64), data.max(axis=0).astype(np.float64)
+
+    def evict(self, buffer_uuid: Optional[str] = None) -> None:
+        with self._lock:
+            if buffer_uuid is None:
+                self._cache.clear()
+                self._sparse_buffers.clear()
+                self._cached_bytes = 0
+                return
+            stale = [
+                key for key in self._cache
+                if key[1] == buffer_uuid or key[0] == "sparse" and buffer_uuid in self._sparse_buffers.get(key[1], ())
+            ]
+            for key in stale:
+                self._cached_bytes -= self._cache.pop(key)[1]
+                if key[0] == "sparse":
+                    self._sparse_buffers.pop(key[1], None)
+
+    def _sparse(self, accessor: TableAccessor) -> np.ndarray:
+        key = ("sparse", accessor.vircadia_uuid)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+        array = np.array(self.view(accessor))
+        sparse = accessor.gltf_sparse
+        count = sparse["count"]
+        indices = sparse["indices"]
+        values = sparse["values"]
+        index_dtype = COMPONENT_DTYPES[indices["componentType"]]
+        index_data = self.buffer_view(indices["bufferView"])
+        substitutes = np.frombuffer(index_data, dtype=index_dtype, count=count, offset=indices.get("byteOffset", 0))
+        value_data = self.buffer_view(values["bufferView"])
+        per_element = int(np.prod(array.shape[1:], dtype=np.int64))
+        replacement = np.frombuffer(value_data, dtype=array.dtype, count=count * per_element, offset=values.get("byteOffset", 0))
+        array[substitutes.astype(np.intp)] = replacement.reshape((count,) + array.shape[1:])
+        array.flags.writeable = False
+        views = [indices["bufferView"], values["bufferView"]]
+        if accessor.gltf_bufferView is not None:
+            views.append(accessor.gltf_bufferView)
+        with self._lock:
+            self._sparse_buffers[accessor.vircadia_uuid] = {self._row(view, TableBufferView).gltf_buffer for view in views}
+        self._store(key, array, array.nbytes)
+        return array
+
+    def _accessor(self, accessor: Any) -> TableAccessor:
+        return accessor if isinstance(accessor, TableAccessor) else self._row(accessor, TableAccessor)
+
+    def _row(self, uuid_: Optional[str], row_type: type) -> Any:
+        row = self.rows.get(uuid_) if uuid_ is not None else None
+        if not isinstance(row, row_type):
+            raise KeyError(f"No {row_type.__name__} with uuid {uuid_}")
+        return row
+
+    def _cached(self, key: Tuple[str, str]) -> Any:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            self._cache.move_to_end(key)
+            return entry[0]
+
+    def _store(self, key: Tuple[str, str], value: Any, size: int) -> None:
+        with self._lock:
+            previous = self._cache.pop(key, None)
+            if previous is not None:
+                self._cached_bytes -= previous[1]
+            self._cache[key] = (value, size)
+            self._cached_bytes += size
+            # Evicted entries stay valid for callers still holding them; the cache only
+            # drops its own reference so the memory can go once those views are gone.
+            while self._cached_bytes > self.cache_bytes and len(self._cache) > 1:
+                _, (_, evicted) = self._cache.popitem(last=False)
+                self._cached_bytes -= evicted
+
+def _accessor_layout(accessor: TableAccessor) -> Tuple[np.dtype, int, int, int]:
+    try:
+        dtype = COMPONENT_DTYPES[accessor.gltf_componentType]
+        columns, rows = ACCESSOR_SHAPES[accessor.gltf_type]
+    except KeyError:
+        raise ValueError(
+            f"Accessor {accessor.vircadia_uuid} has unsupported componentType/type "
+            f"{accessor.gltf_componentType}/{accessor.gltf_type}"
+        ) from None
+    return dtype, columns, rows, accessor.gltf_count or 0
+
+def import_gltf(path: str, world_name: Optional[str] = None) -> Iterator[Tuple[Table, Any]]:
+    with GLTFImporter(path, world_name) as importer:
+        yield from importer.rows()
+
+_GLB_ALIGNMENT = 4
+
+# glTF top-level arrays in the order they are written, with the table that backs them.
+_EXPORT_TABLES: Tuple[Tuple[str, Table], ...] = (
+    ("scenes", Table.SCENES),
+    ("nodes", Table.NODES),
+    ("meshes", Table.MESHES),
+    ("materials", Table.MATERIALS),
+    ("textures", Table.TEXTURES),
+    ("images", Table.IMAGES),
+    ("samplers", Table.SAMPLERS),
+    ("animations", Table.ANIMATIONS),
+    ("skins", Table.SKINS),
+    ("cameras", Table.CAMERAS),
+    ("buffers", Table.BUFFERS),
+    ("bufferViews", Table.BUFFER_VIEWS),
+    ("accessors", Table.ACCESSORS),
+)
+
+class GLBExporter:
+    def __init__(self, graph: WorldGraph, load: Callable[[TableBuffer], Any] = load_buffer, max_workers: int = 8):
+        self.graph = graph
+        self.load = load
+        self.max_workers = max_workers
+
+    def export(self, world_uuid: str, out: Union[str, os.PathLike, BinaryIO]) -> int:
+        document, segments = self.assemble(world_uuid)
+        if isinstance(out, (str, os.PathLike)):
+            with open(out, "wb") as file:
+                return _write_glb(file, document, segments)
+        return _write_glb(out, document, segments)
+
+    def assemble(self, world_uuid: str) -> Tuple[Dict[str, Any], List[memoryview]]:
+        world = self.graph.get(world_uuid)
+        if not isinstance(world, TableWorldGLTF):
+            raise KeyError(f"No world with uuid {world_uuid}")
+        # in_world keeps insertion order, so positional fields such as gltf_scene still
+        # line up with the rows they were imported from.
+        rows = {key: self.graph.in_world(world_uuid, table) for key, table in _EXPORT_TABLES}
+
+        buffers = rows["buffers"]
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(buffers) or 1))) as pool:
+            payloads = [memoryview(data).cast("B") for data in pool.map(self.load, buffers)]
+        # Every source buffer is appended whole at a 4-byte boundary, so bufferViews only
+        # need their offsets shifted and no buffer bytes are copied before writing.
+        segments: List[memoryview] = []
+        bases: Dict[str, int] = {}
+        offset = 0
+        for row, payload in zip(buffers, payloads):
+            if row.gltf_byteLength is not None:
+                payload = payload[:row.gltf_byteLength]
+            padding = -offset % _GLB_ALIGNMENT
+            if padding:
+                segments.append(memoryview(bytes(padding)))
+                offset += padding
+            bases[row.vircadia_uuid] = offset
+            segments.append(payload)
+            offset += payload.nbytes
+
+        document: Dict[str, Any] = _gltf_common(world)
+        document.pop("name", None)
+        document["asset"] = world.gltf_asset or {"version": "2.0"}
+        if world.gltf_extensionsUsed:
+            document["extensionsUsed"] = world.gltf_extensionsUsed
+        if world.gltf_extensionsRequired:
+            document["extensionsRequired"] = world.gltf_extensionsRequired
+        if world.gltf_scene is not None:
+            document["scene"] = world.gltf_scene
+        if offset:
+            document["buffers"] = [{"byteLength": offset}]
+        encoder = _DocumentEncoder(rows, bases)
+        for key, _ in _EXPORT_TABLES:
+            if key == "buffers":
+                continue
+            encode = getattr(encoder, f"_{key}")
+            objs = [encode(row) for row in rows[key]]
+            if objs:
+                document[key] = objs
+        return document, segments
+
+class _DocumentEncoder:
+    # Per-export state: row positions per glTF array and where each source buffer starts
+    # in the merged binary chunk. Built fresh by every assemble() call, so one exporter
+    # can run several exports at once.
+    def __init__(self, rows: Dict[str, List[Any]], bases: Dict[str, int]):
+        self.indices = {key: {row.vircadia_uuid: index for index, row in enumerate(items)} for key, items in rows.items()}
+        self.bases = bases
+
+    def _index(self, key: str, uuid_: Optional[str]) -> Optional[int]:
+        if uuid_ is None:
+            return None
+        try:
+            return self.indices[key][uuid_]
+        except KeyError:
+            raise ValueError(f"Reference to {uuid_} is not a {key} row of this world") from None
+
+    def _index_list(self, key: str, uuids: Optional[Sequence[str]]) -> Optional[List[int]]:
+        if uuids is None:
+            return None
+        return [self._index(key, value) for value in uuids]
+
+    def _texture_info(self, info: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if info is None:
+            return None
+        return {**info, "index": self._index("textures", info.get("index"))}
+
+    def _scenes(self, row: TableScene) -> Dict[str, Any]:
+        return _compact(_gltf_common(row), nodes=self._index_list("nodes", row.gltf_nodes))
+
+    def _nodes(self, row: TableNode) -> Dict[str, Any]:
+        return _compact(
+            _gltf_common(row),
+            camera=self._index("cameras", row.gltf_camera),
+            children=self._index_list("nodes", row.gltf_children),
+            skin=self._index("skins", row.gltf_skin),
+            matrix=row.gltf_matrix,
+            mesh=self._index("meshes", row.gltf_mesh),
+            rotation=row.gltf_rotation,
+            scale=row.gltf_scale,
+            translation=row.gltf_translation,
+            weights=row.gltf_weights,
+        )
+
+    def _meshes(self, row: TableMesh) -> Dict[str, Any]:
+        primitives = []
+        for primitive in row.gltf_primitives or ():
+            primitive = dict(primitive)
+            primitive["attributes"] = {
+                name: self._index("accessors", value) for name, value in primitive.get("attributes", {}).items()
+            }
+            if "indices" in primitive:
+                primitive["indices"] = self._index("accessors", primitive["indices"])
+            if "material" in primitive:
+                primitive["material"] = self._index("materials", primitive["material"])
+            if "targets" in primitive:
+                primitive["targets"] = [
+                    {name: self._index("accessors", value) for name, value in target.items()}
+                    for target in primitive["targets"]
+                ]
+            primitives.append(primitive)
+        return _compact(_gltf_common(row), primitives=primitives, weights=row.gltf_weights)
+
+    def _materials(self, row: TableMaterial) -> Dict[str, Any]:
+        pbr = row.gltf_pbrMetallicRoughness
+        if pbr is not None:
+            pbr = dict(pbr)
+            for name in _PBR_TEXTURES:
+                if name in pbr:
+                    pbr[name] = self._texture_info(pbr[name])
+        return _compact(
+            _gltf_common(row),
+            pbrMetallicRoughness=pbr,
+            normalTexture=self._texture_info(row.gltf_normalTexture),
+            occlusionTexture=self._texture_info(row.gltf_occlusionTexture),
+            emissiveTexture=self._texture_info(row.gltf_emissiveTexture),
+            emissiveFactor=row.gltf_emissiveFactor,
+            alphaMode=row.gltf_alphaMode,
+            alphaCutoff=row.gltf_alphaCutoff,
+            doubleSided=row.gltf_doubleSided,
+        )
+
+    def _textures(self, row: TableTexture) -> Dict[str, Any]:
+        return _compact(
+            _gltf_common(row),
+            sampler=self._index("samplers", row.gltf_sampler),
+            source=self._index("images", row.gltf_source),
+        )
+
+    def _images(self, row: TableImage) -> Dict[str, Any]:
+        return _compact(
+            _gltf_common(row),
+            uri=row.gltf_uri,
+            mimeType=row.gltf_mimeType,
+            bufferView=self._index("bufferViews", row.gltf_bufferView),
+        )
+
+    def _samplers(self, row: TableSampler) -> Dict[str, Any]:
+        return _compact(
+            _gltf_common(row),
+            magFilter=row.gltf_magFilter,
+            minFilter=row.gltf_minFilter,
+            wrapS=row.gltf_wrapS,
+            wrapT=row.gltf_wrapT,
+        )
+
+    def _animations(self, row: TableAnimation) -> Dict[str, Any]:
+        channels = []
+        for channel in row.gltf_channels or ():
+            target = dict(channel.get("target", {}))
+            if "node" in target:
+                target["node"] = self._index("nodes", target["node"])
+            channels.append({**channel, "target": target})
+        samplers = [
+            {
+                **sampler,
+                "input": self._index("accessors", sampler["input"]),
+                "output": self._index("accessors", sampler["output"]),
+            }
+            for sampler in row.gltf_samplers or ()
+        ]
+        return _compact(_gltf_common(row), channels=channels, samplers=samplers)
+
+    def _skins(self, row: TableSkin) -> Dict[str, Any]:
+        return _compact(
+            _gltf_common(row),
+            inverseBindMatrices=self._index("accessors", row.gltf_inverseBindMatrices),
+            skeleton=self._index("nodes", row.gltf_skeleton),
+            joints=self._index_list("nodes", row.gltf_joints),
+        )
+
+    def _cameras(self, row: TableCamera) -> Dict[str, Any]:
+        return _compact(
+            _gltf_common(row),
+            type=row.gltf_type,
+            orthographic=row.gltf_orthographic,
+            perspective=row.gltf_perspective,
+        )
+
+    def _bufferViews(self, row: TableBufferView) -> Dict[str, Any]:
+        if row.gltf_buffer not in self.bases:
+            raise ValueError(f"Reference to {row.gltf_buffer} is not a buffers row of this world")
+        return _compact(
+            _gltf_common(row),
+            buffer=0,
+            byteOffset=self.bases[row.gltf_buffer] + (row.gltf_byteOffset or 0),
+            byteLength=row.gltf_byteLength,
+            byteStride=row.gltf_byteStride,
+            target=row.gltf_target,
+        )
+
+    def _accessors(self, row: TableAccessor) -> Dict[str, Any]:
+        sparse = row.gltf_sparse
+        if sparse is not None:
+            sparse = {
+                **sparse,
+                "indices": {**sparse["indices"], "bufferView": self._index("bufferViews", sparse["indices"]["bufferView"])},
+                "values": {**sparse["values"], "bufferView": self._index("bufferViews", sparse["values"]["bufferView"])},
+            }
+        return _compact(
+            _gltf_common(row),
+            bufferView=self._index("bufferViews", row.gltf_bufferView),
+            byteOffset=row.gltf_byteOffset,
+            componentType=row.gltf_componentType,
+            normalized=row.gltf_normalized,
+            count=row.gltf_count,
+            type=row.gltf_type,
+            max=row.gltf_max,
+            min=row.gltf_min,
+            sparse=sparse,
+        )
+
+def _gltf_common(row: Any) -> Dict[str, Any]:
+    return _compact({}, name=row.gltf_name, extensions=row.gltf_extensions, extras=row.gltf_extras)
+
+def _compact(obj: Dict[str, Any], **values: Any) -> Dict[str, Any]:
+    for key, value in values.items():
+        if value is not None:
+            obj[key] = value
+    return obj
+
+def _write_glb(file: BinaryIO, document: Dict[str, Any], segments: List[memoryview]) -> int:
+    body = json.dumps(document, separators=(",", ":")).encode()
+    body += b" " * (-len(body) % _GLB_ALIGNMENT)
+    bin_length = sum(segment.nbytes for segment in segments)
+    bin_padding = -bin_length % _GLB_ALIGNMENT
+    total = _GLB_HEADER.size + _GLB_CHUNK_HEADER.size + len(body)
+    if bin_length:
+        total += _GLB_CHUNK_HEADER.size + bin_length + bin_padding
+    parts: List[Any] = [
+        _GLB_HEADER.pack(GLB_MAGIC, GLB_VERSION, total),
+        _GLB_CHUNK_HEADER.pack(len(body), GLB_CHUNK_JSON),
+        body,
+    ]
+    if bin_length:
+        parts.append(_GLB_CHUNK_HEADER.pack(bin_length + bin_padding, GLB_CHUNK_BIN))
+        parts.extend(segments)
+        parts.append(bytes(bin_padding))
+    _write_all(file, parts)
+    return total
+
+def _write_all(file: BinaryIO, parts: List[Any]) -> None:
+    try:
+        fd = file.fileno()
+    except (AttributeError, OSError):
+        fd = None
+    if fd is None or not hasattr(os, "writev"):
+        file.writelines(parts)
+        return
+    # Gather-write the segments straight from their source buffers.
+    file.flush()
+    views = [memoryview(part).cast("B") for part in parts if len(part)]
+    limit = getattr(os, "IOV_MAX", None) or (os.sysconf("SC_IOV_MAX") if hasattr(os, "sysconf") else 1024)
+    # Advance an index past what each call wrote rather than popping from the front.
+    start = 0
+    while start < len(views):
+        written = os.writev(fd, views[start:start + limit])
+        while start < len(views) and written >= views[start].nbytes:
+            written -= views[start].nbytes
+            start += 1
+        if written:
+            views[start] = views[start][written:]
+
+def export_glb(
+    graph: WorldGraph,
+    world_uuid: str,
+    out: Union[str, os.PathLike, BinaryIO],
+    load: Callable[[TableBuffer], Any] = load_buffer,
+    max_workers: int = 8,
+) -> int:
+    return GLBExporter(graph, load, max_workers).export(world_uuid, out)
@@ -0,0 +1,300 @@
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from .world import (
+    Table,
+    TABLE_ROWS,
+    TableWorldGLTF,
+    TableScene,
+    TableNode,
+    TableMesh,
+    TableMaterial,
+    TableTexture,
+    TableImage,
+    TableAnimation,
+    TableSkin,
+    TableBufferView,
+    TableAccessor,
+)
+
+Edge = Tuple[str, str]
+
+ROW_TABLES: Dict[type, Table] = {
+    row_type: table for table, row_type in TABLE_ROWS.items() if table.value.startswith("world_gltf") and not table.value.endswith("_metadata")
+}
+
+_MATERIAL_TEXTURES = ("gltf_normalTexture", "gltf_occlusionTexture", "gltf_emissiveTexture")
+_PBR_TEXTURES = ("baseColorTexture", "metallicRoughnessTexture")
+
+def _ref(edges: List[Edge], label: str, value: Any) -> None:
+    if isinstance(value, str):
+        edges.append((label, value))
+
+def _refs(edges: List[Edge], label: str, values: Any) -> None:
+    if values:
+        for value in values:
+            _ref(edges, label, value)
+
+def _scene_edges(row: TableScene) -> List[Edge]:
+    edges: List[Edge] = []
+    _refs(edges, "gltf_nodes", row.gltf_nodes)
+    return edges
+
+def _node_edges(row: TableNode) -> List[Edge]:
+    edges: List[Edge] = []
+    _ref(edges, "gltf_mesh", row.gltf_mesh)
+    _ref(edges, "gltf_camera", row.gltf_camera)
+    _ref(edges, "gltf_skin", row.gltf_skin)
+    _refs(edges, "gltf_children", row.gltf_children)
+    return edges
+
+def _mesh_edges(row: TableMesh) -> List[Edge]:
+    edges: List[Edge] = []
+    for primitive in row.gltf_primitives or ():
+        if not isinstance(primitive, dict):
+            continue
+        _refs(edges, "gltf_primitives.attributes", (primitive.get("attributes") or {}).values())
+        _ref(edges, "gltf_primitives.indices", primitive.get("indices"))
+        _ref(edges, "gltf_primitives.material", primitive.get("material"))
+        for target in primitive.get("targets") or ():
+            _refs(edges, "gltf_primitives.targets", target.values())
+    return edges
+
+def _material_edges(row: TableMaterial) -> List[Edge]:
+    edges: List[Edge] = []
+    pbr = row.gltf_pbrMetallicRoughness or {}
+    for name in _PBR_TEXTURES:
+        _ref(edges, f"gltf_pbrMetallicRoughness.{name}", (pbr.get(name) or {}).get("index"))
+    for name in _MATERIAL_TEXTURES:
+        _ref(edges, name, (getattr(row, name) or {}).get("index"))
+    return edges
+
+def _texture_edges(row: TableTexture) -> List[Edge]:
+    edges: List[Edge] = []
+    _ref(edges, "gltf_sampler", row.gltf_sampler)
+    _ref(edges, "gltf_source", row.gltf_source)
+    return edges
+
+def _image_edges(row: TableImage) -> List[Edge]:
+    edges: List[Edge] = []
+    _ref(edges, "gltf_bufferView", row.gltf_bufferView)
+    return edges
+
+def _animation_edges(row: TableAnimation) -> List[Edge]:
+    edges: List[Edge] = []
+    for channel in row.gltf_channels or ():
+        _ref(edges, "gltf_channels.target.node", ((channel or {}).get("target") or {}).get("node"))
+    for sampler in row.gltf_samplers or ():
+        _ref(edges, "gltf_samplers.input", (sampler or {}).get("input"))
+        _ref(edges, "gltf_samplers.output", (sampler or {}).get("output"))
+    return edges
+
+def _skin_edges(row: TableSkin) -> List[Edge]:
+    edges: List[Edge] = []
+    _ref(edges, "gltf_inverseBindMatrices", row.gltf_inverseBindMatrices)
+    _ref(edges, "gltf_skeleton", row.gltf_skeleton)
+    _refs(edges, "gltf_joints", row.gltf_joints)
+    return edges
+
+def _buffer_view_edges(row: TableBufferView) -> List[Edge]:
+    edges: List[Edge] = []
+    _ref(edges, "gltf_buffer", row.gltf_buffer)
+    return edges
+
+def _accessor_edges(row: TableAccessor) -> List[Edge]:
+    edges: List[Edge] = []
+    _ref(edges, "gltf_bufferView", row.gltf_bufferView)
+    sparse = row.gltf_sparse or {}
+    _ref(edges, "gltf_sparse.indices.bufferView", (sparse.get("indices") or {}).get("bufferView"))
+    _ref(edges, "gltf_sparse.values.bufferView", (sparse.get("values") or {}).get("bufferView"))
+    return edges
+
+EDGE_EXTRACTORS: Dict[type, Callable[[Any], List[Edge]]] = {
+    TableScene: _scene_edges,
+    TableNode: _node_edges,
+    TableMesh: _mesh_edges,
+    TableMaterial: _material_edges,
+    TableTexture: _texture_edges,
+    TableImage: _image_edges,
+    TableAnimation: _animation_edges,
+    TableSkin: _skin_edges,
+    TableBufferView: _buffer_view_edges,
+    TableAccessor: _accessor_edges,
+}
+
+def _no_edges(row: Any) -> List[Edge]:
+    return []
+
+class WorldGraph:
+    def __init__(self, rows: Iterable[Any] = ()):
+        self._rows: Dict[str, Any] = {}
+        self._tables: Dict[Table, Dict[str, Any]] = {table: {} for table in ROW_TABLES.values()}
+        # Members keep insertion order (dict keys), so a world's rows come back in the
+        # order they were added, as positional glTF fields need.
+        self._worlds: Dict[str, Dict[Table, Dict[str, None]]] = {}
+        self._world_of: Dict[str, str] = {}
+        self._forward: Dict[str, Tuple[Edge, ...]] = {}
+        self._reverse: Dict[str, Dict[str, Set[str]]] = {}
+        for row in rows:
+            self.upsert(row)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, uuid: object) -> bool:
+        return uuid in self._rows
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._rows.values())
+
+    def get(self, uuid: Optional[str]) -> Any:
+        return self._rows.get(uuid) if uuid is not None else None
+
+    def table_of(self, uuid: str) -> Optional[Table]:
+        row = self._rows.get(uuid)
+        return None if row is None else ROW_TABLES[type(row)]
+
+    def rows(self, table: Table) -> Dict[str, Any]:
+        return self._tables[Table(table)]
+
+    def world_uuids(self) -> List[str]:
+        return list(self._worlds)
+
+    def in_world(self, world_uuid: str, table: Optional[Table] = None) -> List[Any]:
+        members = self._worlds.get(world_uuid)
+        if not members:
+            return []
+        if table is not None:
+            return [self._rows[uuid] for uuid in members.get(Table(table), ())]
+        return [self._rows[uuid] for uuids in members.values() for uuid in uuids]
+
+    def upsert(self, row: Any) -> None:
+        table = ROW_TABLES[type(row)]
+        uuid = row.vircadia_uuid
+        if uuid is None:
+            raise ValueError(f"{type(row).__name__} has no vircadia_uuid")
+        previous = self._rows.get(uuid)
+        if previous is not None and type(previous) is not type(row):
+            raise ValueError(f"{uuid} is already a {type(previous).__name__}")
+        self._rows[uuid] = row
+        self._tables[table][uuid] = row
+        world_uuid = uuid if isinstance(row, TableWorldGLTF) else getattr(row, "vircadia_world_uuid", None)
+        if self._world_of.get(uuid) != world_uuid:
+            self._unlink_world(uuid, table)
+            if world_uuid is not None:
+                self._world_of[uuid] = world_uuid
+                self._worlds.setdefault(world_uuid, {}).setdefault(table, {})[uuid] = None
+        edges = tuple(EDGE_EXTRACTORS.get(type(row), _no_edges)(row))
+        old = self._forward.get(uuid, ())
+        if edges != old:
+            self._unlink_edges(uuid, old)
+            self._link_edges(uuid, edges)
+            if edges:
+                self._forward[uuid] = edges
+            else:
+                self._forward.pop(uuid, None)
+
+    def update(self, row: Any) -> None:
+        self.upsert(row)
+
+    def remove(self, uuid: str) -> Any:
+        row = self._rows.pop(uuid, None)
+        if row is None:
+            return None
+        table = ROW_TABLES[type(row)]
+        del self._tables[table][uuid]
+        self._unlink_world(uuid, table)
+        self._unlink_edges(uuid, self._forward.pop(uuid, ()))
+        return row
+
+    def references(self, uuid: str, label: Optional[str] = None) -> List[str]:
+        return [target for edge_label, target in self._forward.get(uuid, ()) if label is None or edge_label == label]
+
+    def resolve(self, uuid: str, label: str) -> List[Any]:
+        rows = self._rows
+        return [rows[target] for target in self.references(uuid, label) if target in rows]
+
+    def referrers(self, uuid: str, label: Optional[str] = None, table: Optional[Table] = None) -> List[str]:
+        sources = self._reverse.get(uuid)
+        if not sources:
+            return []
+        result = []
+        for source, labels in sources.items():
+            if label is not None and label not in labels:
+                continue
+            if table is not None and self.table_of(source) != table:
+                continue
+            result.append(source)
+        return result
+
+    def dependencies(self, uuid: str) -> Set[str]:
+        return self._walk(uuid, lambda current: (target for _, target in self._forward.get(current, ())))
+
+    def dependents(self, uuid: str, table: Optional[Table] = None) -> Set[str]:
+        found = self._walk(uuid, lambda current: self._reverse.get(current, ()))
+        if table is not None:
+            found = {source for source in found if self.table_of(source) == table}
+        return found
+
+    def dangling(self) -> List[Tuple[str, str, str]]:
+        rows = self._rows
+        return [
+            (source, label, target)
+            for source, edges in self._forward.items()
+            for label, target in edges
+            if target not in rows
+        ]
+
+    def unreachable(self, world_uuid: str) -> Set[str]:
+        # Everything a world owns that no scene of that world can reach; the garbage
+        # collection candidates once the world has been fully loaded.
+        roots = [row.vircadia_uuid for row in self.in_world(world_uuid, Table.SCENES)]
+        reachable: Set[str] = set(roots)
+        reachable.add(world_uuid)
+        for root in roots:
+            reachable |= self.dependencies(root)
+        # Animations and skins point at the nodes they drive, not the other way around.
+        for table in (Table.ANIMATIONS, Table.SKINS):
+            for row in self.in_world(world_uuid, table):
+                if any(target in reachable for target in self.references(row.vircadia_uuid)):
+                    reachable.add(row.vircadia_uuid)
+                    reachable |= self.dependencies(row.vircadia_uuid)
+        owned = {uuid for uuids in self._worlds.get(world_uuid, {}).values() for uuid in uuids}
+        return owned - reachable
+
+    def _walk(self, start: str, step: Callable[[str], Iterable[str]]) -> Set[str]:
+        seen: Set[str] = set()
+        queue = deque([start])
+        while queue:
+            current = queue.popleft()
+            for neighbour in step(current):
+                if neighbour not in seen and neighbour != start:
+                    seen.add(neighbour)
+                    queue.append(neighbour)
+        return seen
+
+    def _link_edges(self, uuid: str, edges: Tuple[Edge, ...]) -> None:
+        reverse = self._reverse
+        for label, target in edges:
+            reverse.setdefault(target, {}).setdefault(uuid, set()).add(label)
+
+    def _unlink_edges(self, uuid: str, edges: Tuple[Edge, ...]) -> None:
+        reverse = self._reverse
+        for _, target in edges:
+            sources = reverse.get(target)
+            if sources is None or sources.pop(uuid, None) is None:
+                continue
+            if not sources:
+                del reverse[target]
+
+    def _unlink_world(self, uuid: str, table: Table) -> None:
+        world_uuid = self._world_of.pop(uuid, None)
+        if world_uuid is None:
+            return
+        members = self._worlds[world_uuid]
+        uuids = members.get(table)
+        if uuids is not None:
+            uuids.pop(uuid, None)
+            if not uuids:
+                del members[table]
+        if not members:
+            del self._worlds[world_uuid]
@@ -0,0 +1,165 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+from zlib import crc32
+import numpy as np
+from .agent import Audio, Presence, PresenceTable
+from .spatial import SpatialGrid
+
+@dataclass(frozen=True)
+class InterestTier:
+    radius: float
+    interval: int
+
+OUTER_RADIUS = float(Audio.DEFAULT_PANNER_OPTIONS["maxDistance"])
+
+DEFAULT_TIERS: Tuple[InterestTier, ...] = (
+    InterestTier(OUTER_RADIUS / 100, 1),
+    InterestTier(OUTER_RADIUS / 10, 4),
+    InterestTier(OUTER_RADIUS, 16),
+)
+
+def _phase(agent_id: str) -> int:
+    return crc32(agent_id.encode())
+
+class _PresenceCache(Dict[str, Presence]):
+    # Presence objects are built on first send and reused until the agent moves, so a
+    # source fanned out to many recipients is materialized once.
+    def __init__(self, table: PresenceTable):
+        super().__init__()
+        self.table = table
+
+    def __missing__(self, agent_id: str) -> Presence:
+        presence = self[agent_id] = self.table[agent_id]
+        return presence
+
+class InterestManager:
+    def __init__(
+        self,
+        tiers: Sequence[InterestTier] = DEFAULT_TIERS,
+        max_interests: int = 64,
+        refresh_every: int = 8,
+        cell_size: Optional[float] = None,
+    ):
+        tiers = tuple(sorted(tiers, key=lambda tier: tier.radius))
+        if not tiers or any(tier.radius <= 0 or tier.interval < 1 for tier in tiers):
+            raise ValueError("tiers need a positive radius and an interval of at least one tick")
+        self.tiers = tiers
+        self.max_interests = max_interests
+        self.refresh_every = max(int(refresh_every), 1)
+        self.presences = PresenceTable()
+        self.grid = SpatialGrid(cell_size or tiers[0].radius)
+        self.tick_count = 0
+        self._radii = np.array([tier.radius for tier in tiers])
+        # The k-nearest search widens by doubling from the innermost ring, so a query
+        # stops close to the distance where its k-th neighbour actually lies.
+        steps = int(np.ceil(np.log2(tiers[-1].radius / tiers[0].radius)))
+        self._search_radii = np.minimum(tiers[0].radius * 2.0 ** np.arange(steps + 1), tiers[-1].radius)
+        self._intervals = [tier.interval for tier in tiers]
+        self._phases: Dict[str, int] = {}
+        # recipient -> tier -> send phase within the tier interval -> sources.
+        self._interests: Dict[str, List[List[List[str]]]] = {}
+        self._stale: Set[str] = set()
+        self._departed: Dict[str, int] = {}
+        self._cache = _PresenceCache(self.presences)
+
+    def __len__(self) -> int:
+        return len(self.presences)
+
+    def __contains__(self, agent_id: object) -> bool:
+        return agent_id in self.presences
+
+    def update(self, presence: Presence) -> None:
+        if presence.agentId not in self.presences:
+            self._join(presence.agentId)
+        self.presences.upsert(presence)
+        self.grid.update(presence.agentId, presence.position)
+        self._cache.pop(presence.agentId, None)
+
+    def update_many(self, table: PresenceTable) -> None:
+        for agent_id in table.agent_ids:
+            if agent_id not in self.presences:
+                self._join(agent_id)
+        self.presences.upsert_many(table.agent_ids, table.positions, table.orientations, table.last_updated)
+        self.grid.update_many(table.agent_ids, table.positions)
+        cache = self._cache
+        for agent_id in table.agent_ids:
+            cache.pop(agent_id, None)
+
+    def remove(self, agent_id: str) -> bool:
+        if not self.presences.remove(agent_id):
+            return False
+        self.grid.remove(agent_id)
+        self._phases.pop(agent_id, None)
+        self._interests.pop(agent_id, None)
+        self._stale.discard(agent_id)
+        self._cache.pop(agent_id, None)
+        # Other recipients keep listing the agent until their next rebuild.
+        self._departed[agent_id] = self.tick_count + self.refresh_every
+        return True
+
+    def interests(self, agent_id: str) -> Dict[str, InterestTier]:
+        if agent_id in self._stale:
+            self._refresh([agent_id])
+        return {
+            source: self.tiers[tier]
+            for tier, phases in enumerate(self._interests.get(agent_id, ()))
+            for sources in phases
+            for source in sources
+            if source in self.presences
+        }
+
+    def tick(self) -> Dict[str, List[Presence]]:
+        self.tick_count += 1
+        tick = self.tick_count
+        refresh_every = self.refresh_every
+        phases = self._phases
+        # Interest sets are rebuilt on a rolling schedule, an equal share of agents per
+        # tick, rather than all at once; joiners are built on their first tick.
+        self._refresh([
+            agent_id
+            for agent_id in self.presences.agent_ids
+            if agent_id in self._stale or (tick + phases[agent_id]) % refresh_every == 0
+        ])
+        if self._departed:
+            self._departed = {agent_id: until for agent_id, until in self._departed.items() if until > tick}
+        departed = self._departed
+        lookup = self._cache.__getitem__
+        due = [tick % interval for interval in self._intervals]
+        batches: Dict[str, List[Presence]] = {}
+        for recipient, tiers in self._interests.items():
+            batch: List[Presence] = []
+            for tier, phases in enumerate(tiers):
+                sources = phases[due[tier]]
+                if sources:
+                    if departed:
+                        sources = [source for source in sources if source not in departed]
+                    batch.extend(map(lookup, sources))
+            if batch:
+                batches[recipient] = batch
+        return batches
+
+    def _join(self, agent_id: str) -> None:
+        self._departed.pop(agent_id, None)
+        self._phases[agent_id] = _phase(agent_id)
+        self._stale.add(agent_id)
+
+    def _refresh(self, agent_ids: List[str]) -> None:
+        if not agent_ids:
+            return
+        self._stale.difference_update(agent_ids)
+        query, neighbour, distance = self.grid.nearest_slots(
+            [self.grid.slot(agent_id) for agent_id in agent_ids], self.max_interests, self._search_radii
+        )
+        tiers = np.searchsorted(self._radii, distance, side='left').tolist()
+        keys = self.grid.keys
+        phases = self._phases
+        intervals = self._intervals
+        interests = self._interests
+        for agent_id in agent_ids:
+            interests[agent_id] = [[[] for _ in range(interval)] for interval in intervals]
+        # Each source lands in the bucket of the tick residue it is sent on, offset per
+        # source so a decimated tier's sends are spread across its interval.
+        for q, n, tier in zip(query.tolist(), neighbour.tolist(), tiers):
+            source = keys[n]
+            interval = intervals[tier]
+            interests[keys[q]][tier][-phases[source] % interval].append(source)
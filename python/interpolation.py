@@ -0,0 +1,192 @@
+from datetime import datetime
+from math import pi
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+import numpy as np
+from .agent import Presence, PresenceTable, to_epoch_us
+
+Timestamp = Union[datetime, int]
+
+_TAU = 2 * pi
+
+def _epoch_us(value: Timestamp) -> int:
+    return to_epoch_us(value) if isinstance(value, datetime) else int(value)
+
+def _wrap(angles: np.ndarray) -> np.ndarray:
+    return np.mod(angles + pi, _TAU) - pi
+
+class PresenceHistory:
+    def __init__(
+        self,
+        depth: int = 8,
+        capacity: int = 64,
+        snap_distance: float = 10.0,
+        max_extrapolation_us: int = 250_000,
+    ):
+        if depth < 2:
+            raise ValueError("depth must hold at least two samples")
+        capacity = max(int(capacity), 1)
+        self.depth = depth
+        self.snap_distance = snap_distance
+        self.max_extrapolation_us = max_extrapolation_us
+        self._size = 0
+        self._rows: Dict[str, int] = {}
+        self._agent_ids: List[str] = []
+        # Per-agent rings; `_head` is the slot of the newest sample, `_count` how many are filled.
+        self._times = np.zeros((capacity, depth), dtype=np.int64)
+        self._positions = np.zeros((capacity, depth, 3), dtype=np.float64)
+        self._orientations = np.zeros((capacity, depth, 3), dtype=np.float64)
+        self._head = np.zeros(capacity, dtype=np.int64)
+        self._count = np.zeros(capacity, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, agent_id: object) -> bool:
+        return agent_id in self._rows
+
+    @property
+    def agent_ids(self) -> Sequence[str]:
+        return self._agent_ids
+
+    @property
+    def latest(self) -> np.ndarray:
+        rows = np.arange(self._size)
+        return self._times[rows, self._head[:self._size]]
+
+    def push(self, presence: Presence) -> bool:
+        p, o = presence.position, presence.orientation
+        return bool(self.push_many(
+            [presence.agentId], [(p.x, p.y, p.z)], [(o.x, o.y, o.z)], [to_epoch_us(presence.lastUpdated)]
+        )[0])
+
+    def push_table(self, table: PresenceTable) -> np.ndarray:
+        return self.push_many(table.agent_ids, table.positions, table.orientations, table.last_updated)
+
+    def push_many(self, agent_ids: Sequence[str], positions: Any, orientations: Any, last_updated: Any) -> np.ndarray:
+        count = len(agent_ids)
+        positions = np.asarray(positions, dtype=np.float64).reshape(count, 3)
+        orientations = np.asarray(orientations, dtype=np.float64).reshape(count, 3)
+        last_updated = np.asarray(last_updated, dtype=np.int64).reshape(count)
+        self._reserve(self._size + count)
+        rows = np.array([self._row_for(agent_id) for agent_id in agent_ids], dtype=np.intp)
+        # An agent can appear more than once in a batch; its samples go in oldest first,
+        # one per pass, so each is checked against the one before it.
+        order = np.lexsort((last_updated, rows))
+        ordered = rows[order]
+        occurrence = np.arange(count) - np.searchsorted(ordered, ordered)
+        fresh = np.zeros(count, dtype=bool)
+        for batch in range(int(occurrence.max()) + 1 if count else 0):
+            picked = order[occurrence == batch]
+            fresh[picked] = self._insert(rows[picked], positions[picked], orientations[picked], last_updated[picked])
+        return fresh
+
+    def sample(self, at: Timestamp) -> Tuple[np.ndarray, np.ndarray]:
+        # Positions and orientations of every agent at `at`, aligned with `agent_ids`:
+        # interpolated between the two samples bracketing it, extrapolated from the last
+        # two for a bounded time past the newest, and held at the oldest before that.
+        at = _epoch_us(at)
+        size = self._size
+        if not size:
+            return np.empty((0, 3)), np.empty((0, 3))
+        depth = self.depth
+        rows = np.arange(size)[:, None]
+        # Column k of the unrolled ring is the k-th newest sample.
+        ring = (self._head[:size, None] - np.arange(depth)) % depth
+        valid = np.arange(depth) < self._count[:size, None]
+        times = np.where(valid, self._times[rows, ring], np.iinfo(np.int64).max)
+        reached = times <= at
+        any_reached = reached.any(axis=1)
+        counts = self._count[:size]
+        # `floor` is the column of the newest sample not after `at`.
+        floor = np.where(any_reached, reached.argmax(axis=1), counts - 1)
+        index = np.arange(size)
+        extrapolating = any_reached & (floor == 0) & (counts > 1)
+        # Interpolate between columns (floor, floor - 1) when bracketed; extrapolate along
+        # columns (1, 0) past the newest sample.
+        older_column = np.where(extrapolating, 1, floor)
+        newer_column = np.where(extrapolating, 0, np.maximum(floor - 1, 0))
+        has_pair = any_reached & (older_column != newer_column)
+        older_slot = ring[index, older_column]
+        newer_slot = ring[index, newer_column]
+        t0 = self._times[index, older_slot]
+        t1 = self._times[index, newer_slot]
+        p0 = self._positions[index, older_slot]
+        p1 = self._positions[index, newer_slot]
+        o0 = self._orientations[index, older_slot]
+        o1 = self._orientations[index, newer_slot]
+        target = np.where(extrapolating, np.minimum(at, t1 + self.max_extrapolation_us), at)
+        span = np.maximum(t1 - t0, 1)
+        fraction = np.where(has_pair, (target - t0) / span, 0.0)
+        # A jump wider than the snap distance is a teleport: hold the older sample until
+        # the newer one is current instead of sliding through the gap.
+        jump = np.linalg.norm(p1 - p0, axis=1) > self.snap_distance
+        fraction = np.where(jump, np.where(extrapolating, 1.0, 0.0), fraction)[:, None]
+        positions = p0 + (p1 - p0) * fraction
+        orientations = _wrap(o0 + _wrap(o1 - o0) * fraction)
+        return positions, orientations
+
+    def to_table(self, at: Timestamp, table: Optional[PresenceTable] = None) -> PresenceTable:
+        positions, orientations = self.sample(at)
+        table = PresenceTable(self._size) if table is None else table
+        table.upsert_many(self._agent_ids, positions, orientations, np.full(self._size, _epoch_us(at), dtype=np.int64))
+        return table
+
+    def evict_stale(self, now: Timestamp, stale_after_us: int) -> List[str]:
+        stale = np.flatnonzero(self.latest < _epoch_us(now) - stale_after_us)
+        evicted = [self._agent_ids[row] for row in stale.tolist()]
+        for agent_id in evicted:
+            self.remove(agent_id)
+        return evicted
+
+    def remove(self, agent_id: str) -> bool:
+        row = self._rows.pop(agent_id, None)
+        if row is None:
+            return False
+        last = self._size - 1
+        if row != last:
+            moved = self._agent_ids[last]
+            self._agent_ids[row] = moved
+            self._rows[moved] = row
+            for column in (self._times, self._positions, self._orientations, self._head, self._count):
+                column[row] = column[last]
+        self._count[last] = 0
+        self._agent_ids.pop()
+        self._size = last
+        return True
+
+    def _insert(self, rows: np.ndarray, positions: np.ndarray, orientations: np.ndarray, last_updated: np.ndarray) -> np.ndarray:
+        # `rows` holds each agent at most once. Samples that are not newer than what the
+        # ring already holds (replays, reordered packets) are dropped rather than inserted
+        # out of order.
+        fresh = (self._count[rows] == 0) | (last_updated > self._times[rows, self._head[rows]])
+        rows, positions, orientations, last_updated = rows[fresh], positions[fresh], orientations[fresh], last_updated[fresh]
+        head = np.where(self._count[rows] == 0, 0, (self._head[rows] + 1) % self.depth)
+        self._head[rows] = head
+        self._count[rows] = np.minimum(self._count[rows] + 1, self.depth)
+        self._times[rows, head] = last_updated
+        self._positions[rows, head] = positions
+        self._orientations[rows, head] = orientations
+        return fresh
+
+    def _row_for(self, agent_id: str) -> int:
+        row = self._rows.get(agent_id)
+        if row is None:
+            row = self._size
+            self._rows[agent_id] = row
+            self._agent_ids.append(agent_id)
+            self._head[row] = 0
+            self._count[row] = 0
+            self._size += 1
+        return row
+
+    def _reserve(self, capacity: int) -> None:
+        current = len(self._head)
+        if capacity <= current:
+            return
+        capacity = max(capacity, current * 2)
+        depth = self.depth
+        self._times = np.resize(self._times, (capacity, depth))
+        self._positions = np.resize(self._positions, (capacity, depth, 3))
+        self._orientations = np.resize(self._orientations, (capacity, depth, 3))
+        self._head = np.resize(self._head, capacity)
+        self._count = np.resize(self._count, capacity)
@@ -0,0 +1,272 @@
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+from .agent import to_epoch_us
+from .world import TableMetadata
+
+class _Indexed(NamedTuple):
+    # What a row contributed when it was indexed. Callers may mutate the row object in
+    # place before upserting it again, so un-indexing must not read the row itself.
+    entity: str
+    key: str
+    text: Tuple[str, ...]
+    boolean: Tuple[bool, ...]
+    numeric: Tuple[float, ...]
+    timestamp: Tuple[int, ...]
+
+    @classmethod
+    def of(cls, row: TableMetadata) -> Optional['_Indexed']:
+        if row.entity_id is None or row.key is None:
+            return None
+        return cls(
+            row.entity_id,
+            row.key,
+            tuple(row.values_text or ()),
+            tuple(bool(value) for value in row.values_boolean or ()),
+            tuple(float(value) for value in row.values_numeric or ()),
+            # Epoch microseconds, so naive and aware timestamps order against each other.
+            tuple(to_epoch_us(value) for value in row.values_timestamp or ()),
+        )
+
+class _SortedRun:
+    # A sorted list whose additions and removals are buffered and applied in one pass on
+    # the next read: building an index of n values costs one sort rather than n O(n)
+    # inserts, and a burst of upserts between queries is merged with a single timsort.
+    __slots__ = ("_items", "_added", "_removed")
+
+    def __init__(self) -> None:
+        self._items: List[Any] = []
+        self._added: List[Any] = []
+        self._removed: Counter = Counter()
+
+    def add(self, item: Any) -> None:
+        self._added.append(item)
+
+    def remove(self, item: Any) -> None:
+        self._removed[item] += 1
+
+    def items(self) -> List[Any]:
+        if self._added:
+            # Timsort finds the existing sorted run, so this is O(n + k log k).
+            self._items.extend(self._added)
+            self._items.sort()
+            self._added.clear()
+        if self._removed:
+            removed = self._removed
+            kept = []
+            for item in self._items:
+                if removed[item] > 0:
+                    removed[item] -= 1
+                else:
+                    kept.append(item)
+            self._items = kept
+            removed.clear()
+        return self._items
+
+class MetadataIndex:
+    def __init__(self, rows: Iterable[TableMetadata] = ()):
+        self._rows: Dict[str, TableMetadata] = {}
+        self._indexed: Dict[str, _Indexed] = {}
+        # Hash indexes: key -> value -> entity -> number of rows contributing it.
+        self._text: Dict[str, Dict[str, Counter]] = {}
+        self._boolean: Dict[str, Dict[bool, Counter]] = {}
+        # Sorted (value, entity) pairs per key, for range scans; duplicates are kept.
+        # Timestamps are held as epoch microseconds.
+        self._numeric: Dict[str, _SortedRun] = {}
+        self._timestamp: Dict[str, _SortedRun] = {}
+        # Sorted distinct text values per key, for prefix scans.
+        self._text_values: Dict[str, _SortedRun] = {}
+        for row in rows:
+            self.upsert(row)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def upsert(self, row: TableMetadata) -> None:
+        if row.metadata_id is None:
+            raise ValueError("TableMetadata has no metadata_id")
+        previous = self._indexed.pop(row.metadata_id, None)
+        if previous is not None:
+            self._unindex(previous)
+        self._rows[row.metadata_id] = row
+        indexed = _Indexed.of(row)
+        if indexed is not None:
+            self._indexed[row.metadata_id] = indexed
+            self._index(indexed)
+
+    def remove(self, metadata_id: str) -> Optional[TableMetadata]:
+        row = self._rows.pop(metadata_id, None)
+        indexed = self._indexed.pop(metadata_id, None)
+        if indexed is not None:
+            self._unindex(indexed)
+        return row
+
+    def query(self, expression: 'Query') -> Set[str]:
+        return expression.evaluate(self)
+
+    def eq(self, key: str, value: Any) -> Set[str]:
+        if isinstance(value, bool):
+            return set(self._boolean.get(key, {}).get(value, ()))
+        if isinstance(value, str):
+            return set(self._text.get(key, {}).get(value, ()))
+        return self.range(key, value, value)
+
+    def isin(self, key: str, values: Iterable[Any]) -> Set[str]:
+        found: Set[str] = set()
+        for value in values:
+            found |= self.eq(key, value)
+        return found
+
+    def range(
+        self,
+        key: str,
+        lo: Any = None,
+        hi: Any = None,
+        include_lo: bool = True,
+        include_hi: bool = True,
+    ) -> Set[str]:
+        bound = lo if lo is not None else hi
+        if bound is None:
+            raise ValueError("range needs lo or hi")
+        if isinstance(bound, datetime):
+            run = self._timestamp.get(key)
+            lo = None if lo is None else to_epoch_us(lo)
+            hi = None if hi is None else to_epoch_us(hi)
+        else:
+            run = self._numeric.get(key)
+        pairs = run.items() if run is not None else None
+        if not pairs:
+            return set()
+        # Entity ids sort after '' and before '￿', so these sentinels bracket every
+        # pair holding the bound value.
+        if lo is None:
+            start = 0
+        else:
+            start = bisect_left(pairs, (lo, "")) if include_lo else bisect_right(pairs, (lo, "￿"))
+        if hi is None:
+            end = len(pairs)
+        else:
+            end = bisect_right(pairs, (hi, "￿")) if include_hi else bisect_left(pairs, (hi, ""))
+        return {entity for _, entity in pairs[start:end]}
+
+    def prefix(self, key: str, prefix: str) -> Set[str]:
+        run = self._text_values.get(key)
+        values = run.items() if run is not None else None
+        if not values:
+            return set()
+        found: Set[str] = set()
+        index = self._text[key]
+        for position in range(bisect_left(values, prefix), len(values)):
+            value = values[position]
+            if not value.startswith(prefix):
+                break
+            found.update(index[value])
+        return found
+
+    def _index(self, indexed: _Indexed) -> None:
+        entity, key = indexed.entity, indexed.key
+        for value in indexed.text:
+            counts = self._text.setdefault(key, {}).setdefault(value, Counter())
+            if not counts:
+                self._text_values.setdefault(key, _SortedRun()).add(value)
+            counts[entity] += 1
+        for value in indexed.boolean:
+            self._boolean.setdefault(key, {}).setdefault(value, Counter())[entity] += 1
+        for value in indexed.numeric:
+            self._numeric.setdefault(key, _SortedRun()).add((value, entity))
+        for value in indexed.timestamp:
+            self._timestamp.setdefault(key, _SortedRun()).add((value, entity))
+
+    def _unindex(self, indexed: _Indexed) -> None:
+        entity, key = indexed.entity, indexed.key
+        for value in indexed.text:
+            counts = self._text[key][value]
+            counts[entity] -= 1
+            if counts[entity] <= 0:
+                del counts[entity]
+            if not counts:
+                del self._text[key][value]
+                self._text_values[key].remove(value)
+        for value in indexed.boolean:
+            counts = self._boolean[key][value]
+            counts[entity] -= 1
+            if counts[entity] <= 0:
+                del counts[entity]
+            if not counts:
+                del self._boolean[key][value]
+        for value in indexed.numeric:
+            self._numeric[key].remove((value, entity))
+        for value in indexed.timestamp:
+            self._timestamp[key].remove((value, entity))
+
+class Query:
+    def evaluate(self, index: MetadataIndex) -> Set[str]:
+        raise NotImplementedError
+
+    def __and__(self, other: 'Query') -> 'Query':
+        return And(self, other)
+
+    def __or__(self, other: 'Query') -> 'Query':
+        return Or(self, other)
+
+class Eq(Query):
+    def __init__(self, key: str, value: Any):
+        self.key = key
+        self.value = value
+
+    def evaluate(self, index: MetadataIndex) -> Set[str]:
+        return index.eq(self.key, self.value)
+
+class In(Query):
+    def __init__(self, key: str, values: Iterable[Any]):
+        self.key = key
+        self.values = list(values)
+
+    def evaluate(self, index: MetadataIndex) -> Set[str]:
+        return index.isin(self.key, self.values)
+
+class Range(Query):
+    def __init__(self, key: str, lo: Any = None, hi: Any = None, include_lo: bool = True, include_hi: bool = True):
+        self.key = key
+        self.lo = lo
+        self.hi = hi
+        self.include_lo = include_lo
+        self.include_hi = include_hi
+
+    def evaluate(self, index: MetadataIndex) -> Set[str]:
+        return index.range(self.key, self.lo, self.hi, self.include_lo, self.include_hi)
+
+class Prefix(Query):
+    def __init__(self, key: str, prefix: str):
+        self.key = key
+        self.prefix = prefix
+
+    def evaluate(self, index: MetadataIndex) -> Set[str]:
+        return index.prefix(self.key, self.prefix)
+
+class And(Query):
+    def __init__(self, *queries: Query):
+        self.queries = queries
+
+    def evaluate(self, index: MetadataIndex) -> Set[str]:
+        # Smallest result first so the intersection only ever shrinks from there.
+        results = sorted((query.evaluate(index) for query in self.queries), key=len)
+        if not results:
+            return set()
+        found = results[0]
+        for result in results[1:]:
+            if not found:
+                break
+            found = found & result
+        return found
+
+class Or(Query):
+    def __init__(self, *queries: Query):
+        self.queries = queries
+
+    def evaluate(self, index: MetadataIndex) -> Set[str]:
+        found: Set[str] = set()
+        for query in self.queries:
+            found |= query.evaluate(index)
+        return found
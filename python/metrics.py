@@ -0,0 +1,401 @@
+import functools
+import json
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from .agent import Presence
+from .mutation import MUTATIONS, MutationBatcher
+from .world import CODECS, TABLE_ROWS, TableCodec
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# Histograms keep 2**_SUB_BUCKET_BITS buckets per power of two, so any recorded value
+# is reported within about 6% of what was observed, from nanoseconds to hours.
+_SUB_BUCKET_BITS = 4
+_SUB_BUCKETS = 1 << _SUB_BUCKET_BITS
+
+def _bucket(value: int) -> int:
+    shift = max(value.bit_length() - _SUB_BUCKET_BITS - 1, 0)
+    return (shift << _SUB_BUCKET_BITS) + (value >> shift)
+
+def _bucket_upper(index: int) -> int:
+    if index < 2 * _SUB_BUCKETS:
+        return index
+    shift = (index >> _SUB_BUCKET_BITS) - 1
+    return ((index - (shift << _SUB_BUCKET_BITS) + 1) << shift) - 1
+
+SECONDS_BOUNDS: Tuple[float, ...] = tuple(
+    scale * 10.0 ** exponent for exponent in range(-6, 1) for scale in (1.0, 2.5, 5.0)
+) + (10.0,)
+BYTES_BOUNDS: Tuple[float, ...] = tuple(float(4 ** exponent) for exponent in range(3, 13))
+ROWS_BOUNDS: Tuple[float, ...] = tuple(float(4 ** exponent) for exponent in range(0, 10))
+
+# Per-shard agent counters are trimmed back to `agent_capacity` ids once they hold this
+# many times as many, so a long-running server tracks the busiest agents in bounded memory.
+_AGENT_SLACK = 2
+
+class _Series:
+    __slots__ = ("count", "total", "maximum", "buckets")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0
+        self.maximum = 0
+        self.buckets: Dict[int, int] = {}
+
+    def merge(self, other: '_Series') -> None:
+        self.count += other.count
+        self.total += other.total
+        self.maximum = max(self.maximum, other.maximum)
+        buckets = self.buckets
+        for index, hits in list(other.buckets.items()):
+            buckets[index] = buckets.get(index, 0) + hits
+
+_Shard = Tuple[Dict[Tuple[str, Labels], int], Dict[Tuple[str, Labels], _Series], Counter]
+
+class MetricsRegistry:
+    def __init__(self, agent_capacity: int = 1024) -> None:
+        # Every thread records into its own shard, so the hot path takes no lock; shards
+        # are only merged when a snapshot is taken. A shard whose thread has exited is
+        # folded into `_retired` the next time the shard list is read.
+        self.agent_capacity = max(int(agent_capacity), 1)
+        self._local = threading.local()
+        self._shards: List[Tuple[threading.Thread, _Shard]] = []
+        self._retired: _Shard = ({}, {}, Counter())
+        self._lock = threading.Lock()
+        self._kinds: Dict[str, Tuple[str, str, float, Sequence[float]]] = {}
+
+    def counter(self, name: str, help: str) -> None:
+        self._kinds[name] = ("counter", help, 1.0, ())
+
+    def histogram(self, name: str, help: str, scale: float = 1.0, bounds: Sequence[float] = SECONDS_BOUNDS) -> None:
+        # Values are recorded as integers (nanoseconds, bytes); `scale` converts them to
+        # the exported unit.
+        self._kinds[name] = ("histogram", help, scale, tuple(bounds))
+
+    def inc(self, name: str, labels: Labels = (), amount: int = 1) -> None:
+        counters = self._shard()[0]
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + amount
+
+    def observe(self, name: str, labels: Labels, value: int) -> None:
+        series_map = self._shard()[1]
+        key = (name, labels)
+        series = series_map.get(key)
+        if series is None:
+            series = series_map[key] = _Series()
+        value = max(int(value), 0)
+        series.count += 1
+        series.total += value
+        if value > series.maximum:
+            series.maximum = value
+        index = _bucket(value)
+        buckets = series.buckets
+        buckets[index] = buckets.get(index, 0) + 1
+
+    def hit_agents(self, agent_ids: Iterable[str]) -> None:
+        agents = self._shard()[2]
+        agents.update(agent_ids)
+        if len(agents) > _AGENT_SLACK * self.agent_capacity:
+            self._trim(agents)
+
+    def top_agents(self, count: int = 10) -> List[Tuple[str, int]]:
+        # Counts are exact for agents that stayed among the busiest; an agent that was
+        # trimmed away and came back restarts from zero.
+        total: Counter = Counter()
+        for _, _, agents in self._shard_list():
+            total.update(dict(agents))
+        return total.most_common(count)
+
+    def reset(self) -> None:
+        with self._lock:
+            for counters, series, agents in [shard for _, shard in self._shards] + [self._retired]:
+                counters.clear()
+                series.clear()
+                agents.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        counters: Dict[Tuple[str, Labels], int] = {}
+        histograms: Dict[Tuple[str, Labels], _Series] = {}
+        for shard_counters, shard_series, _ in self._shard_list():
+            for key, value in list(shard_counters.items()):
+                counters[key] = counters.get(key, 0) + value
+            for key, series in list(shard_series.items()):
+                merged = histograms.get(key)
+                if merged is None:
+                    merged = histograms[key] = _Series()
+                merged.merge(series)
+        result: Dict[str, Any] = {"counters": [], "histograms": []}
+        for (name, labels), value in sorted(counters.items()):
+            result["counters"].append({"name": name, "labels": dict(labels), "value": value})
+        for (name, labels), series in sorted(histograms.items(), key=lambda item: item[0]):
+            scale = self._kinds.get(name, ("histogram", "", 1.0, ()))[2]
+            result["histograms"].append({
+                "name": name,
+                "labels": dict(labels),
+                "count": series.count,
+                "sum": series.total * scale,
+                "max": series.maximum * scale,
+                "p50": self._quantile(series, 0.5) * scale,
+                "p90": self._quantile(series, 0.9) * scale,
+                "p99": self._quantile(series, 0.99) * scale,
+                "buckets": sorted((_bucket_upper(index) * scale, hits) for index, hits in series.buckets.items()),
+            })
+        return result
+
+    def to_prometheus(self) -> str:
+        snapshot = self.snapshot()
+        lines: List[str] = []
+        described = set()
+
+        def describe(name: str, kind: str) -> None:
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {name} {self._kinds.get(name, (kind, name))[1]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for counter in snapshot["counters"]:
+            describe(counter["name"], "counter")
+            lines.append(f"{counter['name']}{_format_labels(counter['labels'])} {counter['value']}")
+        for histogram in snapshot["histograms"]:
+            name = histogram["name"]
+            describe(name, "histogram")
+            bounds = self._kinds.get(name, ("histogram", "", 1.0, SECONDS_BOUNDS))[3]
+            buckets = histogram["buckets"]
+            cumulative = 0
+            position = 0
+            for bound in bounds:
+                while position < len(buckets) and buckets[position][0] <= bound:
+                    cumulative += buckets[position][1]
+                    position += 1
+                lines.append(f"{name}_bucket{_format_labels(histogram['labels'], le=_format_value(bound))} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(histogram['labels'], le='+Inf')} {histogram['count']}")
+            lines.append(f"{name}_sum{_format_labels(histogram['labels'])} {_format_value(histogram['sum'])}")
+            lines.append(f"{name}_count{_format_labels(histogram['labels'])} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot())
+
+    def _quantile(self, series: _Series, q: float) -> int:
+        if not series.count:
+            return 0
+        rank = q * series.count
+        seen = 0
+        for index in sorted(series.buckets):
+            seen += series.buckets[index]
+            if seen >= rank:
+                return min(_bucket_upper(index), series.maximum)
+        return series.maximum
+
+    def _shard(self) -> _Shard:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = ({}, {}, Counter())
+            with self._lock:
+                self._retire()
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def _shard_list(self) -> List[_Shard]:
+        with self._lock:
+            self._retire()
+            return [shard for _, shard in self._shards] + [self._retired]
+
+    def _retire(self) -> None:
+        # Called with the lock held. Nothing writes to a dead thread's shard any more, so
+        # it can be merged without racing its owner.
+        live = [(thread, shard) for thread, shard in self._shards if thread.is_alive()]
+        if len(live) == len(self._shards):
+            return
+        counters, histograms, agents = self._retired
+        for thread, (shard_counters, shard_series, shard_agents) in self._shards:
+            if thread.is_alive():
+                continue
+            for key, value in shard_counters.items():
+                counters[key] = counters.get(key, 0) + value
+            for key, series in shard_series.items():
+                merged = histograms.get(key)
+                if merged is None:
+                    merged = histograms[key] = _Series()
+                merged.merge(series)
+            agents.update(shard_agents)
+        if len(agents) > _AGENT_SLACK * self.agent_capacity:
+            self._trim(agents)
+        self._shards = live
+
+    def _trim(self, agents: Counter) -> None:
+        kept = agents.most_common(self.agent_capacity)
+        agents.clear()
+        agents.update(dict(kept))
+
+def _format_value(value: float) -> str:
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+def _format_labels(labels: Dict[str, str], **extra: str) -> str:
+    items = list(labels.items()) + list(extra.items())
+    if not items:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in items)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(items, escaped)) + "}"
+
+def _payload_size(buf: Any) -> int:
+    if isinstance(buf, str):
+        return len(buf.encode())
+    try:
+        return memoryview(buf).nbytes
+    except TypeError:
+        return 0
+
+REGISTRY = MetricsRegistry()
+
+# Instrumentation is installed by swapping the hot-path callables for timed wrappers and
+# undone by putting the originals back, so a disabled process runs the untouched code.
+_installed: List[Tuple[Any, str, Any]] = []
+_active: List[MetricsRegistry] = []
+
+def enabled() -> bool:
+    return bool(_installed)
+
+def enable(registry: Optional[MetricsRegistry] = None) -> MetricsRegistry:
+    # Enabling again returns the registry already installed; asking for a different one
+    # while instrumentation is on is an error, since its numbers would silently stay empty.
+    if _active:
+        if registry is not None and registry is not _active[0]:
+            raise RuntimeError("Metrics are already enabled with a different registry; call disable() first")
+        return _active[0]
+    registry = REGISTRY if registry is None else registry
+    _active.append(registry)
+    _describe(registry)
+    clock = time.perf_counter_ns
+    inc = registry.inc
+    observe = registry.observe
+
+    def presence_method(method: str, rows: Callable[[Any, Any], Sequence[str]], payload: bool) -> Callable[[Callable], Callable]:
+        labels = (("method", method),)
+
+        def wrap(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def timed(cls: Any, data: Any, *args: Any, **kwargs: Any) -> Any:
+                if not payload and not isinstance(data, (list, dict)):
+                    # One-shot iterables are read twice: once to parse, once to count.
+                    data = list(data)
+                start = clock()
+                result = func(cls, data, *args, **kwargs)
+                observe("vircadia_presence_parse_seconds", labels, clock() - start)
+                agent_ids = rows(data, result)
+                inc("vircadia_presence_records_total", labels, len(agent_ids))
+                registry.hit_agents(agent_ids)
+                if payload:
+                    observe("vircadia_presence_payload_bytes", labels, _payload_size(data))
+                return result
+            return timed
+        return wrap
+
+    _patch_classmethod(Presence, "parse", presence_method("parse", lambda data, result: (result.agentId,), False))
+    _patch_classmethod(Presence, "parse_many", presence_method("parse_many", lambda data, result: [obj["agentId"] for obj in data], False))
+    # Records decoded from JSON are counted by the parse_many call it delegates to.
+    _patch_classmethod(Presence, "parse_json_bytes", presence_method("parse_json_bytes", lambda data, result: (), True))
+    _patch_classmethod(Presence, "parse_frame", presence_method("parse_frame", lambda data, result: result.agent_ids, True))
+
+    submit = MutationBatcher.submit
+    dispatch = MutationBatcher._dispatch
+
+    @functools.wraps(submit)
+    async def timed_submit(self: MutationBatcher, mutation: Any, row: Any) -> None:
+        inc("vircadia_mutation_submitted_total", (("mutation", getattr(mutation, "value", str(mutation))),))
+        await submit(self, mutation, row)
+
+    @functools.wraps(dispatch)
+    async def timed_dispatch(self: MutationBatcher, mutation: Any, rows: List[Dict[str, Any]]) -> None:
+        labels = (("mutation", mutation.value),)
+        start = clock()
+        try:
+            await dispatch(self, mutation, rows)
+        except BaseException:
+            inc("vircadia_mutation_dispatch_errors_total", labels)
+            raise
+        finally:
+            observe("vircadia_mutation_dispatch_seconds", labels, clock() - start)
+        inc("vircadia_mutation_dispatched_rows_total", labels, len(rows))
+        observe("vircadia_mutation_batch_rows", labels, len(rows))
+        operation, table = MUTATIONS[mutation]
+        observe(
+            "vircadia_mutation_payload_bytes",
+            (("table", table.value), ("operation", operation.value)),
+            len(json.dumps(rows, separators=(",", ":"), ensure_ascii=False, default=str).encode()),
+        )
+
+    _patch(MutationBatcher, "submit", timed_submit)
+    _patch(MutationBatcher, "_dispatch", timed_dispatch)
+
+    for row_type, codec in CODECS.items():
+        labels_for = _codec_labels(row_type)
+        _patch(codec, "to_dict", _timed_row(codec.to_dict, registry, labels_for("encode")))
+        _patch(codec, "from_dict", _timed_row(codec.from_dict, registry, labels_for("decode")))
+
+    to_json_bytes = TableCodec.to_json_bytes
+    from_json_bytes = TableCodec.from_json_bytes
+
+    @functools.wraps(to_json_bytes)
+    def sized_to_json_bytes(self: TableCodec, rows: Any) -> bytes:
+        data = to_json_bytes(self, rows)
+        observe("vircadia_codec_payload_bytes", _codec_labels(self.row_type)("encode"), len(data))
+        return data
+
+    @functools.wraps(from_json_bytes)
+    def sized_from_json_bytes(self: TableCodec, buf: Any) -> Any:
+        observe("vircadia_codec_payload_bytes", _codec_labels(self.row_type)("decode"), _payload_size(buf))
+        return from_json_bytes(self, buf)
+
+    _patch(TableCodec, "to_json_bytes", sized_to_json_bytes)
+    _patch(TableCodec, "from_json_bytes", sized_from_json_bytes)
+    return registry
+
+def disable() -> None:
+    _active.clear()
+    while _installed:
+        target, name, original = _installed.pop()
+        if original is None:
+            delattr(target, name)
+        else:
+            setattr(target, name, original)
+
+def _describe(registry: MetricsRegistry) -> None:
+    registry.histogram("vircadia_presence_parse_seconds", "Time spent parsing presence updates.", 1e-9)
+    registry.counter("vircadia_presence_records_total", "Presence records parsed.")
+    registry.histogram("vircadia_presence_payload_bytes", "Size of presence payloads.", 1.0, BYTES_BOUNDS)
+    registry.counter("vircadia_mutation_submitted_total", "Rows submitted to a mutation batcher.")
+    registry.counter("vircadia_mutation_dispatched_rows_total", "Rows sent in mutation batches.")
+    registry.counter("vircadia_mutation_dispatch_errors_total", "Mutation batches whose send raised.")
+    registry.histogram("vircadia_mutation_dispatch_seconds", "Time spent sending one mutation batch.", 1e-9)
+    registry.histogram("vircadia_mutation_batch_rows", "Rows per mutation batch.", 1.0, ROWS_BOUNDS)
+    registry.histogram("vircadia_mutation_payload_bytes", "JSON size of one sent mutation batch.", 1.0, BYTES_BOUNDS)
+    registry.histogram("vircadia_codec_row_seconds", "Time spent encoding or decoding one table row.", 1e-9)
+    registry.histogram("vircadia_codec_payload_bytes", "Size of encoded table JSON payloads.", 1.0, BYTES_BOUNDS)
+
+def _codec_labels(row_type: type) -> Callable[[str], Labels]:
+    # Row types shared by several tables (the metadata tables) are labelled by type.
+    tables = [table.value for table, candidate in TABLE_ROWS.items() if candidate is row_type]
+    name = tables[0] if len(tables) == 1 else row_type.__name__
+    return lambda direction: (("table", name), ("direction", direction))
+
+def _timed_row(func: Callable, registry: MetricsRegistry, labels: Labels) -> Callable:
+    clock = time.perf_counter_ns
+    observe = registry.observe
+
+    def timed(value: Any, *args: Any) -> Any:
+        start = clock()
+        result = func(value, *args)
+        observe("vircadia_codec_row_seconds", labels, clock() - start)
+        return result
+    return timed
+
+def _patch(target: Any, name: str, replacement: Any) -> None:
+    _installed.append((target, name, target.__dict__.get(name) if isinstance(target, type) else getattr(target, name)))
+    setattr(target, name, replacement)
+
+def _patch_classmethod(target: type, name: str, wrap: Callable[[Callable], Callable]) -> None:
+    _patch(target, name, classmethod(wrap(target.__dict__[name].__func__)))
@@ -0,0 +1,225 @@
+import asyncio
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from .world import Table, TableMutation, CODECS
+
+class Operation(str, Enum):
+    CREATE = "create"
+    UPDATE = "update"
+    DELETE = "delete"
+
+def _mutation_table(name: str) -> Table:
+    # Mutation names use the singular entity ("MESH_METADATA"), tables the plural.
+    base, metadata, _ = name.partition("_METADATA")
+    for plural in ("", "S", "ES"):
+        candidate = f"{base}{plural}{metadata}"
+        if candidate in Table.__members__:
+            return Table[candidate]
+    raise LookupError(f"No table for mutation entity {name}")
+
+MUTATIONS: Dict[TableMutation, Tuple[Operation, Table]] = {
+    mutation: (Operation(mutation.name.split("_", 1)[0].lower()), _mutation_table(mutation.name.split("_", 1)[1]))
+    for mutation in TableMutation
+}
+
+MUTATION_FOR: Dict[Tuple[Operation, Table], TableMutation] = {value: key for key, value in MUTATIONS.items()}
+
+TABLE_KEYS: Dict[Table, str] = {
+    table: "id" if table is Table.AGENT_PROFILES else "metadata_id" if table.value.endswith("_metadata") else "vircadia_uuid"
+    for table in Table
+}
+
+# Referenced tables before the tables that reference them; deletes run in reverse.
+TABLE_ORDER: Tuple[Table, ...] = (
+    Table.AGENT_PROFILES,
+    Table.WORLD_GLTF,
+    Table.BUFFERS,
+    Table.BUFFER_VIEWS,
+    Table.ACCESSORS,
+    Table.SAMPLERS,
+    Table.IMAGES,
+    Table.TEXTURES,
+    Table.MATERIALS,
+    Table.MESHES,
+    Table.CAMERAS,
+    Table.SKINS,
+    Table.NODES,
+    Table.ANIMATIONS,
+    Table.SCENES,
+) + tuple(table for table in Table if table.value.endswith("_metadata"))
+
+@dataclass
+class _Pending:
+    operation: Operation
+    payload: Dict[str, Any] = field(default_factory=dict)
+    # A delete followed by a create of the same key: the delete is sent ahead of the create.
+    replaces: bool = False
+
+class MutationBatcher:
+    def __init__(
+        self,
+        send: Callable[[TableMutation, List[Dict[str, Any]]], Awaitable[Any]],
+        max_batch: int = 500,
+        max_delay: float = 1 / 60,
+        max_pending: int = 10000,
+    ):
+        self.send = send
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self._pending: Dict[Table, Dict[Any, _Pending]] = {}
+        self._count = 0
+        self._flush_lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+        self._error: Optional[BaseException] = None
+        self._closed = False
+
+    def __len__(self) -> int:
+        return self._count
+
+    async def __aenter__(self) -> 'MutationBatcher':
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.close()
+
+    async def create(self, table: Table, row: Any) -> None:
+        await self.submit(MUTATION_FOR[(Operation.CREATE, Table(table))], row)
+
+    async def update(self, table: Table, row: Any) -> None:
+        await self.submit(MUTATION_FOR[(Operation.UPDATE, Table(table))], row)
+
+    async def delete(self, table: Table, key: Any) -> None:
+        table = Table(table)
+        await self.submit(MUTATION_FOR[(Operation.DELETE, table)], {TABLE_KEYS[table]: key})
+
+    async def submit(self, mutation: TableMutation, row: Any) -> None:
+        if self._closed:
+            raise RuntimeError("MutationBatcher is closed")
+        self._raise_pending_error()
+        operation, table = MUTATIONS[TableMutation(mutation)]
+        # A row object is the whole row, so an update from one also clears its unset columns.
+        payload = row if isinstance(row, dict) else CODECS[type(row)].to_dict(row, operation is Operation.UPDATE)
+        key = payload.get(TABLE_KEYS[table])
+        if key is None:
+            raise ValueError(f"{mutation.value} needs {TABLE_KEYS[table]}")
+        self._coalesce(table, key, operation, payload)
+        if self._count >= self.max_pending:
+            # Backpressure: once sends fall this far behind, the producer waits for them.
+            await self.flush()
+        elif self._timer is None or self._timer.done():
+            delay = 0 if self._count >= self.max_batch else self.max_delay
+            self._timer = asyncio.get_running_loop().create_task(self._flush_later(delay))
+        elif self._count >= self.max_batch and not self._flush_lock.locked():
+            self._timer.cancel()
+            self._timer = asyncio.get_running_loop().create_task(self._flush_later(0))
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            pending, self._pending, self._count = self._pending, {}, 0
+            if pending:
+                try:
+                    await self._send(pending)
+                except BaseException:
+                    self._restore(pending)
+                    raise
+        self._raise_pending_error()
+
+    async def close(self) -> None:
+        self._closed = True
+        if self._timer is not None and not self._timer.done():
+            self._timer.cancel()
+        await self.flush()
+
+    def _restore(self, unsent: Dict[Table, Dict[Any, _Pending]]) -> None:
+        # A failed send leaves in `unsent` exactly what did not go out. It becomes the
+        # pending state again, with anything submitted while the send was in flight
+        # coalesced on top so newer submissions win. A newer submission that submit()
+        # would have refused against the restored row (an update of a row whose delete is
+        # still pending) is dropped, and its error is raised by the next submit or flush.
+        newer, self._pending = self._pending, {table: rows for table, rows in unsent.items() if rows}
+        self._count = sum(len(rows) for rows in self._pending.values())
+        for table, rows in newer.items():
+            for key, item in rows.items():
+                try:
+                    if item.replaces:
+                        self._coalesce(table, key, Operation.DELETE, {TABLE_KEYS[table]: key})
+                    self._coalesce(table, key, item.operation, item.payload)
+                except ValueError as error:
+                    if self._error is None:
+                        self._error = error
+
+    def _coalesce(self, table: Table, key: Any, operation: Operation, payload: Dict[str, Any]) -> None:
+        rows = self._pending.setdefault(table, {})
+        current = rows.get(key)
+        if current is None:
+            rows[key] = _Pending(operation, dict(payload))
+            self._count += 1
+        elif operation is Operation.DELETE:
+            if current.operation is Operation.CREATE and not current.replaces:
+                del rows[key]
+                self._count -= 1
+            else:
+                rows[key] = _Pending(Operation.DELETE, dict(payload))
+        elif current.operation is Operation.DELETE:
+            if operation is Operation.UPDATE:
+                raise ValueError(f"update of {table.value} {key} after it was deleted")
+            rows[key] = _Pending(Operation.CREATE, dict(payload), replaces=True)
+        elif operation is Operation.CREATE:
+            raise ValueError(f"create of {table.value} {key} which is already pending")
+        elif current.operation is Operation.CREATE:
+            # The create has not gone out yet, so clearing a column means leaving it out.
+            for name, value in payload.items():
+                if value is None:
+                    current.payload.pop(name, None)
+                else:
+                    current.payload[name] = value
+        else:
+            current.payload.update(payload)
+
+    async def _flush_later(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+        try:
+            await self.flush()
+        except BaseException as error:
+            if isinstance(error, asyncio.CancelledError):
+                raise
+            self._error = error
+
+    async def _send(self, pending: Dict[Table, Dict[Any, _Pending]]) -> None:
+        ordered = [table for table in TABLE_ORDER if table in pending]
+        phases: List[Tuple[Operation, List[Table], Callable[[_Pending], bool]]] = [
+            (Operation.DELETE, ordered[::-1], lambda item: item.replaces),
+            (Operation.CREATE, ordered, lambda item: item.operation is Operation.CREATE),
+            (Operation.UPDATE, ordered, lambda item: item.operation is Operation.UPDATE),
+            (Operation.DELETE, ordered[::-1], lambda item: item.operation is Operation.DELETE),
+        ]
+        # Items leave `pending` as their batch is sent, so if a send raises, what is left is
+        # exactly what still has to go out.
+        for phase, (operation, tables, selected) in enumerate(phases):
+            for table in tables:
+                items = pending[table]
+                keys = [key for key, item in items.items() if selected(item)]
+                if operation is Operation.DELETE:
+                    key_name = TABLE_KEYS[table]
+                    rows = [{key_name: key} for key in keys]
+                else:
+                    rows = [items[key].payload for key in keys]
+                mutation = MUTATION_FOR[(operation, table)]
+                for start in range(0, len(rows), self.max_batch):
+                    await self._dispatch(mutation, rows[start:start + self.max_batch])
+                    for key in keys[start:start + self.max_batch]:
+                        if phase == 0:
+                            # The replaced row is gone; what remains is a plain create.
+                            items[key].replaces = False
+                        else:
+                            del items[key]
+
+    async def _dispatch(self, mutation: TableMutation, rows: List[Dict[str, Any]]) -> None:
+        await self.send(mutation, rows)
+
+    def _raise_pending_error(self) -> None:
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
@@ -0,0 +1,254 @@
+import os
+import traceback
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from .culling import CullingService
+from .gltf import load_buffer
+from .graph import WorldGraph
+from .world import Table, TableBuffer, TableNode
+
+# Worlds with more nodes than this are split into shards of whole root subtrees.
+SHARD_NODES = 4096
+
+# Shared memory segments a worker has attached, by name; reused across the shards it runs.
+_ATTACHED: Dict[str, shared_memory.SharedMemory] = {}
+
+@dataclass
+class Shard:
+    world_uuid: str
+    roots: Tuple[str, ...]
+    rows: List[Any]
+    # buffer uuid -> (shared memory name, byte length); None names an empty buffer.
+    buffers: Dict[str, Tuple[Optional[str], int]] = field(default_factory=dict)
+    # Rows referenced from this shard that exist in the world but travel in other shards.
+    foreign: Set[str] = field(default_factory=set)
+    _graph: Optional[WorldGraph] = field(default=None, init=False, repr=False, compare=False)
+
+    @property
+    def graph(self) -> WorldGraph:
+        if self._graph is None:
+            self._graph = WorldGraph(self.rows)
+        return self._graph
+
+    def load(self, row: TableBuffer) -> memoryview:
+        # Drop-in for gltf.load_buffer inside a worker: a view straight onto the segment
+        # the parent published, so payloads are never pickled or copied.
+        name, size = self.buffers[row.vircadia_uuid]
+        if name is None:
+            return memoryview(b"")
+        segment = _ATTACHED.get(name)
+        if segment is None:
+            segment = _ATTACHED[name] = shared_memory.SharedMemory(name=name)
+        return segment.buf[:size]
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = dict(self.__dict__)
+        state["_graph"] = None
+        return state
+
+@dataclass
+class ShardResult:
+    world_uuid: str
+    roots: Tuple[str, ...]
+    value: Any = None
+    error: Optional[str] = None
+
+def _run(job: Callable[[Shard], Any], shard: Shard) -> ShardResult:
+    try:
+        return ShardResult(shard.world_uuid, shard.roots, job(shard))
+    except Exception:
+        return ShardResult(shard.world_uuid, shard.roots, error=traceback.format_exc())
+    finally:
+        shard._graph = None
+        # Covers this shard's segments and any an earlier shard could not close yet.
+        for name in list(_ATTACHED):
+            _release(name)
+
+def _release(name: str) -> None:
+    # Segments still exported by a live view (say, a result array) stay attached; _run
+    # retries every attached segment after each shard.
+    segment = _ATTACHED.get(name)
+    if segment is None:
+        return
+    try:
+        segment.close()
+    except BufferError:
+        return
+    del _ATTACHED[name]
+
+def bake_bounds(shard: Shard) -> Dict[str, Tuple[List[float], List[float]]]:
+    service = CullingService(shard.graph, shard.world_uuid)
+    nodes = service.nodes
+    return {
+        nodes[index].vircadia_uuid: (lo, hi)
+        for index, lo, hi in zip(service._bounded.tolist(), service.lo.tolist(), service.hi.tolist())
+    }
+
+def validate(shard: Shard) -> List[Tuple[str, str, str]]:
+    foreign = shard.foreign
+    return [edge for edge in shard.graph.dangling() if edge[2] not in foreign]
+
+class WorldPipeline:
+    def __init__(
+        self,
+        graph: WorldGraph,
+        load: Callable[[TableBuffer], Any] = load_buffer,
+        max_workers: Optional[int] = None,
+        shard_nodes: Optional[int] = SHARD_NODES,
+        max_pending: Optional[int] = None,
+    ):
+        self.graph = graph
+        self.load = load
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.shard_nodes = shard_nodes
+        # Bounds how many shards (and so how many published buffers) are in flight at once.
+        self.max_pending = max_pending or self.max_workers * 2
+
+    def shards(self, world_uuids: Optional[Iterable[str]] = None) -> Iterator[Shard]:
+        graph = self.graph
+        for world_uuid in graph.world_uuids() if world_uuids is None else world_uuids:
+            rows = graph.in_world(world_uuid)
+            nodes = graph.in_world(world_uuid, Table.NODES)
+            if not rows:
+                continue
+            if self.shard_nodes is None or len(nodes) <= self.shard_nodes:
+                yield Shard(world_uuid, (), rows)
+            else:
+                yield from self._split(world_uuid, nodes)
+
+    def run(self, job: Callable[[Shard], Any], world_uuids: Optional[Iterable[str]] = None) -> Iterator[ShardResult]:
+        # `job` runs in a worker process, so it must be a picklable top-level callable.
+        # Results are yielded in completion order, not submission order.
+        published: Dict[str, Tuple[Optional[shared_memory.SharedMemory], int]] = {}
+        users: Dict[str, int] = {}
+        pending: Dict[Future, Shard] = {}
+        shards = self.shards(world_uuids)
+        try:
+            with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+                exhausted = False
+                while pending or not exhausted:
+                    while not exhausted and len(pending) < self.max_pending:
+                        shard = next(shards, None)
+                        if shard is None:
+                            exhausted = True
+                            break
+                        self._publish(shard, published, users)
+                        pending[pool.submit(_run, job, shard)] = shard
+                    if not pending:
+                        break
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        shard = pending.pop(future)
+                        self._retire(shard, published, users)
+                        try:
+                            yield future.result()
+                        except Exception:
+                            yield ShardResult(shard.world_uuid, shard.roots, error=traceback.format_exc())
+        finally:
+            for segment, _ in published.values():
+                if segment is not None:
+                    segment.close()
+                    segment.unlink()
+
+    def _split(self, world_uuid: str, nodes: List[TableNode]) -> Iterator[Shard]:
+        graph = self.graph
+        world = graph.get(world_uuid)
+        members = {node.vircadia_uuid for node in nodes}
+        children = {child for node in nodes for child in node.gltf_children or () if child in members}
+        roots = [node.vircadia_uuid for node in nodes if node.vircadia_uuid not in children]
+        # Animations and skins point at the nodes they drive; they travel with those nodes.
+        drivers = graph.in_world(world_uuid, Table.ANIMATIONS) + graph.in_world(world_uuid, Table.SKINS)
+        covered: Set[str] = set()
+        batch: List[str] = []
+        closure: Set[str] = set()
+        batch_nodes = 0
+        placed: Set[str] = set()
+
+        def shard(shard_roots: Tuple[str, ...], shard_rows: Set[str]) -> Shard:
+            shard_rows = {uuid for uuid in shard_rows if uuid in graph}
+            placed.update(shard_rows)
+            foreign = {
+                target
+                for uuid in shard_rows
+                for target in graph.references(uuid)
+                if target not in shard_rows and target in graph
+            }
+            rows = [world] if world is not None else []
+            rows += [graph.get(uuid) for uuid in shard_rows if uuid != world_uuid]
+            return Shard(world_uuid, shard_roots, rows, foreign=foreign)
+
+        def flush() -> Shard:
+            shard_rows = {world_uuid} | closure
+            for driver in drivers:
+                targets = graph.references(driver.vircadia_uuid)
+                if not any(target in closure for target in targets):
+                    continue
+                # Only the driver's accessors come along; the other nodes it drives stay
+                # in their own shards.
+                shard_rows.add(driver.vircadia_uuid)
+                for target in targets:
+                    if target not in members:
+                        shard_rows.add(target)
+                        shard_rows |= graph.dependencies(target)
+            return shard(tuple(batch), shard_rows)
+
+        # Nodes caught in a parent cycle have no root; whichever is reached first stands in.
+        for root in roots + [node.vircadia_uuid for node in nodes]:
+            if root in covered:
+                continue
+            subtree = graph.dependencies(root)
+            subtree.add(root)
+            subtree_nodes = len(subtree & members)
+            if batch and batch_nodes + subtree_nodes > self.shard_nodes:
+                yield flush()
+                batch, closure, batch_nodes = [], set(), 0
+            batch.append(root)
+            closure |= subtree
+            covered |= subtree & members
+            batch_nodes += subtree_nodes
+        if batch:
+            yield flush()
+        # Scenes and whatever no node reaches (orphaned materials, drivers of missing nodes)
+        # go in one last rootless shard, so per-shard jobs such as validate still see them.
+        # Scenes come alone; their nodes are already in the shards above.
+        residual = {row.vircadia_uuid for row in graph.in_world(world_uuid) if row.vircadia_uuid not in placed}
+        residual.discard(world_uuid)
+        if residual:
+            shard_rows = {world_uuid} | residual
+            for uuid in residual:
+                if graph.table_of(uuid) is not Table.SCENES:
+                    shard_rows |= graph.dependencies(uuid)
+            yield shard((), shard_rows)
+
+    def _publish(self, shard: Shard, published: Dict[str, Any], users: Dict[str, int]) -> None:
+        for row in shard.rows:
+            if not isinstance(row, TableBuffer):
+                continue
+            uuid = row.vircadia_uuid
+            if uuid not in published:
+                data = memoryview(self.load(row)).cast("B")
+                if row.gltf_byteLength is not None:
+                    data = data[:row.gltf_byteLength]
+                size = data.nbytes
+                segment = shared_memory.SharedMemory(create=True, size=size) if size else None
+                if segment is not None:
+                    segment.buf[:size] = data
+                published[uuid] = (segment, size)
+            segment, size = published[uuid]
+            shard.buffers[uuid] = (segment.name if segment is not None else None, size)
+            users[uuid] = users.get(uuid, 0) + 1
+
+    def _retire(self, shard: Shard, published: Dict[str, Any], users: Dict[str, int]) -> None:
+        # A buffer is unlinked once no shard in flight uses it; workers still mapping it
+        # keep their pages until they exit, and a later republish gets a fresh name.
+        for uuid in shard.buffers:
+            users[uuid] -= 1
+            if users[uuid]:
+                continue
+            del users[uuid]
+            segment, _ = published.pop(uuid)
+            if segment is not None:
+                segment.close()
+                segment.unlink()
@@ -1,13 +1,162 @@
 from dataclasses import dataclass, field
+from typing import Any, Iterable, Iterator, List, Type, Union
+import numpy as np
 
-@dataclass
+@dataclass(slots=True)
 class Vector3:
     x: float = field(default=0.0)
     y: float = field(default=0.0)
     z: float = field(default=0.0)
 
-@dataclass
+@dataclass(slots=True)
 class Color3:
     r: float = field(default=0.0)
     g: float = field(default=0.0)
-    b: float = field(default=0.0)
\ No newline at end of file
+    b: float = field(default=0.0)
+
+@dataclass(frozen=True, slots=True)
+class FrozenVector3:
+    x: float = field(default=0.0)
+    y: float = field(default=0.0)
+    z: float = field(default=0.0)
+
+@dataclass(frozen=True, slots=True)
+class FrozenColor3:
+    r: float = field(default=0.0)
+    g: float = field(default=0.0)
+    b: float = field(default=0.0)
+
+class _Float3Array:
+    _element: Type[Any]
+    _fields: tuple
+
+    __slots__ = ('data',)
+
+    def __init__(self, data: Any = (), dtype: Any = np.float64):
+        array = np.asarray(data, dtype=dtype)
+        self.data = array.reshape(-1, 3) if array.size else np.empty((0, 3), dtype=dtype)
+
+    @classmethod
+    def zeros(cls, count: int, dtype: Any = np.float64) -> Any:
+        return cls(np.zeros((count, 3), dtype=dtype), dtype=dtype)
+
+    @classmethod
+    def from_items(cls, items: Iterable[Any], dtype: Any = np.float64) -> Any:
+        a, b, c = cls._fields
+        items = items if isinstance(items, list) else list(items)
+        return cls(
+            np.fromiter(
+                (value for item in items for value in (getattr(item, a), getattr(item, b), getattr(item, c))),
+                dtype=dtype, count=3 * len(items),
+            ),
+            dtype=dtype,
+        )
+
+    @classmethod
+    def from_dicts(cls, items: Iterable[Any], dtype: Any = np.float64) -> Any:
+        a, b, c = cls._fields
+        items = items if isinstance(items, list) else list(items)
+        return cls(
+            np.fromiter(
+                (value for item in items for value in (item[a], item[b], item[c])),
+                dtype=dtype, count=3 * len(items),
+            ),
+            dtype=dtype,
+        )
+
+    def to_items(self) -> List[Any]:
+        element = self._element
+        return [element(p, q, r) for p, q, r in self.data.tolist()]
+
+    def to_dicts(self) -> List[dict]:
+        a, b, c = self._fields
+        return [{a: p, b: q, c: r} for p, q, r in self.data.tolist()]
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self.to_items())
+
+    def __getitem__(self, index: Any) -> Any:
+        if isinstance(index, (int, np.integer)):
+            p, q, r = self.data[index].tolist()
+            return self._element(p, q, r)
+        return type(self)(self.data[index], dtype=self.data.dtype)
+
+    def __setitem__(self, index: Any, value: Any) -> None:
+        self.data[index] = _operand(value)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, type(self)) and np.array_equal(self.data, other.data)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.data.tolist()!r})"
+
+    def copy(self) -> Any:
+        return type(self)(self.data.copy(), dtype=self.data.dtype)
+
+    def __add__(self, other: Any) -> Any:
+        return type(self)(self.data + _operand(other), dtype=self.data.dtype)
+
+    def __sub__(self, other: Any) -> Any:
+        return type(self)(self.data - _operand(other), dtype=self.data.dtype)
+
+    def __mul__(self, factor: Any) -> Any:
+        return self.scale(factor)
+
+    __rmul__ = __mul__
+
+    def __iadd__(self, other: Any) -> Any:
+        self.data += _operand(other)
+        return self
+
+    def __isub__(self, other: Any) -> Any:
+        self.data -= _operand(other)
+        return self
+
+    def scale(self, factor: Any) -> Any:
+        factor = np.asarray(factor, dtype=self.data.dtype)
+        if factor.ndim == 1 and len(factor) == len(self.data):
+            factor = factor[:, None]
+        return type(self)(self.data * factor, dtype=self.data.dtype)
+
+    def dot(self, other: Any) -> np.ndarray:
+        return np.einsum('ij,ij->i', self.data, np.broadcast_to(_operand(other), self.data.shape))
+
+    def length(self) -> np.ndarray:
+        return np.sqrt(np.einsum('ij,ij->i', self.data, self.data))
+
+    def distance(self, other: Any) -> np.ndarray:
+        delta = self.data - _operand(other)
+        return np.sqrt(np.einsum('ij,ij->i', delta, delta))
+
+class Vector3Array(_Float3Array):
+    __slots__ = ()
+    _element = Vector3
+    _fields = ('x', 'y', 'z')
+
+    def cross(self, other: Any) -> 'Vector3Array':
+        return Vector3Array(np.cross(self.data, _operand(other)), dtype=self.data.dtype)
+
+    def normalized(self) -> 'Vector3Array':
+        length = self.length()
+        length[length == 0] = 1
+        return Vector3Array(self.data / length[:, None], dtype=self.data.dtype)
+
+class Color3Array(_Float3Array):
+    __slots__ = ()
+    _element = Color3
+    _fields = ('r', 'g', 'b')
+
+    def clamped(self, lo: float = 0.0, hi: float = 1.0) -> 'Color3Array':
+        return Color3Array(np.clip(self.data, lo, hi), dtype=self.data.dtype)
+
+def _operand(other: Any) -> Union[np.ndarray, float]:
+    if isinstance(other, _Float3Array):
+        return other.data
+    if isinstance(other, (Vector3, FrozenVector3)):
+        return np.array((other.x, other.y, other.z))
+    if isinstance(other, (Color3, FrozenColor3)):
+        return np.array((other.r, other.g, other.b))
+    return np.asarray(other)
@@ -0,0 +1,280 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from .server import BundledScript, BundleScriptsRequest, BundleScriptsResponse
+
+SCRIPT_URL_FIELDS: Tuple[str, ...] = (
+    "vircadia_babylonjs_script_agent_script_raw_file_url",
+    "vircadia_babylonjs_script_agent_script_git_file_url",
+    "vircadia_babylonjs_script_persistent_script_raw_file_url",
+    "vircadia_babylonjs_script_persistent_script_git_file_url",
+)
+
+# Repository URLs name a checkout, not a fetchable script, so they are only collected on request.
+SCRIPT_REPO_FIELDS: Tuple[str, ...] = (
+    "vircadia_babylonjs_script_agent_script_git_repo_url",
+    "vircadia_babylonjs_script_persistent_script_git_repo_url",
+)
+
+def script_urls(rows: Iterable[Any], fields: Tuple[str, ...] = SCRIPT_URL_FIELDS) -> List[str]:
+    # Rows share interned traits, so each distinct traits object is read once no matter
+    # how many rows carry it.
+    urls: Dict[str, None] = {}
+    seen: Set[int] = set()
+    for row in rows:
+        traits = getattr(row, "babylon_traits", None)
+        if traits is None or id(traits) in seen:
+            continue
+        seen.add(id(traits))
+        for name in fields:
+            url = getattr(traits, name)
+            if url:
+                urls[url] = None
+    return list(urls)
+
+_READ_CHUNK = 64 * 1024
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+def _http_date_iso(value: Optional[str]) -> Optional[str]:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).astimezone(timezone.utc).isoformat()
+    except (TypeError, ValueError):
+        return None
+
+@dataclass
+class _CachedScript:
+    digest: str
+    size: int
+    timestamp: str
+    checked: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+class ScriptResolver:
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        cache_bytes: int = 64 * 1024 * 1024,
+        max_workers: int = 8,
+        max_age: float = 60.0,
+        timeout: float = 10.0,
+        file_roots: Iterable[str] = (),
+        max_script_bytes: int = 8 * 1024 * 1024,
+    ):
+        self.cache_dir = cache_dir
+        self.cache_bytes = cache_bytes
+        self.max_workers = max_workers
+        self.max_age = max_age
+        self.timeout = timeout
+        self.max_script_bytes = max_script_bytes
+        # Script urls come from world rows, so only http(s) is fetched unless file urls
+        # under one of these directories are explicitly allowed.
+        self.file_roots = tuple(os.path.realpath(root) for root in file_roots)
+        self._entries: Dict[str, _CachedScript] = {}
+        self._content: "OrderedDict[str, bytes]" = OrderedDict()
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+        self._dirty = False
+        if cache_dir is not None:
+            os.makedirs(os.path.join(cache_dir, "objects"), exist_ok=True)
+            self._load_index()
+
+    @property
+    def cached_bytes(self) -> int:
+        return self._cached_bytes
+
+    def bundle(self, request: Any) -> BundleScriptsResponse:
+        if isinstance(request, dict):
+            request = BundleScriptsRequest.parse(request)
+        response = self.resolve(request.script_urls or ())
+        for code in request.script_raw or ():
+            response.scripts.append(BundledScript(code=code, size=len(code.encode()), timestamp=_now_iso()))
+        return response
+
+    def resolve_world(self, rows: Iterable[Any]) -> BundleScriptsResponse:
+        return self.resolve(script_urls(rows))
+
+    def resolve(self, urls: Iterable[str]) -> BundleScriptsResponse:
+        urls = list(urls)
+        distinct = list(dict.fromkeys(urls))
+        results: Dict[str, BundledScript] = {}
+        pending = []
+        for url in distinct:
+            fresh = self._fresh(url)
+            if fresh is not None:
+                results[url] = fresh
+            else:
+                pending.append(url)
+        if pending:
+            with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(pending)))) as pool:
+                for url, script in zip(pending, pool.map(self._fetch, pending)):
+                    results[url] = script
+        if self._dirty:
+            self._save_index()
+        return BundleScriptsResponse([results[url] for url in urls])
+
+    def _fresh(self, url: str) -> Optional[BundledScript]:
+        entry = self._entries.get(url)
+        if entry is None or time.time() - entry.checked >= self.max_age:
+            return None
+        content = self._read(entry.digest)
+        return None if content is None else self._script(url, entry, content)
+
+    def _allowed(self, url: str) -> bool:
+        parsed = urllib.parse.urlparse(url)
+        if parsed.scheme in ("http", "https"):
+            return bool(parsed.netloc)
+        if parsed.scheme != "file" or parsed.netloc not in ("", "localhost"):
+            return False
+        path = os.path.realpath(urllib.parse.unquote(parsed.path))
+        return any(os.path.commonpath((root, path)) == root for root in self.file_roots)
+
+    def _fetch(self, url: str) -> BundledScript:
+        if not self._allowed(url):
+            return BundledScript(url=url, error=f"Refusing to fetch {url}: only http(s) urls are allowed")
+        entry = self._entries.get(url)
+        content = self._read(entry.digest) if entry is not None else None
+        request = urllib.request.Request(url)
+        if content is not None:
+            if entry.etag:
+                request.add_header("If-None-Match", entry.etag)
+            if entry.last_modified:
+                request.add_header("If-Modified-Since", entry.last_modified)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                body = self._read_body(url, response)
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+        except urllib.error.HTTPError as error:
+            if error.code == 304 and content is not None:
+                with self._lock:
+                    entry.checked = time.time()
+                    self._dirty = True
+                return self._script(url, entry, content)
+            return self._failed(url, entry, content, error)
+        except (urllib.error.URLError, OSError, ValueError) as error:
+            return self._failed(url, entry, content, error)
+        digest = hashlib.sha256(body).hexdigest()
+        if entry is not None and entry.digest == digest:
+            timestamp = entry.timestamp
+        else:
+            timestamp = _http_date_iso(last_modified) or _now_iso()
+        entry = _CachedScript(digest, len(body), timestamp, time.time(), etag, last_modified)
+        self._write(digest, body)
+        with self._lock:
+            self._entries[url] = entry
+            self._dirty = True
+        return self._script(url, entry, body)
+
+    def _read_body(self, url: str, response: Any) -> bytes:
+        # Read in chunks and stop as soon as the limit is passed, whether or not the
+        # server sent (or honestly sent) a Content-Length.
+        limit = self.max_script_bytes
+        length = response.headers.get("Content-Length")
+        if length is not None and length.isdigit() and int(length) > limit:
+            raise ValueError(f"{url} is {length} bytes, over the {limit}-byte script limit")
+        chunks: List[bytes] = []
+        size = 0
+        while True:
+            chunk = response.read(min(_READ_CHUNK, limit + 1 - size))
+            if not chunk:
+                return b"".join(chunks)
+            size += len(chunk)
+            if size > limit:
+                raise ValueError(f"{url} is over the {limit}-byte script limit")
+            chunks.append(chunk)
+
+    def _failed(self, url: str, entry: Optional[_CachedScript], content: Optional[bytes], error: BaseException) -> BundledScript:
+        # A failed revalidation still serves the last good copy; the error is reported
+        # alongside it so callers can tell the script may be stale.
+        if content is not None:
+            script = self._script(url, entry, content)
+            script.error = str(error)
+            return script
+        return BundledScript(url=url, error=str(error))
+
+    def _script(self, url: str, entry: _CachedScript, content: bytes) -> BundledScript:
+        return BundledScript(url=url, code=content.decode("utf-8", errors="replace"), size=entry.size, timestamp=entry.timestamp)
+
+    def _read(self, digest: str) -> Optional[bytes]:
+        with self._lock:
+            content = self._content.get(digest)
+            if content is not None:
+                self._content.move_to_end(digest)
+                return content
+        if self.cache_dir is None:
+            return None
+        try:
+            with open(self._object_path(digest), "rb") as file:
+                content = file.read()
+        except OSError:
+            return None
+        if hashlib.sha256(content).hexdigest() != digest:
+            return None
+        self._remember(digest, content)
+        return content
+
+    def _write(self, digest: str, content: bytes) -> None:
+        self._remember(digest, content)
+        if self.cache_dir is None:
+            return
+        path = self._object_path(digest)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._atomic_write(path, content)
+
+    def _remember(self, digest: str, content: bytes) -> None:
+        with self._lock:
+            if digest in self._content:
+                self._content.move_to_end(digest)
+                return
+            self._content[digest] = content
+            self._cached_bytes += len(content)
+            while self._cached_bytes > self.cache_bytes and len(self._content) > 1:
+                _, evicted = self._content.popitem(last=False)
+                self._cached_bytes -= len(evicted)
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, "objects", digest[:2], digest)
+
+    def _load_index(self) -> None:
+        try:
+            with open(os.path.join(self.cache_dir, "index.json")) as file:
+                index = json.load(file)
+        except (OSError, ValueError):
+            return
+        self._entries = {url: _CachedScript(**entry) for url, entry in index.items()}
+
+    def _save_index(self) -> None:
+        with self._lock:
+            self._dirty = False
+            index = {url: asdict(entry) for url, entry in self._entries.items()}
+        if self.cache_dir is not None:
+            self._atomic_write(os.path.join(self.cache_dir, "index.json"), json.dumps(index, separators=(",", ":")).encode())
+
+    def _atomic_write(self, path: str, content: bytes) -> None:
+        handle, temporary = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".script-")
+        try:
+            with os.fdopen(handle, "wb") as file:
+                file.write(content)
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
@@ -1,4 +1,6 @@
 from enum import Enum
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
 
 class ProxySubdomain(str, Enum):
     SUPABASE_API = "supabase-api"
@@ -6,3 +8,34 @@ class ProxySubdomain(str, Enum):
     SUPABASE_GRAPHQL = "supabase-graphql"
     SUPABASE_INBUCKET = "supabase-inbucket"
     SUPABASE_STUDIO = "supabase-studio"
+    SERVER_API = "server-api"
+
+class ServerApiRoute(str, Enum):
+    BUNDLE_SCRIPTS = "api/bundle-scripts"
+
+@dataclass
+class BundleScriptsRequest:
+    script_urls: Optional[List[str]] = None
+    script_raw: Optional[List[str]] = None
+
+    @classmethod
+    def parse(cls, obj: Dict[str, Any]) -> 'BundleScriptsRequest':
+        return cls(script_urls=obj.get('script_urls'), script_raw=obj.get('script_raw'))
+
+@dataclass
+class BundledScript:
+    url: Optional[str] = None
+    code: Optional[str] = None
+    size: Optional[int] = None
+    timestamp: Optional[str] = None
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {key: value for key, value in self.__dict__.items() if value is not None}
+
+@dataclass
+class BundleScriptsResponse:
+    scripts: List[BundledScript] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"scripts": [script.to_dict() for script in self.scripts]}
@@ -0,0 +1,333 @@
+from math import floor, ceil
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+from .primitive import Vector3
+from .agent import Audio, PresenceTable
+
+Cell = Tuple[int, int, int]
+
+_PAIR_CANDIDATES = 1 << 22
+
+_HALF_NEIGHBOURS = [
+    (dx, dy, dz)
+    for dx in (-1, 0, 1)
+    for dy in (-1, 0, 1)
+    for dz in (-1, 0, 1)
+    if (dx, dy, dz) > (0, 0, 0)
+]
+
+_NEIGHBOURS = [(0, 0, 0)] + _HALF_NEIGHBOURS + [(-dx, -dy, -dz) for dx, dy, dz in _HALF_NEIGHBOURS]
+
+def _xyz(position: Any) -> Tuple[float, float, float]:
+    if isinstance(position, Vector3):
+        return (float(position.x), float(position.y), float(position.z))
+    x, y, z = position
+    return (float(x), float(y), float(z))
+
+def _chunks(sizes: np.ndarray, budget: int) -> Iterable[Tuple[int, int]]:
+    total = np.cumsum(sizes)
+    lo = 0
+    while lo < len(sizes):
+        base = total[lo - 1] if lo else 0
+        hi = max(int(np.searchsorted(total, base + budget, side='right')), lo + 1)
+        yield lo, hi
+        lo = hi
+
+class SpatialGrid:
+    def __init__(self, cell_size: float = 100.0, capacity: int = 64):
+        if cell_size <= 0:
+            raise ValueError("cell_size must be positive")
+        capacity = max(int(capacity), 1)
+        self.cell_size = float(cell_size)
+        self._inverse = 1.0 / self.cell_size
+        self._slots: Dict[str, int] = {}
+        self._keys: List[str] = []
+        self._cell_of: List[Cell] = []
+        self._cells: Dict[Cell, Set[int]] = {}
+        self._positions = np.zeros((capacity, 3), dtype=np.float64)
+
+    @classmethod
+    def from_presences(cls, table: PresenceTable, cell_size: float = 100.0) -> 'SpatialGrid':
+        grid = cls(cell_size, capacity=len(table))
+        grid.update_many(table.agent_ids, table.positions)
+        return grid
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._slots
+
+    @property
+    def keys(self) -> List[str]:
+        return self._keys
+
+    def slot(self, key: str) -> int:
+        return self._slots[key]
+
+    def position(self, key: str) -> Vector3:
+        x, y, z = self._positions[self._slots[key]]
+        return Vector3(float(x), float(y), float(z))
+
+    def cell(self, position: Any) -> Cell:
+        x, y, z = _xyz(position)
+        inverse = self._inverse
+        return (floor(x * inverse), floor(y * inverse), floor(z * inverse))
+
+    def update(self, key: str, position: Any) -> None:
+        xyz = _xyz(position)
+        cell = self.cell(xyz)
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._append(key, cell)
+        elif self._cell_of[slot] != cell:
+            self._move(slot, cell)
+        self._positions[slot] = xyz
+
+    def update_many(self, keys: Iterable[str], positions: Any) -> None:
+        keys = list(keys)
+        positions = np.asarray(positions, dtype=np.float64).reshape(len(keys), 3)
+        cells = np.floor(positions * self._inverse).astype(np.int64).tolist()
+        self._reserve(len(self._keys) + len(keys))
+        slots = self._slots
+        cell_of = self._cell_of
+        rows = []
+        for key, cell in zip(keys, cells):
+            cell = (cell[0], cell[1], cell[2])
+            slot = slots.get(key)
+            if slot is None:
+                slot = self._append(key, cell)
+            elif cell_of[slot] != cell:
+                self._move(slot, cell)
+            rows.append(slot)
+        self._positions[rows] = positions
+
+    def remove(self, key: str) -> bool:
+        slot = self._slots.pop(key, None)
+        if slot is None:
+            return False
+        cell = self._cell_of[slot]
+        members = self._cells[cell]
+        members.discard(slot)
+        if not members:
+            del self._cells[cell]
+        last = len(self._keys) - 1
+        if slot != last:
+            moved = self._keys[last]
+            moved_cell = self._cell_of[last]
+            self._keys[slot] = moved
+            self._cell_of[slot] = moved_cell
+            self._slots[moved] = slot
+            self._positions[slot] = self._positions[last]
+            members = self._cells[moved_cell]
+            members.discard(last)
+            members.add(slot)
+        self._keys.pop()
+        self._cell_of.pop()
+        return True
+
+    def query_radius(self, center: Any, radius: float) -> List[str]:
+        return [key for key, _ in self._within(_xyz(center), radius)]
+
+    def nearest(self, center: Any, k: int = 1, max_distance: Optional[float] = None) -> List[Tuple[str, float]]:
+        if k <= 0 or not self._keys:
+            return []
+        center = _xyz(center)
+        cx, cy, cz = self.cell(center)
+        limit = float('inf') if max_distance is None else float(max_distance)
+        ring = 0
+        while True:
+            reach = ring * self.cell_size
+            if (2 * ring + 1) ** 3 >= len(self._cells) or reach >= limit:
+                # The search cube now covers more cells than are occupied (or the
+                # whole allowed range), so finish with a single pass over all candidates.
+                candidates = self._within(center, limit)
+                break
+            slots = self._gather(cx, cy, cz, ring)
+            if len(slots) >= k:
+                distances = self._distances(center, slots)
+                kth = np.partition(distances, k - 1)[k - 1]
+                # Anything outside the cube is at least `reach` away from the center.
+                if kth <= reach:
+                    candidates = [
+                        (self._keys[slot], float(distance))
+                        for slot, distance in zip(slots, distances)
+                        if distance <= limit
+                    ]
+                    break
+            ring += 1
+        candidates.sort(key=lambda item: item[1])
+        return candidates[:k]
+
+    def nearest_many(self, keys: Iterable[str], k: int, radii: Iterable[float]) -> Dict[str, List[Tuple[str, float]]]:
+        slots = self._slots
+        query = [slots[key] for key in keys]
+        result: Dict[str, List[Tuple[str, float]]] = {self._keys[slot]: [] for slot in query}
+        found_q, found_n, found_d = self.nearest_slots(query, k, radii)
+        keys = self._keys
+        for q, n, d in zip(found_q.tolist(), found_n.tolist(), found_d.tolist()):
+            result[keys[q]].append((keys[n], d))
+        return result
+
+    def nearest_slots(self, slots: Any, k: int, radii: Iterable[float]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # Batched k-nearest (excluding the query itself), searched one radius at a time
+        # with cells as wide as the radius: queries with k neighbours in a fine grid stop
+        # there and only the sparse remainder is joined again on coarser cells. Results
+        # come back grouped by query slot in ascending distance.
+        count = len(self._keys)
+        positions = self._positions[:count]
+        pending = np.unique(np.asarray(slots, dtype=np.intp))
+        radii = sorted(float(radius) for radius in radii if radius > 0)
+        empty = (np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float64))
+        found_q, found_n, found_d = [], [], []
+        for step, radius in enumerate(radii):
+            if not len(pending) or k <= 0:
+                break
+            cells = np.floor(positions / radius).astype(np.int64)
+            cells -= cells.min(axis=0) - 1
+            span = cells.max(axis=0) + 2
+            packed = (cells[:, 0] * span[1] + cells[:, 1]) * span[2] + cells[:, 2]
+            order = np.argsort(packed, kind='stable')
+            unique, starts, counts = np.unique(packed[order], return_index=True, return_counts=True)
+            query_cells = cells[pending]
+            step_q, step_n, step_d = [], [], []
+            for offset in _NEIGHBOURS:
+                neighbour = query_cells + offset
+                target = (neighbour[:, 0] * span[1] + neighbour[:, 1]) * span[2] + neighbour[:, 2]
+                match = np.minimum(np.searchsorted(unique, target), len(unique) - 1)
+                hit = np.flatnonzero(unique[match] == target)
+                cell = match[hit]
+                sizes = counts[cell]
+                for lo, hi in _chunks(sizes, _PAIR_CANDIDATES):
+                    sz = sizes[lo:hi]
+                    q = np.repeat(hit[lo:hi], sz)
+                    local = np.arange(int(sz.sum())) - np.repeat(np.cumsum(sz) - sz, sz)
+                    n = order[np.repeat(starts[cell[lo:hi]], sz) + local]
+                    d = np.linalg.norm(positions[pending[q]] - positions[n], axis=1)
+                    keep = (d <= radius) & (n != pending[q])
+                    step_q.append(q[keep])
+                    step_n.append(n[keep])
+                    step_d.append(d[keep])
+            q = np.concatenate(step_q) if step_q else empty[0]
+            n = np.concatenate(step_n) if step_n else empty[1]
+            d = np.concatenate(step_d) if step_d else empty[2]
+            ranked = np.lexsort((d, q))
+            q, n, d = q[ranked], n[ranked], d[ranked]
+            rank = np.arange(len(q)) - np.searchsorted(q, q)
+            done = np.bincount(q, minlength=len(pending)) >= k
+            if step == len(radii) - 1:
+                done[:] = True
+            keep = done[q] & (rank < k)
+            found_q.append(pending[q[keep]])
+            found_n.append(n[keep])
+            found_d.append(d[keep])
+            pending = pending[~done]
+        if not found_q:
+            return empty
+        q, n, d = np.concatenate(found_q), np.concatenate(found_n), np.concatenate(found_d)
+        ranked = np.lexsort((d, q))
+        return q[ranked], n[ranked], d[ranked]
+
+    def pairs_within(self, radius: float) -> List[Tuple[str, str, float]]:
+        keys = self._keys
+        a, b, distances = self.pair_slots(radius)
+        return list(zip([keys[s] for s in a.tolist()], [keys[s] for s in b.tolist()], distances.tolist()))
+
+    def pair_slots(self, radius: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # Sort-and-join over cells at least `radius` wide: every pair within range lies in the
+        # same cell or in one of the 13 half-space neighbours, and both the neighbour lookup
+        # and the per-cell-pair candidate expansion run as array operations.
+        radius = float(radius)
+        count = len(self._keys)
+        empty = (np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float64))
+        if count < 2 or radius < 0:
+            return empty
+        positions = self._positions[:count]
+        size = max(radius, self.cell_size) if radius > 0 else self.cell_size
+        cells = np.floor(positions / size).astype(np.int64)
+        cells -= cells.min(axis=0) - 1
+        span = cells.max(axis=0) + 2
+        packed = (cells[:, 0] * span[1] + cells[:, 1]) * span[2] + cells[:, 2]
+        order = np.argsort(packed, kind='stable')
+        unique, starts, counts = np.unique(packed[order], return_index=True, return_counts=True)
+        unique_cells = cells[order[starts]]
+        found_a, found_b, found_d = [], [], []
+        for offset in [(0, 0, 0)] + _HALF_NEIGHBOURS:
+            neighbour = unique_cells + offset
+            target = (neighbour[:, 0] * span[1] + neighbour[:, 1]) * span[2] + neighbour[:, 2]
+            match = np.minimum(np.searchsorted(unique, target), len(unique) - 1)
+            cell_a = np.flatnonzero(unique[match] == target)
+            cell_b = match[cell_a]
+            sizes = counts[cell_a] * counts[cell_b]
+            for lo, hi in _chunks(sizes, _PAIR_CANDIDATES):
+                ca, cb, sz = cell_a[lo:hi], cell_b[lo:hi], sizes[lo:hi]
+                pair = np.repeat(np.arange(len(sz)), sz)
+                local = np.arange(int(sz.sum())) - np.repeat(np.cumsum(sz) - sz, sz)
+                width = counts[cb][pair]
+                ia = local // width
+                ib = local % width
+                if offset == (0, 0, 0):
+                    keep = ia < ib
+                    pair, ia, ib = pair[keep], ia[keep], ib[keep]
+                slot_a = order[starts[ca][pair] + ia]
+                slot_b = order[starts[cb][pair] + ib]
+                d = np.linalg.norm(positions[slot_a] - positions[slot_b], axis=1)
+                hit = d <= radius
+                found_a.append(slot_a[hit])
+                found_b.append(slot_b[hit])
+                found_d.append(d[hit])
+        if not found_a:
+            return empty
+        return np.concatenate(found_a), np.concatenate(found_b), np.concatenate(found_d)
+
+    def audible_pairs(self) -> List[Tuple[str, str, float]]:
+        return self.pairs_within(Audio.DEFAULT_PANNER_OPTIONS["maxDistance"])
+
+    def _within(self, center: Tuple[float, float, float], radius: float) -> List[Tuple[str, float]]:
+        if radius == float('inf') or (2 * ceil(radius * self._inverse) + 1) ** 3 >= len(self._cells):
+            slots = list(range(len(self._keys)))
+        else:
+            cx, cy, cz = self.cell(center)
+            slots = self._gather(cx, cy, cz, int(ceil(radius * self._inverse)))
+        if not slots:
+            return []
+        distances = self._distances(center, slots)
+        keys = self._keys
+        return [(keys[slot], float(distance)) for slot, distance in zip(slots, distances) if distance <= radius]
+
+    def _gather(self, cx: int, cy: int, cz: int, reach: int) -> List[int]:
+        cells = self._cells
+        slots: List[int] = []
+        for x in range(cx - reach, cx + reach + 1):
+            for y in range(cy - reach, cy + reach + 1):
+                for z in range(cz - reach, cz + reach + 1):
+                    members = cells.get((x, y, z))
+                    if members:
+                        slots.extend(members)
+        return slots
+
+    def _distances(self, center: Tuple[float, float, float], slots: List[int]) -> np.ndarray:
+        return np.linalg.norm(self._positions[slots] - np.asarray(center), axis=1)
+
+    def _append(self, key: str, cell: Cell) -> int:
+        slot = len(self._keys)
+        self._reserve(slot + 1)
+        self._slots[key] = slot
+        self._keys.append(key)
+        self._cell_of.append(cell)
+        self._cells.setdefault(cell, set()).add(slot)
+        return slot
+
+    def _move(self, slot: int, cell: Cell) -> None:
+        previous = self._cell_of[slot]
+        members = self._cells[previous]
+        members.discard(slot)
+        if not members:
+            del self._cells[previous]
+        self._cell_of[slot] = cell
+        self._cells.setdefault(cell, set()).add(slot)
+
+    def _reserve(self, capacity: int) -> None:
+        current = len(self._positions)
+        if capacity > current:
+            self._positions = np.resize(self._positions, (max(capacity, current * 2), 3))
@@ -0,0 +1,73 @@
+import base64
+import numpy as np
+import pytest
+from python.gltf import GLBExporter
+from python.graph import WorldGraph
+from python.world import (
+    TableAccessor,
+    TableBuffer,
+    TableBufferView,
+    TableImage,
+    TableMaterial,
+    TableMesh,
+    TableNode,
+    TableSampler,
+    TableScene,
+    TableTexture,
+    TableWorldGLTF,
+)
+
+# Two triangles' worth of positions followed by a fake PNG, in one data: buffer.
+POSITIONS = np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 1], [1, 1, 0], [0, 1, 1]], dtype=np.float32)
+IMAGE = b"\x89PNG\r\n\x1a\n" + bytes(range(24))
+
+def world_rows(prefix="w"):
+    world = f"{prefix}-world"
+    payload = POSITIONS.tobytes() + IMAGE
+    uri = "data:application/octet-stream;base64," + base64.b64encode(payload).decode()
+    common = {"vircadia_world_uuid": world}
+    return [
+        TableWorldGLTF(vircadia_uuid=world, vircadia_name=prefix, gltf_asset={"version": "2.0"}, gltf_scene=0),
+        TableBuffer(vircadia_uuid=f"{prefix}-buffer", gltf_uri=uri, gltf_byteLength=len(payload), **common),
+        TableBufferView(vircadia_uuid=f"{prefix}-positions", gltf_buffer=f"{prefix}-buffer", gltf_byteLength=POSITIONS.nbytes, **common),
+        TableBufferView(
+            vircadia_uuid=f"{prefix}-image-view",
+            gltf_buffer=f"{prefix}-buffer",
+            gltf_byteOffset=POSITIONS.nbytes,
+            gltf_byteLength=len(IMAGE),
+            **common,
+        ),
+        TableAccessor(
+            vircadia_uuid=f"{prefix}-accessor",
+            gltf_bufferView=f"{prefix}-positions",
+            gltf_componentType=5126,
+            gltf_count=len(POSITIONS),
+            gltf_type="VEC3",
+            gltf_min=POSITIONS.min(axis=0).tolist(),
+            gltf_max=POSITIONS.max(axis=0).tolist(),
+            **common,
+        ),
+        TableSampler(vircadia_uuid=f"{prefix}-sampler", gltf_magFilter=9729, **common),
+        TableImage(vircadia_uuid=f"{prefix}-image", gltf_bufferView=f"{prefix}-image-view", gltf_mimeType="image/png", **common),
+        TableTexture(vircadia_uuid=f"{prefix}-texture", gltf_sampler=f"{prefix}-sampler", gltf_source=f"{prefix}-image", **common),
+        TableMaterial(
+            vircadia_uuid=f"{prefix}-material",
+            gltf_pbrMetallicRoughness={"baseColorTexture": {"index": f"{prefix}-texture"}},
+            **common,
+        ),
+        TableMesh(
+            vircadia_uuid=f"{prefix}-mesh",
+            gltf_primitives=[{"attributes": {"POSITION": f"{prefix}-accessor"}, "material": f"{prefix}-material"}],
+            **common,
+        ),
+        TableNode(vircadia_uuid=f"{prefix}-child", gltf_mesh=f"{prefix}-mesh", gltf_translation=[0, 0, 5], **common),
+        TableNode(vircadia_uuid=f"{prefix}-root", gltf_children=[f"{prefix}-child"], gltf_translation=[1, 2, 3], **common),
+        TableScene(vircadia_uuid=f"{prefix}-scene", gltf_nodes=[f"{prefix}-root"], **common),
+    ]
+
+@pytest.fixture
+def glb_path(tmp_path):
+    rows = world_rows()
+    path = tmp_path / "scene.glb"
+    GLBExporter(WorldGraph(rows)).export(rows[0].vircadia_uuid, path)
+    return path
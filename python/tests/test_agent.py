@@ -0,0 +1,132 @@
+import json
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pytest
+from python.agent import _FRAME_HEADER, Presence, PresenceCodec, PresenceDecoder, PresenceEncoder, PresenceTable, to_epoch_us
+from python.primitive import Vector3
+
+T1 = datetime(2024, 5, 1, 12, 0, 1, tzinfo=timezone.utc)
+
+def _presence(agent_id, x=0.0, at=datetime(2024, 5, 1, 12, 0, 0, 250000, tzinfo=timezone.utc)):
+    return Presence(agent_id, Vector3(x, 1.0, 2.0), Vector3(0.0, 0.5, 0.0), at)
+
+def test_naive_last_updated_round_trips():
+    naive = _presence("x", at=datetime(2024, 5, 1, 12, 0, 0, 250000))
+    # The dataclass keeps what it was given; naive still compares against naive.
+    assert naive.lastUpdated.tzinfo is None
+    assert naive.lastUpdated - datetime(2024, 5, 1, 12) == timedelta(microseconds=250000)
+    table = PresenceTable()
+    table.upsert(naive)
+    table.upsert(_presence("aware"))
+    assert table["x"] == naive and table["aware"] == _presence("aware")
+    assert table.last_updated[0] == table.last_updated[1] == to_epoch_us(_presence("x").lastUpdated)
+    parsed = Presence.parse({
+        "agentId": "y",
+        "position": {"x": 0, "y": 0, "z": 0},
+        "orientation": {"x": 0, "y": 0, "z": 0},
+        "lastUpdated": "2024-05-01T12:00:00",
+    })
+    table.upsert(parsed)
+    assert table["y"] == parsed
+    table.remove("x")
+    assert table["y"] == parsed and table["aware"] == _presence("aware")
+    table = PresenceTable(1)
+    table.extend([naive, _presence("aware")])
+    assert list(table) == [naive, _presence("aware")]
+
+def _counts(frame):
+    # (keyframe, names, removed, records) from the frame header.
+    _, keyframe, _, _, _, names, removed, records = _FRAME_HEADER.unpack_from(frame)
+    return keyframe, names, removed, records
+
+def _assert_matches(decoded, table, codec):
+    assert sorted(decoded.agent_ids) == sorted(table.agent_ids)
+    for presence in table:
+        got = decoded[presence.agentId]
+        position = np.array([got.position.x, got.position.y, got.position.z])
+        expected = np.array([presence.position.x, presence.position.y, presence.position.z])
+        assert (np.abs(position - expected) <= codec.resolution).all()
+        assert abs(got.lastUpdated - presence.lastUpdated) < timedelta(milliseconds=1)
+
+def test_keyframe_delta_and_removal_frames():
+    bounds = ((-100.0, -100.0, -100.0), (100.0, 100.0, 100.0))
+    codec = PresenceCodec(*bounds)
+    # The receiving side has its own codec and learns agent names from the frames.
+    encoder, decoder = PresenceEncoder(codec), PresenceDecoder(PresenceCodec(*bounds))
+    table = PresenceTable()
+    for index, agent_id in enumerate("abc"):
+        table.upsert(_presence(agent_id, x=index * 10.0))
+
+    keyframe = encoder.encode(table)
+    assert _counts(keyframe) == (1, 3, 0, 3)
+    _assert_matches(decoder.decode(keyframe), table, codec)
+    # Until the keyframe is acked every frame is another keyframe.
+    assert _counts(encoder.encode(table))[0] == 1
+    assert encoder.ack(1) and not encoder.ack(1)
+
+    table.upsert(_presence("b", x=-42.0, at=T1))
+    table.remove("c")
+    delta = encoder.encode(table)
+    assert _counts(delta) == (0, 0, 1, 1)
+    _assert_matches(decoder.decode(delta), table, codec)
+
+    # Unacked, the next frame still diffs against frame 1 and re-sends b's move.
+    table.upsert(_presence("d", x=5.0, at=T1))
+    delta = encoder.encode(table)
+    assert _counts(delta) == (0, 1, 1, 2)
+    _assert_matches(decoder.decode(delta), table, codec)
+
+    with pytest.raises(ValueError, match="unknown baseline"):
+        PresenceDecoder(codec).decode(delta)
+
+def _record(agent_id, x=1.5, at="2024-05-01T12:00:00.250000+00:00"):
+    return {
+        "agentId": agent_id,
+        "position": {"x": x, "y": 1, "z": -2.25},
+        "orientation": {"x": 0, "y": 0.5, "z": 0.0},
+        "lastUpdated": at,
+    }
+
+RECORDS = [_record("a"), _record("b", x=-3, at="2024-05-01T12:00:00"), _record("c", at="2024-05-01T14:00:00+02:00")]
+
+def test_parse_many_matches_per_record_parsing():
+    table = Presence.parse_many(RECORDS)
+    assert list(table) == [Presence.parse(record) for record in RECORDS]
+    assert list(Presence.parse_many(iter(RECORDS))) == list(table)
+    # A later record for the same agent replaces the earlier one, as repeated parses would.
+    table = Presence.parse_many(RECORDS + [_record("a", x=9)])
+    assert len(table) == 3 and table["a"] == Presence.parse(_record("a", x=9))
+    assert len(Presence.parse_many([])) == 0
+
+def test_parse_json_bytes_reads_arrays_and_ndjson():
+    expected = list(Presence.parse_many(RECORDS))
+    array = json.dumps(RECORDS).encode()
+    ndjson = b"\n".join(json.dumps(record).encode() for record in RECORDS) + b"\n\n"
+    assert list(Presence.parse_json_bytes(array)) == expected
+    assert list(Presence.parse_json_bytes(memoryview(ndjson))) == expected
+    assert len(Presence.parse_json_bytes(b"  \n")) == 0
+    table = PresenceTable()
+    assert Presence.parse_json_bytes(array, table) is table and len(table) == 3
+
+@pytest.mark.parametrize("field, value, message", [
+    ("position", {"x": "1", "y": 0, "z": 0}, "coordinates must be numbers, got str"),
+    ("orientation", {"x": 0, "y": None, "z": 0}, "coordinates must be numbers, got NoneType"),
+    ("position", {"x": True, "y": 0, "z": 0}, "coordinates must be numbers, got bool"),
+    ("position", {"x": 0, "y": 0}, "KeyError('z')"),
+    ("agentId", 7, "agentId must be a string"),
+    ("lastUpdated", "yesterday", "Invalid isoformat"),
+])
+def test_invalid_records_are_rejected_like_per_record_parsing(field, value, message):
+    records = [_record("a"), dict(_record("b"), **{field: value})]
+    with pytest.raises(ValueError, match="Invalid presence at index 1") as error:
+        Presence.parse_many(records)
+    assert message in str(error.value)
+    if field != "agentId":
+        with pytest.raises((KeyError, TypeError, ValueError)):
+            Presence.parse(records[1])
+    with pytest.raises(ValueError, match="Invalid presence at index 1"):
+        Presence.parse_json_bytes(json.dumps(records).encode())
+
+def test_non_finite_coordinates_are_rejected():
+    with pytest.raises(ValueError, match="index 1 has non-finite"):
+        Presence.parse_many([_record("a"), _record("b", x=float("nan"))])
@@ -0,0 +1,143 @@
+from math import cos, pi, sin
+import numpy as np
+import pytest
+from python.animation import AnimationSampler, SceneAnimator, _ChannelGroup, slerp
+from python.graph import WorldGraph
+from python.world import (
+    TableAccessor,
+    TableAnimation,
+    TableBuffer,
+    TableBufferView,
+    TableMesh,
+    TableNode,
+    TableScene,
+    TableWorldGLTF,
+)
+
+_TYPES = {1: "SCALAR", 3: "VEC3", 4: "VEC4"}
+
+def _z_rotation(angle):
+    return np.array([0.0, 0.0, sin(angle / 2), cos(angle / 2)])
+
+def _animated(channels, **scene):
+    # channels: (node, path, interpolation, times, values); every accessor gets its own buffer.
+    common = {"vircadia_world_uuid": "world"}
+    data = {}
+    rows = [TableWorldGLTF(vircadia_uuid="world")]
+
+    def accessor(name, array, width):
+        array = np.asarray(array, dtype=np.float32).reshape(-1, width)
+        data[name] = array.tobytes()
+        rows.append(TableBuffer(vircadia_uuid=name, gltf_byteLength=array.nbytes, **common))
+        rows.append(TableBufferView(vircadia_uuid=f"{name}-view", gltf_buffer=name, gltf_byteLength=array.nbytes, **common))
+        rows.append(TableAccessor(
+            vircadia_uuid=f"{name}-accessor",
+            gltf_bufferView=f"{name}-view",
+            gltf_componentType=5126,
+            gltf_count=len(array),
+            gltf_type=_TYPES[width],
+            **common,
+        ))
+        return f"{name}-accessor"
+
+    samplers, targets, nodes = [], [], []
+    for index, (node, path, interpolation, times, values) in enumerate(channels):
+        width = {"translation": 3, "rotation": 4, "scale": 3}.get(path, 1)
+        samplers.append({
+            "input": accessor(f"input-{index}", times, 1),
+            "output": accessor(f"output-{index}", values, width),
+            "interpolation": interpolation,
+        })
+        targets.append({"sampler": index, "target": {"node": node, "path": path}})
+        if node not in nodes:
+            nodes.append(node)
+    rows.append(TableMesh(vircadia_uuid="mesh", gltf_weights=[0.25, 0.75], **common))
+    rows += [TableNode(vircadia_uuid=node, gltf_mesh="mesh", gltf_translation=[9, 9, 9], **common) for node in nodes]
+    rows.append(TableNode(vircadia_uuid="still", gltf_translation=[1, 2, 3], **common))
+    rows.append(TableAnimation(vircadia_uuid="animation", gltf_samplers=samplers, gltf_channels=targets, **common))
+    rows.append(TableScene(vircadia_uuid="scene", gltf_nodes=nodes + ["still"], **scene, **common))
+    return WorldGraph(rows), lambda row: data[row.vircadia_uuid]
+
+def _sampler(*channels):
+    graph, load = _animated(channels)
+    return AnimationSampler(graph, [graph.get("animation")], load)
+
+def test_slerp_takes_the_short_way_round():
+    q0 = np.array([[0.0, 0.0, 0.0, 1.0]] * 3)
+    q1 = np.array([_z_rotation(pi / 2), -_z_rotation(pi / 2), [0.0, 0.0, 1e-9, 1.0]])
+    out = slerp(q0, q1, np.array([0.5, 0.5, 0.5]))
+    np.testing.assert_allclose(out[0], _z_rotation(pi / 4), atol=1e-12)
+    np.testing.assert_allclose(out[1], _z_rotation(pi / 4), atol=1e-12)
+    np.testing.assert_allclose(np.linalg.norm(out, axis=1), 1.0)
+
+def test_linear_and_step_clamp_outside_the_keys():
+    linear = [[0, 0, 0], [10, 0, 0], [10, 20, 0]]
+    sampler = _sampler(
+        ("a", "translation", "LINEAR", [1, 2, 4], linear),
+        ("b", "translation", "STEP", [1, 2, 4], linear),
+        ("a", "rotation", "LINEAR", [0, 1], [_z_rotation(0), _z_rotation(pi / 2)]),
+    )
+    assert (sampler.start, sampler.end, sampler.duration) == (0.0, 4.0, 4.0)
+    a, b = sampler.node_uuids.index("a"), sampler.node_uuids.index("b")
+    for t, expected_a, expected_b in [
+        (0.0, [0, 0, 0], [0, 0, 0]),
+        (1.5, [5, 0, 0], [0, 0, 0]),
+        (3.0, [10, 10, 0], [10, 0, 0]),
+        (4.0, [10, 20, 0], [10, 20, 0]),
+        (9.0, [10, 20, 0], [10, 20, 0]),
+    ]:
+        pose = sampler.sample(t)
+        np.testing.assert_allclose(pose.translations[a], expected_a)
+        np.testing.assert_allclose(pose.translations[b], expected_b)
+    np.testing.assert_allclose(sampler.sample(0.5).rotations[a], _z_rotation(pi / 4), atol=1e-7)
+    # Channels that do not drive a node leave its rest pose alone.
+    np.testing.assert_allclose(sampler.sample(0.5).rotations[b], [0, 0, 0, 1])
+    np.testing.assert_allclose(sampler.sample(0.5).matrices()[a][:3, 3], [0, 0, 0])
+
+def test_cubic_spline_tangents_scale_with_key_spacing():
+    # Keys 2s apart: the Hermite tangents are multiplied by dt, so an out-tangent of 1
+    # lifts the midpoint to (u^3 - 2u^2 + u) * dt = 0.25.
+    keys = [[0, 0, 0], [0, 0, 0], [1, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0]]
+    sampler = _sampler(("a", "translation", "CUBICSPLINE", [0, 2], keys))
+    np.testing.assert_allclose(sampler.sample(1.0).translations[0], [0.25, 0, 0], atol=1e-7)
+    np.testing.assert_allclose(sampler.sample(0.0).translations[0], [0, 0, 0])
+    np.testing.assert_allclose(sampler.sample(2.0).translations[0], [0, 0, 0], atol=1e-7)
+
+def test_morph_weights():
+    sampler = _sampler(("a", "weights", "LINEAR", [0, 1], [0, 1, 1, 0]))
+    pose = sampler.sample(0.25)
+    np.testing.assert_allclose(pose.weights["a"], [0.25, 0.75])
+    np.testing.assert_allclose(sampler.sample(5).weights["a"], [1, 0])
+
+def test_forward_cursor_matches_full_search():
+    rng = np.random.default_rng(3)
+    inputs = [np.sort(rng.uniform(0, 10, count)) for count in (1, 2, 7, 30)]
+    outputs = [np.zeros((len(times), 3)) for times in inputs]
+    group = _ChannelGroup("translation", "LINEAR", [0, 1, 2, 3], inputs, outputs)
+    # Small forward steps take the fast path; big jumps and rewinds force a search.
+    steps = np.concatenate([np.arange(-1, 11, 0.05), [3.0, 9.5, 0.0, 11.0, 2.0, 2.0]])
+    for t in steps:
+        expected = [int((times <= t).sum()) - 1 for times in inputs]
+        assert group.locate(t).tolist() == expected
+
+@pytest.mark.parametrize("settings, elapsed, expected", [
+    ({"vircadia_babylonjs_scene_autoAnimate": False}, 3.0, 0.0),
+    ({"vircadia_babylonjs_scene_autoAnimate": True}, 1.5, 1.5),
+    ({"vircadia_babylonjs_scene_autoAnimate": True}, 9.0, 4.0),
+    ({"vircadia_babylonjs_scene_autoAnimate": True, "vircadia_babylonjs_scene_autoAnimateLoop": True}, 9.0, 1.0),
+    ({"vircadia_babylonjs_scene_autoAnimate": True, "vircadia_babylonjs_scene_autoAnimateSpeed": -1.0}, 1.0, 3.0),
+    ({"vircadia_babylonjs_scene_autoAnimate": True, "vircadia_babylonjs_scene_autoAnimateSpeed": -1.0}, 9.0, 0.0),
+    ({
+        "vircadia_babylonjs_scene_autoAnimate": True,
+        "vircadia_babylonjs_scene_autoAnimateLoop": True,
+        "vircadia_babylonjs_scene_autoAnimateSpeed": -0.5,
+        "vircadia_babylonjs_scene_autoAnimateFrom": 60.0,
+        "vircadia_babylonjs_scene_autoAnimateTo": 180.0,
+    }, 1.0, 2.5),
+])
+def test_scene_time(settings, elapsed, expected):
+    graph, load = _animated([("a", "translation", "LINEAR", [0, 4], [[0, 0, 0], [4, 0, 0]])], **settings)
+    animator = SceneAnimator(graph, "scene", load)
+    assert animator.sampler.node_uuids == ["a"]
+    assert animator.time_at(elapsed) == pytest.approx(expected)
+    np.testing.assert_allclose(animator.sample(elapsed).translations[0], [expected, 0, 0], atol=1e-6)
@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta, timezone
+from python.changefeed import ChangeEvent, MemoryEventSource, WorldReplica
+from python.graph import WorldGraph
+from python.mutation import Operation
+from python.world import Table
+
+T0 = datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc)
+
+def _event(sequence, operation, key, version, **row):
+    row = {"vircadia_uuid": key, "vircadia_world_uuid": "w", **row} if operation is not Operation.DELETE else None
+    return ChangeEvent(sequence, Table.NODES, operation, key, row, version)
+
+def test_out_of_order_events_keep_newest_version():
+    replica = WorldReplica(WorldGraph())
+    source = MemoryEventSource([
+        _event(3, Operation.UPDATE, "a", T0 + timedelta(seconds=2), gltf_name="newest"),
+        _event(1, Operation.CREATE, "a", T0, gltf_name="first"),
+        _event(2, Operation.UPDATE, "a", T0 + timedelta(seconds=1), gltf_name="older"),
+    ])
+    replica.apply(_event(3, Operation.UPDATE, "a", T0 + timedelta(seconds=2), gltf_name="newest"))
+    assert replica.watermark == 0
+    replica.sync(source)
+    assert replica.watermark == 3
+    assert replica.get(Table.NODES, "a").gltf_name == "newest"
+    # A delete leaves a tombstone that a late, older create cannot get past.
+    replica.apply(_event(5, Operation.DELETE, "a", T0 + timedelta(seconds=5)))
+    assert not replica.apply(_event(4, Operation.CREATE, "a", T0 + timedelta(seconds=3)))
+    assert replica.get(Table.NODES, "a") is None and "a" not in replica.graph
+    assert replica.watermark == 5
+
+def test_naive_and_aware_versions_compare_as_utc():
+    replica = WorldReplica()
+    replica.apply(_event(1, Operation.CREATE, "a", T0, gltf_name="aware"))
+    assert not replica.apply(_event(2, Operation.UPDATE, "a", datetime(2024, 5, 1, 11, 59), gltf_name="naive-older"))
+    assert replica.apply(_event(3, Operation.UPDATE, "a", datetime(2024, 5, 1, 12, 1), gltf_name="naive-newer"))
+    assert replica.apply(_event(4, Operation.UPDATE, "a", T0 + timedelta(minutes=2), gltf_name="aware-newer"))
+    assert replica.get(Table.NODES, "a").gltf_name == "aware-newer"
+
+def test_snapshot_restore(tmp_path):
+    path = str(tmp_path / "replica.json")
+    replica = WorldReplica(WorldGraph())
+    replica.apply(_event(1, Operation.CREATE, "a", T0, gltf_name="a", gltf_children=["b"]))
+    replica.apply(_event(2, Operation.CREATE, "b", T0))
+    replica.apply(_event(4, Operation.DELETE, "b", T0 + timedelta(seconds=1)))
+    replica.snapshot(path)
+    restored = WorldReplica.restore(path, WorldGraph())
+    assert restored.watermark == 2
+    assert restored.get(Table.NODES, "a").gltf_children == ["b"]
+    assert restored.graph.references("a") == ["b"] and "b" not in restored.graph
+    # Sequence 4 was already applied ahead of the watermark; 3 still is not.
+    assert not restored.apply(_event(4, Operation.DELETE, "b", T0 + timedelta(seconds=1)))
+    assert not restored.apply(_event(5, Operation.CREATE, "b", T0))
+    assert restored.apply(_event(3, Operation.UPDATE, "a", T0 + timedelta(seconds=2), gltf_name="a2"))
+    assert restored.watermark == 5
+
+def test_tombstones_are_pruned_behind_the_watermark(tmp_path):
+    replica = WorldReplica(WorldGraph())
+    for sequence, key in enumerate("abc", start=1):
+        replica.apply(_event(sequence, Operation.CREATE, key, T0))
+    replica.apply(_event(4, Operation.DELETE, "a", T0 + timedelta(seconds=1)))
+    replica.apply(_event(6, Operation.DELETE, "b", T0 + timedelta(seconds=1)))
+    replica.apply(_event(7, Operation.DELETE, "c", T0 + timedelta(seconds=1)))
+    replica.apply(_event(8, Operation.CREATE, "c", T0 + timedelta(seconds=2)))
+    # "a" is behind the watermark; "b" still guards against the missing sequence 5.
+    assert replica.watermark == 4 and set(replica._tombstones) == {(Table.NODES, "b")}
+    path = str(tmp_path / "replica.json")
+    replica.snapshot(path)
+    restored = WorldReplica.restore(path, WorldGraph())
+    assert not restored.apply(_event(5, Operation.UPDATE, "b", T0, gltf_name="late"))
+    assert restored.get(Table.NODES, "b") is None
+    assert restored.watermark == 8 and not restored._tombstones and not restored._tombstone_heap
+    # With the tombstone gone, a later create is applied whatever its version.
+    assert restored.apply(_event(9, Operation.CREATE, "a", T0))
+    assert restored.get(Table.NODES, "a") is not None
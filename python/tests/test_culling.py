@@ -0,0 +1,29 @@
+from datetime import datetime, timezone
+from math import pi
+from conftest import world_rows
+from python.agent import Presence
+from python.culling import CullingService
+from python.graph import WorldGraph
+from python.primitive import Vector3
+from python.world import TableNode
+
+NOW = datetime(2024, 5, 1, tzinfo=timezone.utc)
+
+def _graph():
+    rows = world_rows()
+    common = {"vircadia_world_uuid": rows[0].vircadia_uuid, "gltf_mesh": "w-mesh"}
+    rows += [
+        TableNode(vircadia_uuid="east", gltf_translation=[50, 0, 0], **common),
+        TableNode(vircadia_uuid="west", gltf_translation=[-50, 0, 0], **common),
+    ]
+    return WorldGraph(rows), rows[0].vircadia_uuid
+
+def test_viewer_is_mirrored_into_gltf_space():
+    graph, world = _graph()
+    # Yaw pi/2 looks down Babylon +X, which the loader's root node maps to glTF -X.
+    viewer = Presence("viewer", Vector3(0.0, 0.0, 0.0), Vector3(0.0, pi / 2, 0.0), NOW)
+    assert set(CullingService(graph, world).visible(viewer)) == {"west"}
+    assert set(CullingService(graph, world, axes=None).visible(viewer)) == {"east"}
+    # Straight ahead (+Z) is the same axis in both spaces.
+    ahead = Presence("viewer", Vector3(0.0, 0.0, 0.0), Vector3(0.0, 0.0, 0.0), NOW)
+    assert set(CullingService(graph, world).visible(ahead)) == {"w-child"}
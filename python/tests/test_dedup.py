@@ -0,0 +1,48 @@
+from conftest import IMAGE, POSITIONS
+from python.dedup import Deduplicator, dedup_import
+from python.gltf import GLBExporter, GLTFImporter, import_gltf, load_buffer
+from python.graph import WorldGraph
+from python.world import Table, TableBuffer
+
+def test_dedup_is_scoped_to_a_world_and_exports(glb_path, tmp_path):
+    index = str(tmp_path / "index.sqlite")
+    first = [row for _, row in dedup_import(str(glb_path), index)]
+    second = [row for _, row in dedup_import(str(glb_path), index)]
+    graph = WorldGraph(first + second)
+    assert len(graph) == len(first) + len(second)
+    assert not graph.dangling()
+    world = second[0].vircadia_uuid
+    owned = {row.vircadia_uuid for row in graph.in_world(world)}
+    assert all(target in owned for row in second for target in graph.references(row.vircadia_uuid))
+    GLBExporter(graph).export(world, tmp_path / "second.glb")
+
+def test_reimport_into_world_reuses_rows(glb_path, tmp_path):
+    index = str(tmp_path / "index.sqlite")
+    first = [row for _, row in dedup_import(str(glb_path), index)]
+    world = first[0].vircadia_uuid
+    again = list(dedup_import(str(glb_path), index, world_uuid=world))
+    tables = {table for table, _ in again}
+    assert not tables & {Table.WORLD_GLTF, Table.BUFFERS, Table.BUFFER_VIEWS, Table.IMAGES, Table.SAMPLERS, Table.TEXTURES, Table.MATERIALS}
+    graph = WorldGraph(first + [row for _, row in again])
+    assert not graph.dangling()
+    (material,) = graph.in_world(world, Table.MATERIALS)
+    meshes = graph.in_world(world, Table.MESHES)
+    assert len(meshes) == 2 and all(mesh.gltf_primitives[0]["material"] == material.vircadia_uuid for mesh in meshes)
+    GLBExporter(graph).export(world, tmp_path / "merged.glb")
+
+def test_content_is_shared_across_worlds(glb_path, tmp_path):
+    index = str(tmp_path / "index.sqlite")
+    copy = tmp_path / "copy.glb"
+    copy.write_bytes(glb_path.read_bytes())
+    first = [row for _, row in dedup_import(str(glb_path), index)]
+    with GLTFImporter(str(copy)) as importer:
+        with Deduplicator(index, lambda row: importer.buffer_data(row.vircadia_uuid)) as deduplicator:
+            second = [row for _, row in deduplicator.dedup(importer.rows())]
+    assert deduplicator.stats["bytes_shared"] == len(POSITIONS.tobytes() + IMAGE)
+    graph = WorldGraph(first + second)
+    (a,), (b,) = (graph.in_world(rows[0].vircadia_uuid, Table.BUFFERS) for rows in (first, second))
+    # Each world owns its buffer row, but both point at the first import's bytes.
+    assert a.vircadia_uuid != b.vircadia_uuid and b.gltf_uri == a.gltf_uri and str(glb_path) in a.gltf_uri
+    GLBExporter(graph).export(second[0].vircadia_uuid, tmp_path / "second.glb")
+    (exported,) = [row for _, row in import_gltf(str(tmp_path / "second.glb")) if isinstance(row, TableBuffer)]
+    assert bytes(memoryview(load_buffer(exported)).cast("B")) == POSITIONS.tobytes() + IMAGE
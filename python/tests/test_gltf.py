@@ -0,0 +1,109 @@
+import io
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote, urlparse
+import numpy as np
+from conftest import IMAGE, POSITIONS, world_rows
+from python import gltf
+from python.gltf import AccessorReader, GLBExporter, import_gltf, iter_glb_chunks, load_buffer
+from python.graph import WorldGraph
+from python.world import Table, TableAccessor, TableBuffer, TableBufferView, TableImage
+
+def test_import_export_with_default_loader(glb_path, tmp_path):
+    rows = [row for _, row in import_gltf(str(glb_path))]
+    graph = WorldGraph(rows)
+    world = rows[0].vircadia_uuid
+    (buffer,) = graph.in_world(world, Table.BUFFERS)
+    assert bytes(memoryview(load_buffer(buffer)).cast("B")) == POSITIONS.tobytes() + IMAGE
+    (accessor,) = graph.in_world(world, Table.ACCESSORS)
+    np.testing.assert_array_equal(AccessorReader(graph).read(accessor), POSITIONS)
+
+    out = tmp_path / "again.glb"
+    GLBExporter(graph).export(world, out)
+    again = WorldGraph(row for _, row in import_gltf(str(out)))
+    (world_again,) = again.world_uuids()
+    (accessor,) = again.in_world(world_again, Table.ACCESSORS)
+    np.testing.assert_array_equal(AccessorReader(again).read(accessor), POSITIONS)
+    assert len(again.in_world(world_again, Table.NODES)) == 2
+    assert not again.dangling()
+    with open(out, "rb") as file:
+        assert [chunk.type for chunk in iter_glb_chunks(file)] == [0x4E4F534A, 0x004E4942]
+
+def test_evicting_a_buffer_drops_sparse_arrays_built_from_it():
+    base = np.zeros((4, 3), dtype=np.float32)
+    data = {
+        "base": base.tobytes(),
+        "sparse": np.array([2], dtype=np.uint16).tobytes() + b"\0\0" + np.array([1, 2, 3], dtype=np.float32).tobytes(),
+    }
+    rows = {
+        "base": TableBuffer(vircadia_uuid="base", gltf_byteLength=base.nbytes),
+        "sparse": TableBuffer(vircadia_uuid="sparse", gltf_byteLength=16),
+        "base-view": TableBufferView(vircadia_uuid="base-view", gltf_buffer="base", gltf_byteLength=base.nbytes),
+        "index-view": TableBufferView(vircadia_uuid="index-view", gltf_buffer="sparse", gltf_byteLength=2),
+        "value-view": TableBufferView(vircadia_uuid="value-view", gltf_buffer="sparse", gltf_byteOffset=4, gltf_byteLength=12),
+        "accessor": TableAccessor(
+            vircadia_uuid="accessor",
+            gltf_bufferView="base-view",
+            gltf_componentType=5126,
+            gltf_count=4,
+            gltf_type="VEC3",
+            gltf_sparse={
+                "count": 1,
+                "indices": {"bufferView": "index-view", "componentType": 5123},
+                "values": {"bufferView": "value-view"},
+            },
+        ),
+    }
+    reader = AccessorReader(rows, lambda row: data[row.vircadia_uuid])
+    np.testing.assert_array_equal(reader.read("accessor")[2], [1, 2, 3])
+    data["sparse"] = data["sparse"][:4] + np.array([7, 8, 9], dtype=np.float32).tobytes()
+    reader.evict("sparse")
+    np.testing.assert_array_equal(reader.read("accessor")[2], [7, 8, 9])
+    np.testing.assert_array_equal(reader.read("accessor")[0], [0, 0, 0])
+
+def test_one_exporter_runs_concurrent_exports(tmp_path):
+    graph = WorldGraph(world_rows("a") + world_rows("b"))
+    expected = {world: GLBExporter(graph).assemble(world)[0] for world in ("a-world", "b-world")}
+    # Both exports hold in the loader until the other has started, so their state overlaps.
+    barrier = threading.Barrier(2, timeout=10)
+
+    def load(row):
+        barrier.wait()
+        return load_buffer(row)
+
+    exporter = GLBExporter(graph, load)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        documents = dict(zip(expected, pool.map(lambda world: exporter.assemble(world)[0], expected)))
+    assert documents == expected
+
+def test_partial_gather_writes_resume(monkeypatch, tmp_path):
+    graph = WorldGraph(world_rows())
+    buffered = io.BytesIO()
+    GLBExporter(graph).export("w-world", buffered)
+    writev = os.writev
+    monkeypatch.setattr(gltf.os, "writev", lambda fd, views: writev(fd, [bytes(memoryview(b"".join(views))[:7])]))
+    out = tmp_path / "partial.glb"
+    GLBExporter(graph).export("w-world", out)
+    assert out.read_bytes() == buffered.getvalue()
+
+def test_relative_uris_are_resolved_against_the_gltf_file(tmp_path):
+    (tmp_path / "tex dir").mkdir()
+    (tmp_path / "tex dir" / "image.png").write_bytes(IMAGE)
+    (tmp_path / "data.bin").write_bytes(POSITIONS.tobytes())
+    document = {
+        "asset": {"version": "2.0"},
+        "buffers": [{"uri": "data.bin", "byteLength": POSITIONS.nbytes}],
+        "images": [{"uri": "tex%20dir/image.png"}, {"uri": "https://example.com/remote.png"}],
+    }
+    path = tmp_path / "scene.gltf"
+    path.write_text(json.dumps(document))
+    rows = [row for _, row in import_gltf(str(path))]
+    (buffer,) = [row for row in rows if isinstance(row, TableBuffer)]
+    local, remote = [row for row in rows if isinstance(row, TableImage)]
+    assert bytes(memoryview(load_buffer(buffer)).cast("B")) == POSITIONS.tobytes()
+    assert local.gltf_uri == (tmp_path / "tex dir" / "image.png").as_uri()
+    assert remote.gltf_uri == "https://example.com/remote.png"
+    # The stored uri resolves without knowing where the .gltf file was.
+    assert open(unquote(urlparse(local.gltf_uri).path), "rb").read() == IMAGE
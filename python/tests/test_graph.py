@@ -0,0 +1,62 @@
+from dataclasses import replace
+from python.graph import WorldGraph
+from python.world import (
+    Table,
+    TableAccessor,
+    TableBuffer,
+    TableBufferView,
+    TableMaterial,
+    TableMesh,
+    TableNode,
+    TableScene,
+    TableWorldGLTF,
+)
+
+def _rows(prefix):
+    common = {"vircadia_world_uuid": f"{prefix}-world"}
+    return [
+        TableWorldGLTF(vircadia_uuid=f"{prefix}-world"),
+        TableBuffer(vircadia_uuid=f"{prefix}-buffer", **common),
+        TableBufferView(vircadia_uuid=f"{prefix}-view", gltf_buffer=f"{prefix}-buffer", **common),
+        TableAccessor(vircadia_uuid=f"{prefix}-accessor", gltf_bufferView=f"{prefix}-view", **common),
+        TableMaterial(vircadia_uuid=f"{prefix}-material", **common),
+        TableMesh(
+            vircadia_uuid=f"{prefix}-mesh",
+            gltf_primitives=[{"attributes": {"POSITION": f"{prefix}-accessor"}, "material": f"{prefix}-material"}],
+            **common,
+        ),
+        TableNode(vircadia_uuid=f"{prefix}-child", gltf_mesh=f"{prefix}-mesh", **common),
+        TableNode(vircadia_uuid=f"{prefix}-root", gltf_children=[f"{prefix}-child"], **common),
+        TableScene(vircadia_uuid=f"{prefix}-scene", gltf_nodes=[f"{prefix}-root"], **common),
+    ]
+
+def test_upsert_diffs_edges():
+    graph = WorldGraph(_rows("w"))
+    child = graph.get("w-child")
+    graph.upsert(TableMesh(vircadia_uuid="other", vircadia_world_uuid="w-world"))
+    graph.upsert(replace(child, gltf_mesh="other", gltf_skin="missing"))
+    assert graph.references("w-child") == ["other", "missing"]
+    assert graph.referrers("w-mesh") == []
+    assert graph.referrers("other", "gltf_mesh") == ["w-child"]
+    assert graph.dangling() == [("w-child", "gltf_skin", "missing")]
+    assert graph.unreachable("w-world") == {"w-mesh", "w-accessor", "w-material", "w-view", "w-buffer"}
+    assert graph.dependents("other", Table.SCENES) == {"w-scene"}
+
+    # The same target under two labels survives losing one of them.
+    graph.upsert(replace(graph.get("w-root"), gltf_children=["w-child"], gltf_mesh="w-child"))
+    graph.upsert(replace(graph.get("w-root"), gltf_mesh=None))
+    assert graph.referrers("w-child") == ["w-root"]
+    assert graph.referrers("w-child", "gltf_mesh") == []
+
+    graph.remove("w-child")
+    assert graph.referrers("other") == []
+    assert ("w-root", "gltf_children", "w-child") in graph.dangling()
+    assert "w-child" not in {row.vircadia_uuid for row in graph.in_world("w-world", Table.NODES)}
+
+def test_moving_a_row_between_worlds():
+    graph = WorldGraph(_rows("a") + _rows("b"))
+    graph.upsert(TableNode(vircadia_uuid="a-child", vircadia_world_uuid="b-world", gltf_mesh="a-mesh"))
+    assert {row.vircadia_uuid for row in graph.in_world("a-world", Table.NODES)} == {"a-root"}
+    assert {row.vircadia_uuid for row in graph.in_world("b-world", Table.NODES)} == {"b-root", "b-child", "a-child"}
+    graph.upsert(TableNode(vircadia_uuid="a-root"))
+    assert "a-world" in graph.world_uuids() and not graph.in_world("a-world", Table.NODES)
@@ -0,0 +1,69 @@
+from datetime import datetime, timezone
+import numpy as np
+import pytest
+from python.agent import Presence, PresenceTable
+from python.interest import InterestManager, InterestTier
+from python.primitive import Vector3
+
+TIERS = (InterestTier(10.0, 1), InterestTier(40.0, 2), InterestTier(160.0, 4))
+NOW = datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc)
+
+def _manager(seed=11, count=300, max_interests=12):
+    rng = np.random.default_rng(seed)
+    manager = InterestManager(TIERS, max_interests=max_interests, refresh_every=3)
+    keys = [f"agent-{index}" for index in range(count)]
+    table = PresenceTable()
+    table.upsert_many(keys, rng.uniform(-200, 200, (count, 3)), np.zeros((count, 3)), np.zeros(count))
+    manager.update_many(table)
+    # Move some agents one at a time and drop others, so grid slots get reused.
+    for key in keys[::9]:
+        manager.update(Presence(key, Vector3(*rng.uniform(-200, 200, 3)), Vector3(0.0, 0.0, 0.0), NOW))
+    for key in keys[::13]:
+        manager.remove(key)
+    # The first tick builds every joiner's interests in one batch.
+    manager.tick()
+    positions = dict(zip(manager.presences.agent_ids, manager.presences.positions.copy()))
+    return manager, positions
+
+def _brute(positions, recipient, max_interests):
+    keys = [key for key in positions if key != recipient]
+    offsets = np.array([positions[key] for key in keys]) - positions[recipient]
+    distances = sorted(zip(np.linalg.norm(offsets, axis=1).tolist(), keys))
+    return {
+        key: next(tier for tier in TIERS if distance <= tier.radius)
+        for distance, key in distances[:max_interests]
+        if distance <= TIERS[-1].radius
+    }
+
+@pytest.mark.parametrize("max_interests", [1, 12, 500])
+def test_interests_match_brute_force(max_interests):
+    manager, positions = _manager(max_interests=max_interests)
+    for recipient in positions:
+        assert manager.interests(recipient) == _brute(positions, recipient, max_interests)
+
+def test_each_source_is_sent_once_per_tier_interval():
+    manager, positions = _manager()
+    expected = {recipient: _brute(positions, recipient, 12) for recipient in positions}
+    sent = {recipient: {} for recipient in positions}
+    # Positions do not move, so the rolling rebuilds keep the same interest sets.
+    for _ in range(8):
+        for recipient, batch in manager.tick().items():
+            for presence in batch:
+                sent[recipient][presence.agentId] = sent[recipient].get(presence.agentId, 0) + 1
+    for recipient, interests in expected.items():
+        assert sent[recipient] == {source: 8 // tier.interval for source, tier in interests.items()}
+
+def test_departed_agents_stop_being_sent():
+    manager, positions = _manager()
+    recipient = next(key for key in positions if manager.interests(key))
+    source = next(iter(manager.interests(recipient)))
+    assert manager.remove(source) and not manager.remove(source)
+    assert source not in manager and source not in manager.interests(recipient)
+    for _ in range(8):
+        assert all(presence.agentId != source for batch in manager.tick().values() for presence in batch)
+
+def test_tiers_are_validated():
+    with pytest.raises(ValueError):
+        InterestManager(())
+    with pytest.raises(ValueError):
+        InterestManager((InterestTier(10.0, 0),))
@@ -0,0 +1,63 @@
+from datetime import datetime, timezone
+import numpy as np
+from python.agent import Presence
+from python.interpolation import PresenceHistory
+from python.primitive import Vector3
+
+def _push(history, samples):
+    # samples: (agent, x, time in microseconds)
+    count = len(samples)
+    return history.push_many(
+        [agent for agent, _, _ in samples],
+        [(x, 0.0, 0.0) for _, x, _ in samples],
+        np.zeros((count, 3)),
+        [at for _, _, at in samples],
+    )
+
+def test_duplicate_agents_in_one_batch_keep_every_newer_sample():
+    history = PresenceHistory(depth=4)
+    fresh = _push(history, [("a", 3.0, 300), ("b", 1.0, 100), ("a", 1.0, 100), ("a", 2.0, 200), ("a", 9.0, 200)])
+    assert fresh.tolist() == [True, True, True, True, False]
+    assert history.latest.tolist() == [300, 100]
+    assert history._count[:2].tolist() == [3, 1]
+    positions, _ = history.sample(150)
+    np.testing.assert_allclose(positions[:, 0], [1.5, 1.0])
+    # Older than what is held: dropped, even when it arrives in a batch with newer ones.
+    assert _push(history, [("a", 0.0, 50), ("a", 4.0, 400)]).tolist() == [False, True]
+    assert history.latest.tolist() == [400, 100]
+
+def test_sampling_interpolates_extrapolates_and_snaps():
+    history = PresenceHistory(depth=3, snap_distance=10.0, max_extrapolation_us=100)
+    _push(history, [("walk", 0.0, 0), ("walk", 1.0, 100), ("walk", 2.0, 200), ("walk", 3.0, 300)])
+    _push(history, [("jump", 0.0, 0), ("jump", 50.0, 100)])
+    walk, jump = history.agent_ids.index("walk"), history.agent_ids.index("jump")
+    for at, expected_walk, expected_jump in [
+        (0, 1.0, 0.0),        # the ring only keeps the newest 3 of walk's samples
+        (150, 1.5, 50.0),
+        (350, 3.5, 50.0),     # extrapolated along the last two samples
+        (1000, 4.0, 50.0),    # extrapolation stops after max_extrapolation_us
+    ]:
+        positions, _ = history.sample(at)
+        assert positions[walk, 0] == expected_walk
+        assert positions[jump, 0] == expected_jump
+    # A jump wider than snap_distance holds the older sample until the newer one.
+    positions, _ = history.sample(50)
+    assert positions[jump, 0] == 0.0
+
+def test_orientation_wraps_the_short_way():
+    history = PresenceHistory()
+    history.push_many(["a", "a"], np.zeros((2, 3)), [(0.0, 3.0, 0.0), (0.0, -3.0, 0.0)], [0, 100])
+    _, orientations = history.sample(50)
+    assert abs(abs(orientations[0, 1]) - np.pi) < 1e-9
+
+def test_push_remove_and_evict():
+    history = PresenceHistory(capacity=1)
+    at = datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc)
+    assert history.push(Presence("a", Vector3(1.0, 2.0, 3.0), Vector3(0.0, 0.0, 0.0), at))
+    assert not history.push(Presence("a", Vector3(9.0, 9.0, 9.0), Vector3(0.0, 0.0, 0.0), at))
+    _push(history, [("b", 0.0, history.latest[0] + 1_000_000), ("c", 0.0, history.latest[0] + 2_000_000)])
+    assert history.evict_stale(int(history.latest[0]) + 1_500_000, 1_000_000) == ["a"]
+    assert sorted(history.agent_ids) == ["b", "c"]
+    assert history.remove("b") and not history.remove("b")
+    table = history.to_table(int(history.latest[0]))
+    assert list(table.agent_ids) == ["c"] and len(history) == 1
@@ -0,0 +1,77 @@
+import random
+from datetime import datetime, timedelta, timezone
+from python.metadata import Eq, In, MetadataIndex, Prefix, Range
+from python.world import TableMetadata
+
+def _row(metadata_id, entity_id, key, **values):
+    return TableMetadata(metadata_id=metadata_id, entity_id=entity_id, key=key, **values)
+
+def test_queries():
+    index = MetadataIndex([
+        _row("m1", "a", "colour", values_text=["red", "rose"]),
+        _row("m2", "b", "colour", values_text=["blue"]),
+        _row("m3", "a", "mass", values_numeric=[3.0]),
+        _row("m4", "b", "mass", values_numeric=[10.0]),
+        _row("m5", "b", "solid", values_boolean=[True]),
+        _row("m6", "a", "seen", values_timestamp=[datetime(2024, 1, 1, tzinfo=timezone.utc)]),
+    ])
+    assert index.query(Eq("colour", "red")) == {"a"}
+    assert index.query(In("colour", ["red", "blue"])) == {"a", "b"}
+    assert index.query(Prefix("colour", "r")) == {"a"}
+    assert index.query(Range("mass", 3.0, 10.0, include_lo=False)) == {"b"}
+    assert index.query(Eq("solid", True) & Range("mass", hi=20)) == {"b"}
+    assert index.query(Eq("colour", "blue") | Range("seen", datetime(2023, 1, 1, tzinfo=timezone.utc))) == {"a", "b"}
+
+def test_mutate_then_upsert():
+    text = _row("m1", "a", "colour", values_text=["red"])
+    number = _row("m2", "a", "mass", values_numeric=[3.0])
+    index = MetadataIndex([text, number, _row("m3", "b", "mass", values_numeric=[5.0])])
+    text.values_text = ["blue"]
+    index.upsert(text)
+    number.values_numeric = [7.0]
+    index.upsert(number)
+    assert index.eq("colour", "red") == set()
+    assert index.eq("colour", "blue") == {"a"}
+    assert index.prefix("colour", "r") == set()
+    assert index.range("mass", 0, 4) == set()
+    assert index.range("mass", 6, 8) == {"a"}
+    assert index.range("mass", 5, 5) == {"b"}
+    text.entity_id = "c"
+    index.remove("m1")
+    assert index.eq("colour", "blue") == set()
+    assert len(index) == 2
+
+def test_naive_and_aware_timestamps_share_one_order():
+    index = MetadataIndex([
+        _row("m1", "a", "seen", values_timestamp=[datetime(2024, 1, 1, 12)]),
+        _row("m2", "b", "seen", values_timestamp=[datetime(2024, 1, 1, 13, tzinfo=timezone.utc)]),
+        _row("m3", "c", "seen", values_timestamp=[datetime(2024, 1, 1, 15, tzinfo=timezone(timedelta(hours=2)))]),
+    ])
+    # Naive values are read as UTC, so c (13:00 UTC) ties with b.
+    assert index.range("seen", datetime(2024, 1, 1, 12, 30)) == {"b", "c"}
+    assert index.range("seen", hi=datetime(2024, 1, 1, 13, tzinfo=timezone.utc), include_hi=False) == {"a"}
+
+def test_bulk_build_matches_incremental_upserts():
+    rng = random.Random(5)
+    rows = [
+        _row(f"m{n}", f"e{rng.randrange(50)}", rng.choice(["hp", "name"]),
+             values_numeric=[rng.randrange(20) for _ in range(rng.randrange(3))],
+             values_text=[rng.choice(["ab", "abc", "b", "ba"]) for _ in range(rng.randrange(3))])
+        for n in range(400)
+    ]
+    bulk = MetadataIndex(rows)
+    incremental = MetadataIndex()
+    for row in rows:
+        incremental.upsert(row)
+        # Query between writes so every step flushes the buffered changes.
+        incremental.range("hp", 5, 10)
+    for row in rows[::3]:
+        bulk.remove(row.metadata_id)
+        incremental.remove(row.metadata_id)
+    kept = rows[1::3] + rows[2::3]
+    for lo, hi in [(0, 19), (5, 10), (7, 7)]:
+        expected = {row.entity_id for row in kept if row.key == "hp" and any(lo <= v <= hi for v in row.values_numeric)}
+        assert bulk.range("hp", lo, hi) == incremental.range("hp", lo, hi) == expected
+    for prefix in ["a", "ab", "b", "c"]:
+        expected = {row.entity_id for row in kept if row.key == "name" and any(v.startswith(prefix) for v in row.values_text)}
+        assert bulk.prefix("name", prefix) == incremental.prefix("name", prefix) == expected
@@ -0,0 +1,102 @@
+import asyncio
+import threading
+import pytest
+from python import metrics
+from python.agent import Presence
+from python.metrics import MetricsRegistry
+from python.mutation import MutationBatcher
+from python.world import CODECS, Table, TableCodec, TableNode
+
+PRESENCE = {
+    "agentId": "a",
+    "position": {"x": 0, "y": 0, "z": 0},
+    "orientation": {"x": 0, "y": 0, "z": 0},
+    "lastUpdated": "2024-05-01T12:00:00+00:00",
+}
+
+@pytest.fixture
+def registry():
+    registry = MetricsRegistry()
+    yield metrics.enable(registry)
+    metrics.disable()
+
+def _series(snapshot, name, **labels):
+    return [item for item in snapshot["histograms"] + snapshot["counters"] if item["name"] == name and item["labels"] == labels]
+
+def test_enable_disable_round_trip():
+    originals = (Presence.__dict__["parse"], TableCodec.to_json_bytes, MutationBatcher._dispatch, CODECS[TableNode].to_dict)
+    registry = MetricsRegistry()
+    assert metrics.enable(registry) is registry and metrics.enabled()
+    assert metrics.enable() is registry
+    with pytest.raises(RuntimeError):
+        metrics.enable(MetricsRegistry())
+    assert TableCodec.to_json_bytes is not originals[1]
+    metrics.disable()
+    assert not metrics.enabled()
+    assert (Presence.__dict__["parse"], TableCodec.to_json_bytes, MutationBatcher._dispatch, CODECS[TableNode].to_dict) == originals
+    assert metrics.enable() is metrics.REGISTRY
+    metrics.disable()
+
+def test_recorded_values(registry):
+    Presence.parse(PRESENCE)
+    Presence.parse_many([PRESENCE, dict(PRESENCE, agentId="b")])
+    payload = CODECS[TableNode].to_json_bytes([TableNode(vircadia_uuid="n")])
+
+    async def send(mutation, rows):
+        pass
+
+    async def run():
+        async with MutationBatcher(send, max_delay=60) as batcher:
+            await batcher.create(Table.NODES, {"vircadia_uuid": "n"})
+            await batcher.update(Table.MESHES, {"vircadia_uuid": "m", "gltf_name": "mesh"})
+    asyncio.run(run())
+
+    snapshot = registry.snapshot()
+    (records,) = _series(snapshot, "vircadia_presence_records_total", method="parse_many")
+    assert records["value"] == 2
+    assert registry.top_agents(1) == [("a", 2)]
+    (encoded,) = _series(snapshot, "vircadia_codec_payload_bytes", table="world_gltf_nodes", direction="encode")
+    assert encoded["count"] == 1 and encoded["sum"] == len(payload)
+    (created,) = _series(snapshot, "vircadia_mutation_payload_bytes", table="world_gltf_nodes", operation="create")
+    assert created["sum"] == len(b'[{"vircadia_uuid":"n"}]')
+    (updated,) = _series(snapshot, "vircadia_mutation_payload_bytes", table="world_gltf_meshes", operation="update")
+    assert updated["count"] == 1
+
+def test_prometheus_export():
+    registry = MetricsRegistry()
+    registry.counter("jobs_total", "Jobs run.")
+    registry.histogram("payload_bytes", "Payload size.", 1.0, (10.0, 100.0))
+    registry.inc("jobs_total", (("kind", 'say "hi"'),), 3)
+    for value in (5, 50, 500):
+        registry.observe("payload_bytes", (("table", "t"),), value)
+    assert registry.to_prometheus().splitlines() == [
+        "# HELP jobs_total Jobs run.",
+        "# TYPE jobs_total counter",
+        'jobs_total{kind="say \\"hi\\""} 3',
+        "# HELP payload_bytes Payload size.",
+        "# TYPE payload_bytes histogram",
+        'payload_bytes_bucket{table="t",le="10"} 1',
+        'payload_bytes_bucket{table="t",le="100"} 2',
+        'payload_bytes_bucket{table="t",le="+Inf"} 3',
+        'payload_bytes_sum{table="t"} 555',
+        'payload_bytes_count{table="t"} 3',
+    ]
+
+def test_exited_threads_are_folded_and_agents_bounded():
+    registry = MetricsRegistry(agent_capacity=4)
+
+    def work(index):
+        registry.inc("hits", (), 1)
+        registry.observe("size", (), index)
+        registry.hit_agents(["busy"] * 10 + [f"agent-{index}-{n}" for n in range(20)])
+
+    threads = [threading.Thread(target=work, args=(index,)) for index in range(8)]
+    for thread in threads:
+        thread.start()
+        thread.join()
+    snapshot = registry.snapshot()
+    assert not registry._shards
+    assert snapshot["counters"] == [{"name": "hits", "labels": {}, "value": 8}]
+    assert snapshot["histograms"][0]["count"] == 8 and snapshot["histograms"][0]["max"] == 7
+    assert registry.top_agents(1) == [("busy", 80)]
+    assert len(registry._retired[2]) <= 8
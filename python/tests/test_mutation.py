@@ -0,0 +1,121 @@
+import asyncio
+import pytest
+from python.mutation import MutationBatcher
+from python.world import Table, TableMutation, TableNode
+
+class Recorder:
+    def __init__(self, fail_on=None):
+        self.sent = []
+        self.fail_on = fail_on
+
+    async def __call__(self, mutation, rows):
+        if mutation is self.fail_on:
+            self.fail_on = None
+            raise ConnectionError("down")
+        self.sent.append((mutation, [dict(row) for row in rows]))
+
+def test_coalescing():
+    async def run():
+        send = Recorder()
+        batcher = MutationBatcher(send, max_delay=60)
+        await batcher.create(Table.NODES, {"vircadia_uuid": "a", "gltf_name": "a"})
+        await batcher.update(Table.NODES, {"vircadia_uuid": "a", "gltf_mesh": "m"})
+        await batcher.create(Table.MESHES, {"vircadia_uuid": "m"})
+        await batcher.create(Table.NODES, {"vircadia_uuid": "gone"})
+        await batcher.delete(Table.NODES, "gone")
+        await batcher.delete(Table.MESHES, "old")
+        await batcher.create(Table.MESHES, {"vircadia_uuid": "old", "gltf_name": "new"})
+        assert len(batcher) == 3
+        await batcher.close()
+        return send.sent
+    sent = asyncio.run(run())
+    assert sent == [
+        (TableMutation.DELETE_MESH, [{"vircadia_uuid": "old"}]),
+        (TableMutation.CREATE_MESH, [{"vircadia_uuid": "m"}, {"vircadia_uuid": "old", "gltf_name": "new"}]),
+        (TableMutation.CREATE_NODE, [{"vircadia_uuid": "a", "gltf_name": "a", "gltf_mesh": "m"}]),
+    ]
+
+def test_send_failure_keeps_unsent_rows():
+    async def run():
+        send = Recorder(fail_on=TableMutation.CREATE_NODE)
+        batcher = MutationBatcher(send, max_delay=60)
+        await batcher.create(Table.MESHES, {"vircadia_uuid": "m"})
+        await batcher.create(Table.NODES, {"vircadia_uuid": "a", "gltf_name": "a"})
+        await batcher.update(Table.NODES, {"vircadia_uuid": "b", "gltf_name": "b"})
+        with pytest.raises(ConnectionError):
+            await batcher.flush()
+        # The mesh went out; both nodes are still pending.
+        assert send.sent == [(TableMutation.CREATE_MESH, [{"vircadia_uuid": "m"}])]
+        assert len(batcher) == 2
+        await batcher.update(Table.NODES, {"vircadia_uuid": "a", "gltf_name": "newer"})
+        await batcher.close()
+        return send.sent[1:]
+    assert asyncio.run(run()) == [
+        (TableMutation.CREATE_NODE, [{"vircadia_uuid": "a", "gltf_name": "newer"}]),
+        (TableMutation.UPDATE_NODE, [{"vircadia_uuid": "b", "gltf_name": "b"}]),
+    ]
+
+def test_newer_submissions_win_over_restored_rows():
+    async def run():
+        send = Recorder()
+        batcher = MutationBatcher(send, max_delay=60)
+        gate = asyncio.Event()
+
+        async def failing(mutation, rows):
+            await gate.wait()
+            raise ConnectionError("down")
+        batcher.send = failing
+        await batcher.update(Table.NODES, {"vircadia_uuid": "a", "gltf_name": "old", "gltf_mesh": "m"})
+        await batcher.create(Table.NODES, {"vircadia_uuid": "b"})
+        flushing = asyncio.ensure_future(batcher.flush())
+        await asyncio.sleep(0)
+        await batcher.update(Table.NODES, {"vircadia_uuid": "a", "gltf_name": "new"})
+        await batcher.delete(Table.NODES, "b")
+        gate.set()
+        with pytest.raises(ConnectionError):
+            await flushing
+        batcher.send = send
+        await batcher.close()
+        return send.sent
+    assert asyncio.run(run()) == [
+        (TableMutation.UPDATE_NODE, [{"vircadia_uuid": "a", "gltf_name": "new", "gltf_mesh": "m"}]),
+    ]
+
+def test_update_of_a_restored_delete_is_refused():
+    async def run():
+        send = Recorder()
+        batcher = MutationBatcher(send, max_delay=60)
+        gate = asyncio.Event()
+
+        async def failing(mutation, rows):
+            await gate.wait()
+            raise ConnectionError("down")
+        batcher.send = failing
+        await batcher.delete(Table.NODES, "a")
+        flushing = asyncio.ensure_future(batcher.flush())
+        await asyncio.sleep(0)
+        await batcher.update(Table.NODES, {"vircadia_uuid": "a", "gltf_name": "zombie"})
+        gate.set()
+        with pytest.raises(ConnectionError):
+            await flushing
+        batcher.send = send
+        # The delete still goes out; the update that raced it surfaces like submit() would.
+        with pytest.raises(ValueError, match="after it was deleted"):
+            await batcher.close()
+        return send.sent
+    assert asyncio.run(run()) == [(TableMutation.DELETE_NODE, [{"vircadia_uuid": "a"}])]
+
+def test_updates_from_rows_clear_unset_columns():
+    async def run():
+        send = Recorder()
+        async with MutationBatcher(send, max_delay=60) as batcher:
+            await batcher.create(Table.NODES, TableNode(vircadia_uuid="a", gltf_name="a", gltf_mesh="m"))
+            await batcher.update(Table.NODES, TableNode(vircadia_uuid="a", gltf_name="renamed"))
+            await batcher.update(Table.NODES, TableNode(vircadia_uuid="b", gltf_mesh="m"))
+            await batcher.update(Table.NODES, {"vircadia_uuid": "b", "gltf_name": "b"})
+        return send.sent
+    (created,), (updated,) = [rows for _, rows in asyncio.run(run())]
+    # Columns the update cleared are left out of the pending create rather than sent as null.
+    assert created == {"vircadia_uuid": "a", "gltf_name": "renamed"}
+    assert updated["gltf_mesh"] == "m" and updated["gltf_name"] == "b" and updated["gltf_skin"] is None
+    assert "vircadia_updatedat" not in updated
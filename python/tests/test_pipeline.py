@@ -0,0 +1,68 @@
+import numpy as np
+from multiprocessing import shared_memory
+from conftest import world_rows
+from python import pipeline
+from python.culling import CullingService
+from python.graph import WorldGraph
+from python.pipeline import Shard, WorldPipeline, bake_bounds, validate
+from python.world import TableBuffer, TableMaterial, TableNode, TableScene
+
+def _first_buffer(shard):
+    (uuid,) = shard.buffers
+    return np.frombuffer(shard.load(TableBuffer(vircadia_uuid=uuid)), dtype=np.uint8)
+
+def test_run_matches_serial():
+    rows = world_rows("a") + world_rows("b")
+    graph = WorldGraph(rows)
+    results = list(WorldPipeline(graph, max_workers=2).run(bake_bounds))
+    assert [result.error for result in results] == [None, None]
+    for result in results:
+        service = CullingService(graph, result.world_uuid)
+        assert result.value == {
+            service.nodes[index].vircadia_uuid: (lo, hi)
+            for index, lo, hi in zip(service._bounded.tolist(), service.lo.tolist(), service.hi.tolist())
+        }
+
+def _merged(graph, job, shard_nodes):
+    results = list(WorldPipeline(graph, max_workers=2, shard_nodes=shard_nodes).run(job))
+    assert [result.error for result in results] == [None] * len(results)
+    return results
+
+def test_sharded_runs_match_unsharded():
+    rows = world_rows("a") + world_rows("b")
+    common = {"vircadia_world_uuid": "a-world"}
+    rows += [TableNode(vircadia_uuid=f"a-extra-{index}", gltf_mesh="a-mesh", gltf_translation=[index, 0, 0], **common) for index in range(4)]
+    rows += [
+        TableScene(vircadia_uuid="a-scene-2", gltf_nodes=["a-extra-0", "missing-node"], **common),
+        TableMaterial(vircadia_uuid="a-orphan", gltf_pbrMetallicRoughness={"baseColorTexture": {"index": "missing-texture"}}, **common),
+    ]
+    graph = WorldGraph(rows)
+    sharded = _merged(graph, bake_bounds, 1)
+    assert len(sharded) > 2
+    bounds = {}
+    for result in sharded:
+        bounds.update(result.value)
+    assert bounds == {key: value for result in _merged(graph, bake_bounds, None) for key, value in result.value.items()}
+
+    expected = [edge for result in _merged(graph, validate, None) for edge in result.value]
+    assert sorted(expected) == [
+        ("a-orphan", "gltf_pbrMetallicRoughness.baseColorTexture", "missing-texture"),
+        ("a-scene-2", "gltf_nodes", "missing-node"),
+    ]
+    assert sorted({edge for result in _merged(graph, validate, 1) for edge in result.value}) == sorted(expected)
+
+def test_segments_held_by_a_result_are_released_after_the_next_shard():
+    segment = shared_memory.SharedMemory(create=True, size=4)
+    try:
+        segment.buf[:4] = b"abcd"
+        shard = Shard("w", (), [], buffers={"buffer": (segment.name, 4)})
+        result = pipeline._run(_first_buffer, shard)
+        assert bytes(result.value) == b"abcd"
+        # The returned array still exports the mapping, so it cannot be closed yet.
+        assert segment.name in pipeline._ATTACHED
+        del result
+        pipeline._run(validate, Shard("w", (), []))
+        assert not pipeline._ATTACHED
+    finally:
+        segment.close()
+        segment.unlink()
@@ -0,0 +1,72 @@
+import dataclasses
+import numpy as np
+import pytest
+from python.primitive import Color3, Color3Array, FrozenColor3, FrozenVector3, Vector3, Vector3Array
+
+def test_round_trips():
+    vectors = [Vector3(1.0, 2.0, 3.0), Vector3(-4.0, 0.5, 6.0)]
+    array = Vector3Array.from_items(vectors)
+    assert array.data.shape == (2, 3) and array.to_items() == vectors
+    assert Vector3Array.from_dicts(array.to_dicts()) == array
+    assert array.to_dicts()[1] == {"x": -4.0, "y": 0.5, "z": 6.0}
+    assert Vector3Array.from_items(iter(vectors)) == array
+    assert list(array) == vectors
+    colours = Color3Array.from_dicts([{"r": 0.1, "g": 0.2, "b": 0.3}])
+    assert colours.to_items() == [Color3(0.1, 0.2, 0.3)]
+    assert Color3Array.from_items([FrozenColor3(0.1, 0.2, 0.3)]) == colours
+    # A float32 array keeps its dtype through every derived array.
+    single = Vector3Array(array.data, dtype=np.float32)
+    assert single.data.dtype == np.float32
+    assert (single + Vector3(1.0, 1.0, 1.0)).data.dtype == np.float32
+    assert single[:1].data.dtype == single.copy().data.dtype == np.float32
+
+def test_empty_and_zeros():
+    assert len(Vector3Array()) == 0 and Vector3Array().data.shape == (0, 3)
+    assert Vector3Array.from_items([]).to_items() == []
+    assert Color3Array.zeros(2).to_items() == [Color3(), Color3()]
+
+def test_indexing():
+    array = Vector3Array([[0, 0, 0], [1, 1, 1], [2, 2, 2]])
+    assert array[1] == Vector3(1.0, 1.0, 1.0) and array[np.int64(-1)] == Vector3(2.0, 2.0, 2.0)
+    assert array[1:] == Vector3Array([[1, 1, 1], [2, 2, 2]])
+    assert array[np.array([True, False, True])] == Vector3Array([[0, 0, 0], [2, 2, 2]])
+    array[0] = FrozenVector3(5.0, 6.0, 7.0)
+    array[1:] = Vector3Array([[8, 8, 8], [9, 9, 9]])
+    assert array.to_items() == [Vector3(5.0, 6.0, 7.0), Vector3(8.0, 8.0, 8.0), Vector3(9.0, 9.0, 9.0)]
+    # Slices are views onto the same data; copies are not.
+    view, copy = array[:1], array.copy()
+    view[0] = Vector3()
+    assert array[0] == Vector3() and copy[0] == Vector3(5.0, 6.0, 7.0)
+    with pytest.raises(IndexError):
+        array[3]
+
+def test_vector_maths():
+    array = Vector3Array([[3, 0, 0], [0, 4, 0], [0, 0, 0]])
+    np.testing.assert_allclose(array.length(), [3, 4, 0])
+    np.testing.assert_allclose(array.distance(Vector3(0.0, 4.0, 0.0)), [5, 0, 4])
+    np.testing.assert_allclose(array.dot(Vector3(1.0, 1.0, 1.0)), [3, 4, 0])
+    assert array.normalized() == Vector3Array([[1, 0, 0], [0, 1, 0], [0, 0, 0]])
+    assert array.cross(Vector3(0.0, 0.0, 1.0)) == Vector3Array([[0, -3, 0], [4, 0, 0], [0, 0, 0]])
+    assert array.scale([1, 2, 3]) == 2 * Vector3Array([[1.5, 0, 0], [0, 4, 0], [0, 0, 0]])
+    assert array - array == Vector3Array.zeros(3)
+    array += Vector3(1.0, 1.0, 1.0)
+    array -= Vector3Array([[1, 1, 1]] * 3)
+    assert array == Vector3Array([[3, 0, 0], [0, 4, 0], [0, 0, 0]])
+    assert Color3Array([[-1, 0.5, 2]]).clamped() == Color3Array([[0, 0.5, 1]])
+
+def test_slots_and_frozen():
+    for value in (Vector3(), Color3(), FrozenVector3(), FrozenColor3(), Vector3Array(), Color3Array()):
+        assert not hasattr(value, "__dict__")
+    for value in (Vector3(), Color3(), Vector3Array(), Color3Array()):
+        with pytest.raises(AttributeError):
+            value.w = 1.0
+    vector = Vector3()
+    vector.x = 1.0
+    assert vector == Vector3(1.0, 0.0, 0.0)
+    frozen = FrozenVector3(1.0, 2.0, 3.0)
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        frozen.x = 0.0
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        FrozenColor3().r = 1.0
+    assert hash(frozen) == hash(FrozenVector3(1.0, 2.0, 3.0))
+    assert {FrozenColor3(0.5, 0.5, 0.5): "grey"}[FrozenColor3(0.5, 0.5, 0.5)] == "grey"
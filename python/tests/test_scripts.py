@@ -0,0 +1,59 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from python.scripts import ScriptResolver
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = f"// {self.path}".encode()
+        if self.path.startswith("/big"):
+            body = b"//" + b"x" * 4094
+        self.send_response(200)
+        if self.path == "/bad-date.js":
+            self.send_header("Last-Modified", "not a date")
+        else:
+            self.send_header("Last-Modified", "Wed, 21 Oct 2015 07:28:00 GMT")
+        if self.path != "/big-unsized.js":
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+def test_malformed_last_modified_does_not_abort_resolve(server):
+    response = ScriptResolver().resolve([f"{server}/bad-date.js", f"{server}/good.js"])
+    bad, good = response.scripts
+    assert bad.error is None and bad.code == "// /bad-date.js" and bad.timestamp
+    assert good.timestamp == "2015-10-21T07:28:00+00:00"
+
+def test_only_http_urls_by_default(tmp_path):
+    allowed = tmp_path / "scripts"
+    allowed.mkdir()
+    (allowed / "ok.js").write_text("// ok")
+    (tmp_path / "secret.txt").write_text("secret")
+    urls = [(allowed / "ok.js").as_uri(), (tmp_path / "secret.txt").as_uri(), "ftp://example.com/x.js"]
+    refused = ScriptResolver().resolve(urls).scripts
+    assert all(script.code is None and script.error for script in refused)
+    ok, secret, ftp = ScriptResolver(file_roots=[str(allowed)]).resolve(urls).scripts
+    assert ok.code == "// ok"
+    assert secret.code is None and secret.error
+    assert ftp.code is None and ftp.error
+
+def test_oversized_scripts_are_refused(server):
+    urls = [f"{server}/big.js", f"{server}/big-unsized.js", f"{server}/small.js"]
+    sized, unsized, small = ScriptResolver(max_script_bytes=1000).resolve(urls).scripts
+    assert sized.code is None and "4096 bytes, over the 1000-byte" in sized.error
+    assert unsized.code is None and "over the 1000-byte" in unsized.error
+    assert small.error is None and small.code == "// /small.js"
+    exact = ScriptResolver(max_script_bytes=4096).resolve(urls[:2]).scripts
+    assert [script.size for script in exact] == [4096, 4096]
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from python.spatial import SpatialGrid
+
+def _grid(seed=7, count=400):
+    rng = np.random.default_rng(seed)
+    grid = SpatialGrid(cell_size=25.0)
+    keys = [f"agent-{index}" for index in range(count)]
+    grid.update_many(keys, rng.uniform(-300, 300, (count, 3)))
+    # Move some agents across cells one at a time and drop others, so slots get reused.
+    for key in keys[::7]:
+        grid.update(key, rng.uniform(-300, 300, 3))
+    for key in keys[::11]:
+        grid.remove(key)
+    positions = {key: np.array([grid.position(key).x, grid.position(key).y, grid.position(key).z]) for key in grid.keys}
+    return grid, positions, rng
+
+def _brute(positions, center, exclude=None):
+    distances = {key: float(np.linalg.norm(position - center)) for key, position in positions.items() if key != exclude}
+    return sorted(distances.items(), key=lambda item: item[1])
+
+@pytest.mark.parametrize("radius", [0.0, 10.0, 60.0, 2000.0])
+def test_query_radius_and_pairs_match_brute_force(radius):
+    grid, positions, rng = _grid()
+    for center in rng.uniform(-350, 350, (20, 3)):
+        expected = {key for key, distance in _brute(positions, center) if distance <= radius}
+        assert set(grid.query_radius(center, radius)) == expected
+    keys = sorted(positions)
+    expected = {
+        (a, b)
+        for i, a in enumerate(keys)
+        for b in keys[i + 1:]
+        if np.linalg.norm(positions[a] - positions[b]) <= radius
+    }
+    assert {tuple(sorted(pair[:2])) for pair in grid.pairs_within(radius)} == expected
+
+def test_nearest_matches_brute_force():
+    grid, positions, rng = _grid()
+    for center in rng.uniform(-350, 350, (20, 3)):
+        for k, max_distance in [(1, None), (5, None), (8, 40.0), (500, None)]:
+            expected = [
+                (key, distance)
+                for key, distance in _brute(positions, center)
+                if max_distance is None or distance <= max_distance
+            ][:k]
+            got = grid.nearest(center, k, max_distance)
+            assert [key for key, _ in got] == [key for key, _ in expected]
+            np.testing.assert_allclose([d for _, d in got], [d for _, d in expected])
+
+def test_nearest_many_matches_brute_force():
+    grid, positions, _ = _grid()
+    queries = grid.keys[::5]
+    radii = [10.0, 40.0, 120.0]
+    found = grid.nearest_many(queries, 4, radii)
+    assert set(found) == set(queries)
+    for key in queries:
+        expected = [item for item in _brute(positions, positions[key], exclude=key) if item[1] <= radii[-1]][:4]
+        assert [neighbour for neighbour, _ in found[key]] == [neighbour for neighbour, _ in expected]
+        np.testing.assert_allclose([d for _, d in found[key]], [d for _, d in expected])
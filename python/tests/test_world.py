@@ -0,0 +1,60 @@
+from datetime import datetime, timezone
+from enum import Enum
+from typing import Any, get_args, get_origin, get_type_hints
+import pytest
+from python.primitive import Color3, Vector3
+from python.world import CODECS, SERVER_MANAGED_FIELDS, Babylon, TableMesh, TableNode, _unwrap_optional
+
+def test_traits_keep_value_types():
+    a = TableNode(vircadia_uuid="a", vircadia_babylonjs_light_use_as_shadowmap=True, vircadia_babylonjs_lod_distance=1)
+    b = TableNode(vircadia_uuid="b", vircadia_babylonjs_light_use_as_shadowmap=1, vircadia_babylonjs_lod_distance=True)
+    assert a.babylon_traits is not b.babylon_traits
+    assert a.vircadia_babylonjs_light_use_as_shadowmap is True
+    assert b.vircadia_babylonjs_light_use_as_shadowmap == 1 and b.vircadia_babylonjs_light_use_as_shadowmap is not True
+    assert b.vircadia_babylonjs_lod_distance is True
+
+def test_codec_decodes_trait_enums():
+    plain = TableMesh(vircadia_uuid="plain", vircadia_babylonjs_lod_mode="distance")
+    row = CODECS[TableMesh].from_dict({"vircadia_uuid": "m", "vircadia_babylonjs_lod_mode": "distance"})
+    assert row.vircadia_babylonjs_lod_mode is Babylon.LOD.Mode.DISTANCE
+    twin = TableMesh(vircadia_uuid="twin", vircadia_babylonjs_lod_mode=Babylon.LOD.Mode.DISTANCE)
+    assert twin.babylon_traits is row.babylon_traits
+    assert plain.babylon_traits is not row.babylon_traits
+
+def _sample(hint, name):
+    hint = _unwrap_optional(hint)
+    if hint is datetime:
+        return datetime(2024, 5, 1, 12, 0, 0, 250000, tzinfo=timezone.utc)
+    if get_origin(hint) is list:
+        (item,) = get_args(hint)
+        return [_sample(item, name), _sample(item, name)] if item is not Any else [name, 1]
+    if isinstance(hint, type) and issubclass(hint, Enum):
+        return list(hint)[-1]
+    if hint is Vector3:
+        return Vector3(1.0, 2.0, 3.0)
+    if hint is Color3:
+        return Color3(0.25, 0.5, 0.75)
+    samples = {bool: True, int: 3, float: 1.5, str: name}
+    return samples.get(hint, {"name": name, "values": [1, 2.5, None]})
+
+@pytest.mark.parametrize("row_type", sorted(CODECS, key=lambda row_type: row_type.__name__))
+def test_codec_round_trips(row_type):
+    codec = CODECS[row_type]
+    hints = get_type_hints(row_type)
+    row = row_type(**{name: _sample(hints[name], name) for name in codec.field_names})
+    decoded = codec.from_json_bytes(codec.to_json_bytes(row))
+    assert decoded == row
+    # Equality alone would let "distance" pass for Babylon.LOD.Mode.DISTANCE.
+    assert [type(getattr(decoded, name)) for name in codec.field_names] == [type(getattr(row, name)) for name in codec.field_names]
+    assert codec.from_json_bytes(codec.to_json_bytes([row, row_type()])) == [row, row_type()]
+    assert codec.to_dict(row_type()) == {}
+
+@pytest.mark.parametrize("row_type", sorted(CODECS, key=lambda row_type: row_type.__name__))
+def test_keep_none_lists_every_column_but_server_stamps(row_type):
+    codec = CODECS[row_type]
+    empty = codec.to_dict(row_type(), keep_none=True)
+    assert empty == {name: None for name in codec.field_names if name not in SERVER_MANAGED_FIELDS}
+    assert codec.from_dict(empty) == row_type()
+    hints = get_type_hints(row_type)
+    row = row_type(**{name: _sample(hints[name], name) for name in codec.field_names})
+    assert codec.to_dicts([row], keep_none=True) == [codec.to_dict(row)]
@@ -1,7 +1,9 @@
 from enum import Enum, IntEnum
-from typing import List, Dict, Any, Optional, Union
+from typing import List, Dict, Any, Optional, Union, Iterable, Callable, get_type_hints, get_origin, get_args
 from datetime import datetime
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields, replace
+import json
+import weakref
 from .primitive import Vector3, Color3
 
 class Babylon:
@@ -39,6 +41,77 @@ class Babylon:
             SHADOWSONLY = "shadowsOnly"
             SPECULAR = "specular"
 
+@dataclass(frozen=True)
+class BabylonTraits:
+    vircadia_babylonjs_lod_mode: Optional[Babylon.LOD.Mode] = None
+    vircadia_babylonjs_lod_auto: Optional[bool] = None
+    vircadia_babylonjs_lod_distance: Optional[float] = None
+    vircadia_babylonjs_lod_size: Optional[float] = None
+    vircadia_babylonjs_lod_hide: Optional[float] = None
+    vircadia_babylonjs_billboard_mode: Optional[Babylon.Billboard.Mode] = None
+    vircadia_babylonjs_light_lightmap: Optional[str] = None
+    vircadia_babylonjs_light_level: Optional[float] = None
+    vircadia_babylonjs_light_color_space: Optional[Babylon.Texture.ColorSpace] = None
+    vircadia_babylonjs_light_texcoord: Optional[int] = None
+    vircadia_babylonjs_light_use_as_shadowmap: Optional[bool] = None
+    vircadia_babylonjs_light_mode: Optional[Babylon.Light.Mode] = None
+    vircadia_babylonjs_script_agent_script_raw_file_url: Optional[str] = None
+    vircadia_babylonjs_script_agent_script_git_file_url: Optional[str] = None
+    vircadia_babylonjs_script_agent_script_git_repo_url: Optional[str] = None
+    vircadia_babylonjs_script_persistent_script_raw_file_url: Optional[str] = None
+    vircadia_babylonjs_script_persistent_script_git_file_url: Optional[str] = None
+    vircadia_babylonjs_script_persistent_script_git_repo_url: Optional[str] = None
+
+    @staticmethod
+    def intern(traits: 'BabylonTraits') -> Optional['BabylonTraits']:
+        return BabylonTraits.from_values(tuple(getattr(traits, name) for name in BABYLON_TRAIT_FIELDS))
+
+    @staticmethod
+    def from_values(values: tuple) -> Optional['BabylonTraits']:
+        # Keyed on the value types too: 1, 1.0 and True (or "distance" and
+        # Babylon.LOD.Mode.DISTANCE) compare equal but must not share one traits object.
+        key = values + tuple(map(type, values))
+        traits = _INTERNED_BABYLON_TRAITS.get(key)
+        if traits is None:
+            if values == _EMPTY_BABYLON_VALUES:
+                return None
+            traits = _INTERNED_BABYLON_TRAITS[key] = BabylonTraits(*values)
+        return traits
+
+BABYLON_TRAIT_FIELDS = tuple(f.name for f in fields(BabylonTraits))
+_EMPTY_BABYLON_TRAITS = BabylonTraits()
+_EMPTY_BABYLON_VALUES = (None,) * len(BABYLON_TRAIT_FIELDS)
+_INTERNED_BABYLON_TRAITS: 'weakref.WeakValueDictionary[tuple, BabylonTraits]' = weakref.WeakValueDictionary()
+
+class _BabylonTrait:
+    # Rows keep every trait in one shared, interned BabylonTraits (or nothing at all when
+    # every trait is None); these descriptors keep the flat attribute API on top of it.
+    def __init__(self, name: str):
+        self.name = name
+
+    def __get__(self, row: Any, owner: Optional[type] = None) -> Any:
+        if row is None:
+            return None
+        traits = row.babylon_traits
+        return None if traits is None else getattr(traits, self.name)
+
+    def __set__(self, row: Any, value: Any) -> None:
+        traits = row.babylon_traits
+        if traits is None:
+            if value is None:
+                return
+            traits = _EMPTY_BABYLON_TRAITS
+        elif getattr(traits, self.name) is value:
+            return
+        row.babylon_traits = BabylonTraits.intern(replace(traits, **{self.name: value}))
+
+def babylon_traits(cls: type) -> type:
+    cls.babylon_traits = None
+    for name in BABYLON_TRAIT_FIELDS:
+        if name in cls.__dict__:
+            setattr(cls, name, _BabylonTrait(name))
+    return cls
+
 @dataclass
 class BaseWorldGLTFTableProperties:
     vircadia_uuid: Optional[str] = None
@@ -77,6 +150,7 @@ class TableScene(BaseWorldGLTFTableProperties):
     vircadia_babylonjs_scene_autoAnimateSpeed: Optional[float] = None
 
 @dataclass
+@babylon_traits
 class TableNode(BaseWorldGLTFTableProperties):
     vircadia_world_uuid: Optional[str] = None
     gltf_camera: Optional[str] = None
@@ -108,6 +182,7 @@ class TableNode(BaseWorldGLTFTableProperties):
     vircadia_babylonjs_script_persistent_script_git_repo_url: Optional[str] = None
 
 @dataclass
+@babylon_traits
 class TableMesh(BaseWorldGLTFTableProperties):
     vircadia_world_uuid: Optional[str] = None
     gltf_primitives: Optional[List[Any]] = None
@@ -132,6 +207,7 @@ class TableMesh(BaseWorldGLTFTableProperties):
     vircadia_babylonjs_script_persistent_script_git_repo_url: Optional[str] = None
 
 @dataclass
+@babylon_traits
 class TableMaterial(BaseWorldGLTFTableProperties):
     vircadia_world_uuid: Optional[str] = None
     gltf_pbrMetallicRoughness: Optional[Any] = None
@@ -162,6 +238,7 @@ class TableMaterial(BaseWorldGLTFTableProperties):
     vircadia_babylonjs_script_persistent_script_git_repo_url: Optional[str] = None
 
 @dataclass
+@babylon_traits
 class TableTexture(BaseWorldGLTFTableProperties):
     vircadia_world_uuid: Optional[str] = None
     gltf_sampler: Optional[str] = None
@@ -186,6 +263,7 @@ class TableTexture(BaseWorldGLTFTableProperties):
     vircadia_babylonjs_script_persistent_script_git_repo_url: Optional[str] = None
 
 @dataclass
+@babylon_traits
 class TableImage(BaseWorldGLTFTableProperties):
     vircadia_world_uuid: Optional[str] = None
     gltf_uri: Optional[str] = None
@@ -211,6 +289,7 @@ class TableImage(BaseWorldGLTFTableProperties):
     vircadia_babylonjs_script_persistent_script_git_repo_url: Optional[str] = None
 
 @dataclass
+@babylon_traits
 class TableSampler(BaseWorldGLTFTableProperties):
     vircadia_world_uuid: Optional[str] = None
     gltf_magFilter: Optional[int] = None
@@ -237,6 +316,7 @@ class TableSampler(BaseWorldGLTFTableProperties):
     vircadia_babylonjs_script_persistent_script_git_repo_url: Optional[str] = None
 
 @dataclass
+@babylon_traits
 class TableAnimation(BaseWorldGLTFTableProperties):
     vircadia_world_uuid: Optional[str] = None
     gltf_channels: Optional[List[Any]] = None
@@ -261,6 +341,7 @@ class TableAnimation(BaseWorldGLTFTableProperties):
     vircadia_babylonjs_script_persistent_script_git_repo_url: Optional[str] = None
 
 @dataclass
+@babylon_traits
 class TableSkin(BaseWorldGLTFTableProperties):
     vircadia_world_uuid: Optional[str] = None
     gltf_inverseBindMatrices: Optional[str] = None
@@ -286,6 +367,7 @@ class TableSkin(BaseWorldGLTFTableProperties):
     vircadia_babylonjs_script_persistent_script_git_repo_url: Optional[str] = None
 
 @dataclass
+@babylon_traits
 class TableCamera(BaseWorldGLTFTableProperties):
     vircadia_world_uuid: Optional[str] = None
     gltf_type: Optional[str] = None
@@ -311,6 +393,7 @@ class TableCamera(BaseWorldGLTFTableProperties):
     vircadia_babylonjs_script_persistent_script_git_repo_url: Optional[str] = None
 
 @dataclass
+@babylon_traits
 class TableBuffer(BaseWorldGLTFTableProperties):
     vircadia_world_uuid: Optional[str] = None
     gltf_uri: Optional[str] = None
@@ -335,6 +418,7 @@ class TableBuffer(BaseWorldGLTFTableProperties):
     vircadia_babylonjs_script_persistent_script_git_repo_url: Optional[str] = None
 
 @dataclass
+@babylon_traits
 class TableBufferView(BaseWorldGLTFTableProperties):
     vircadia_world_uuid: Optional[str] = None
     gltf_buffer: Optional[str] = None
@@ -362,6 +446,7 @@ class TableBufferView(BaseWorldGLTFTableProperties):
     vircadia_babylonjs_script_persistent_script_git_repo_url: Optional[str] = None
 
 @dataclass
+@babylon_traits
 class TableAccessor(BaseWorldGLTFTableProperties):
     gltf_bufferView: Optional[str] = None
     gltf_byteOffset: Optional[int] = None
@@ -411,6 +496,7 @@ class TableMetadata:
     values_timestamp: Optional[List[datetime]] = None
     createdat: Optional[datetime] = None
     updatedat: Optional[datetime] = None
+    entity_id: Optional[str] = None
 
 class Table(str, Enum):
     WORLD_GLTF = "world_gltf"
@@ -530,4 +616,168 @@ class TableMutation(str, Enum):
     DELETE_BUFFER_VIEW_METADATA = "delete_buffer_view_metadata"
     CREATE_ACCESSOR_METADATA = "create_accessor_metadata"
     UPDATE_ACCESSOR_METADATA = "update_accessor_metadata"
-    DELETE_ACCESSOR_METADATA = "delete_accessor_metadata"
\ No newline at end of file
+    DELETE_ACCESSOR_METADATA = "delete_accessor_metadata"
+
+TABLE_ROWS: Dict[Table, type] = {
+    Table.WORLD_GLTF: TableWorldGLTF,
+    Table.AGENT_PROFILES: TableUserProfile,
+    Table.SCENES: TableScene,
+    Table.NODES: TableNode,
+    Table.MESHES: TableMesh,
+    Table.MATERIALS: TableMaterial,
+    Table.TEXTURES: TableTexture,
+    Table.IMAGES: TableImage,
+    Table.SAMPLERS: TableSampler,
+    Table.ANIMATIONS: TableAnimation,
+    Table.SKINS: TableSkin,
+    Table.CAMERAS: TableCamera,
+    Table.BUFFERS: TableBuffer,
+    Table.BUFFER_VIEWS: TableBufferView,
+    Table.ACCESSORS: TableAccessor,
+    **{table: TableMetadata for table in Table if table.value.endswith("_metadata")},
+}
+
+# Columns the server stamps itself: None there means "not known here", never "clear it".
+SERVER_MANAGED_FIELDS = frozenset((
+    "vircadia_version",
+    "vircadia_createdat",
+    "vircadia_updatedat",
+    "created_at",
+    "updated_at",
+    "createdat",
+    "updatedat",
+))
+
+def _unwrap_optional(hint: Any) -> Any:
+    if get_origin(hint) is Union:
+        args = [arg for arg in get_args(hint) if arg is not type(None)]
+        if len(args) == 1:
+            return args[0]
+    return hint
+
+def _parse_datetime(value: Any) -> Any:
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+def _encoder(hint: Any, namespace: Dict[str, Any], index: int) -> str:
+    if hint is datetime:
+        return "v.isoformat()"
+    if get_origin(hint) is list and get_args(hint) == (datetime,):
+        return "[t.isoformat() for t in v]"
+    if isinstance(hint, type) and issubclass(hint, Enum):
+        return "getattr(v, 'value', v)"
+    if hint is Vector3:
+        return "{'x': v.x, 'y': v.y, 'z': v.z}"
+    if hint is Color3:
+        return "{'r': v.r, 'g': v.g, 'b': v.b}"
+    return "v"
+
+def _decoder(hint: Any, namespace: Dict[str, Any], index: int) -> Optional[str]:
+    v = f"v{index}"
+    if hint is datetime:
+        return f"_parse_datetime({v})"
+    if get_origin(hint) is list and get_args(hint) == (datetime,):
+        return f"[_parse_datetime(t) for t in {v}]"
+    if isinstance(hint, type) and issubclass(hint, Enum):
+        # Enum coercion goes through the value map directly; the constructor only
+        # runs to raise the usual ValueError for unknown values.
+        namespace[f"_E{index}"] = hint
+        namespace[f"_M{index}"] = hint._value2member_map_
+        return f"_M{index}[{v}] if {v} in _M{index} else _E{index}({v})"
+    if hint in (Vector3, Color3):
+        return f"{hint.__name__}(**{v}) if {v}.__class__ is dict else {v}"
+    return None
+
+class TableCodec:
+    def __init__(self, row_type: type):
+        self.row_type = row_type
+        self.field_names = tuple(f.name for f in fields(row_type))
+        hints = get_type_hints(row_type)
+        namespace: Dict[str, Any] = {
+            "Vector3": Vector3,
+            "Color3": Color3,
+            "_parse_datetime": _parse_datetime,
+            "_row_type": row_type,
+        }
+        traits = [name for name in self.field_names if name in BABYLON_TRAIT_FIELDS and hasattr(row_type, "babylon_traits")]
+        # keep_none writes None for unset columns too, so an update payload built from a
+        # row can clear them; server-stamped columns are still left out when unset.
+        encode = ["def to_dict(row, keep_none=False):", "    d = {}"]
+        decode = ["def from_dict(obj):", "    get = obj.get"]
+        for index, name in enumerate(self.field_names):
+            hint = _unwrap_optional(hints[name])
+            # Trait columns are read off the shared BabylonTraits below rather than through
+            # eighteen descriptor lookups that are almost always None.
+            if name not in traits:
+                encode.append(f"    v = row.{name}")
+                encode.append("    if v is not None:")
+                encode.append(f"        d[{name!r}] = {_encoder(hint, namespace, index)}")
+                if name not in SERVER_MANAGED_FIELDS:
+                    encode.append("    elif keep_none:")
+                    encode.append(f"        d[{name!r}] = None")
+            decode.append(f"    v{index} = get({name!r})")
+            decoder = _decoder(hint, namespace, index)
+            if decoder:
+                decode.append(f"    if v{index} is not None: v{index} = {decoder}")
+        if traits:
+            namespace["_traits"] = BabylonTraits.from_values
+            encode.append("    t = row.babylon_traits")
+            encode.append("    if t is not None:")
+            for name in traits:
+                index = self.field_names.index(name)
+                encode.append(f"        v = t.{name}")
+                encode.append("        if v is not None:")
+                encode.append(f"            d[{name!r}] = {_encoder(_unwrap_optional(hints[name]), namespace, index)}")
+                encode.append("        elif keep_none:")
+                encode.append(f"            d[{name!r}] = None")
+            encode.append("    elif keep_none:")
+            for name in traits:
+                encode.append(f"        d[{name!r}] = None")
+            values = [f"v{self.field_names.index(name)}" if name in traits else "None" for name in BABYLON_TRAIT_FIELDS]
+            decode.append("    if " + " and ".join(f"{v} is None" for v in values if v != "None") + ":")
+            decode.append("        t = None")
+            decode.append("    else:")
+            decode.append("        t = _traits((" + ", ".join(values) + ",))")
+        encode.append("    return d")
+        # Rows are filled attribute by attribute instead of through __init__, which would
+        # otherwise route every trait column through its descriptor.
+        namespace["_new"] = object.__new__
+        decode.append("    row = _new(_row_type)")
+        for index, name in enumerate(self.field_names):
+            if name not in traits:
+                decode.append(f"    row.{name} = v{index}")
+        if traits:
+            decode.append("    if t is not None: row.babylon_traits = t")
+        decode.append("    return row")
+        exec("\n".join(encode), namespace)
+        exec("\n".join(decode), namespace)
+        self.to_dict: Callable[..., Dict[str, Any]] = namespace["to_dict"]
+        self.from_dict: Callable[[Dict[str, Any]], Any] = namespace["from_dict"]
+
+    def to_dicts(self, rows: Iterable[Any], keep_none: bool = False) -> List[Dict[str, Any]]:
+        to_dict = self.to_dict
+        if keep_none:
+            return [to_dict(row, True) for row in rows]
+        return [to_dict(row) for row in rows]
+
+    def from_dicts(self, objs: Iterable[Dict[str, Any]]) -> List[Any]:
+        from_dict = self.from_dict
+        return [from_dict(obj) for obj in objs]
+
+    def to_json_bytes(self, rows: Any) -> bytes:
+        if isinstance(rows, self.row_type):
+            data = self.to_dict(rows)
+        else:
+            data = self.to_dicts(rows)
+        return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode()
+
+    def from_json_bytes(self, buf: Union[bytes, bytearray, memoryview, str]) -> Any:
+        data = json.loads(bytes(buf) if isinstance(buf, memoryview) else buf)
+        if isinstance(data, list):
+            return self.from_dicts(data)
+        return self.from_dict(data)
+
+    @staticmethod
+    def for_table(table: Union[Table, type]) -> 'TableCodec':
+        return CODECS[TABLE_ROWS[Table(table)] if not isinstance(table, type) else table]
+
+CODECS: Dict[type, TableCodec] = {row_type: TableCodec(row_type) for row_type in set(TABLE_ROWS.values())}